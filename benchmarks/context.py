@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+import time
+import numpy as np
+
+from argparse import ArgumentParser
+from typing import Dict, List
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+# NOTE: hack to make the [backend] and [shared] packages importable when running "python -m benchmarks.context" from the repo root
+
+from benchmarks.synthetic import make_content_nodes, make_movies  # noqa: E402
+
+OVERVIEW_VOCABULARY = (
+    "a young detective struggles to uncover the truth behind a string of murders in a city where nobody can be trusted while "
+    "an estranged family reunites for one last summer after a tragedy and discovers secrets buried for decades as war breaks out"
+).split()
+
+
+def make_source_nodes(n_nodes: int, overview_words: int, seed: int) -> List:
+    """retrieved [movies-content] nodes with overviews about as long as real TMDB plot overviews"""
+
+    from llama_index.schema import NodeWithScore
+
+    rng = np.random.default_rng(seed)
+    movies = make_movies(n_movies=n_nodes, seed=seed)
+    movies["overview"] = [" ".join(rng.choice(OVERVIEW_VOCABULARY, size=overview_words)) for _ in range(n_nodes)]
+    return [NodeWithScore(node=node, score=score) for node, score in zip(make_content_nodes(movies), np.sort(rng.uniform(0.7, 0.9, size=n_nodes))[::-1])]
+
+
+def time_completion(client, model: str, prompt: str, repeat: int) -> Dict[str, float]:
+    """time live chat completions for a prompt returning the median latency and the billed prompt tokens"""
+
+    timings, prompt_tokens = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.chat.completions.create(model=model, messages=[{"role": "user", "content": prompt}], temperature=0.1, max_tokens=256)
+        timings.append(time.perf_counter() - start)
+        prompt_tokens = response.usage.prompt_tokens
+    return {"median_ms": float(np.median(timings) * 1000), "prompt_tokens": prompt_tokens}
+
+
+def run_benchmarks(args) -> List[Dict]:
+    """compare the QA prompt built from the full llama-index rendering of every node against compact contexts at each budget"""
+
+    from llama_index.schema import MetadataMode
+    from backend.app.prompts import TEXT_QA_PROMPT
+    from backend.app.tokenizer import count_tokens, fit_context
+
+    source_nodes = make_source_nodes(n_nodes=args.k, overview_words=args.overview_words, seed=args.seed)
+    fields = args.fields.split(",")
+
+    contexts = {"full": lambda: "\n\n".join([node.get_content(metadata_mode=MetadataMode.LLM) for node in source_nodes])}
+    for budget in args.budgets:
+        contexts[f"compact/{budget}"] = lambda budget=budget: fit_context(
+            source_nodes, budget=budget, fields=fields, max_movies=args.max_movies, overview_tokens=args.overview_tokens
+        )
+
+    client = None
+    if args.live:
+        import openai
+        client = openai.OpenAI(api_key=os.environ["OPENAI_API_KEY"], base_url=os.environ.get("OPENAI_BASE_URL"))
+
+    results = []
+    for name, build in contexts.items():
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            context = build()
+        build_ms = (time.perf_counter() - start) / args.repeat * 1000
+
+        prompt = TEXT_QA_PROMPT.format(query_str=args.query, context_str=context)
+        result = {"context": name, "context_tokens": count_tokens(context), "prompt_tokens": count_tokens(prompt), "build_ms": build_ms}
+        if client is not None:
+            print(f"timing live completions: {name}", file=sys.stderr)
+            live = time_completion(client, model=args.model, prompt=prompt, repeat=args.live)
+            result.update({"llm_median_ms": live["median_ms"], "billed_prompt_tokens": live["prompt_tokens"]})
+        results.append(result)
+
+    full = results[0]
+    for result in results:
+        result["prompt_tokens_saved"] = 1 - result["prompt_tokens"] / full["prompt_tokens"]
+        if "llm_median_ms" in result:
+            result["llm_latency_saved"] = 1 - result["llm_median_ms"] / full["llm_median_ms"]
+    return results
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(description="measure the QA prompt input tokens (and optionally live LLM latency) for full vs. compact movie contexts")
+    parser.add_argument("--k", type=int, default=10, help="number of retrieved movies passed to the QA prompt")
+    parser.add_argument("--budgets", type=int, nargs="+", default=[300, 600, 1200], help="compact context token budgets to compare")
+    parser.add_argument("--max-movies", type=int, default=5, help="maximum number of movies in a compact context")
+    parser.add_argument("--overview-tokens", type=int, default=48, help="overview truncation length in a compact context")
+    parser.add_argument("--overview-words", type=int, default=60, help="length of the synthetic plot overviews")
+    parser.add_argument("--fields", type=str, default="title,genres,keywords,director,actors,decade", help="metadata fields kept in a compact context")
+    parser.add_argument("--query", type=str, default="gritty crime dramas set in new york", help="search query inserted into the prompt")
+    parser.add_argument("--repeat", type=int, default=100, help="number of timed context builds per variant")
+    parser.add_argument("--live", type=int, default=0, help="number of live chat completions per variant (requires OPENAI_API_KEY)")
+    parser.add_argument("--model", type=str, default="gpt-4-1106-preview", help="chat model for the live completions")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for the synthetic data")
+    parser.add_argument("--output", type=str, help="write results as JSON to this path instead of stdout")
+    args = parser.parse_args()
+
+    report = {"results": run_benchmarks(args)}
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,227 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import tempfile
+import subprocess
+import httpx
+import numpy as np
+
+from argparse import ArgumentParser
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+# NOTE: hack to make the [backend] and [shared] packages importable when running "python -m benchmarks.loadtest" from the repo root
+
+from benchmarks.stubs import deterministic_embedding  # noqa: E402
+from benchmarks.synthetic import GENRES, load_duckdb, make_collab_embeddings, make_movies, make_ratings, make_users, populate_chroma  # noqa: E402
+
+ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+SRC_PATH = os.path.join(ROOT_PATH, "src")
+LOADTEST_PASSWORD = "loadtest"
+SEARCH_QUERIES = [
+    "a gritty crime drama set in new york city",
+    "lighthearted {genre} movies for a family night",
+    "a slow-burn {genre} with a twist ending",
+    "{genre} movies from the 90s",
+    "something like a classic {genre} but more modern"
+]
+
+
+def prepare_environment(workdir: str, args) -> Dict[str, str]:
+    """generate a synthetic DuckDB database and Chroma store and return the backend environment pointing at them"""
+
+    from passlib.context import CryptContext
+    from backend.app import database
+    from backend.app.migrations import migrate
+
+    print(f"generating synthetic data: movies={args.movies} ratings={args.ratings} users={args.users}", file=sys.stderr)
+    movies = make_movies(n_movies=args.movies, seed=args.seed)
+    ratings = make_ratings(n_ratings=args.ratings, n_users=args.users, n_movies=args.movies, seed=args.seed)
+    hashed_password = CryptContext(schemes=["bcrypt"], bcrypt__rounds=args.bcrypt_rounds).hash(LOADTEST_PASSWORD)
+    users = make_users(n_users=args.users, hashed_password=hashed_password)
+
+    database_path = os.path.join(workdir, "database.duckdb")
+    engine = database.get_test_engine(path=database_path)
+    migrate(engine)
+    engine.dispose()
+    load_duckdb(database_path, movies=movies, ratings=ratings, users=users)
+
+    print("populating local chroma collections", file=sys.stderr)
+    chroma_path = os.path.join(workdir, "chroma")
+    collab_embeddings = make_collab_embeddings(movies["tmdb_id"].values, seed=args.seed)
+    populate_chroma(chroma_path, movies=movies, collab_embeddings=collab_embeddings, embed=deterministic_embedding)
+
+    environment = {
+        **os.environ,
+        "PYTHONPATH": SRC_PATH,
+        "DATABASE_URL": f"duckdb:///{database_path}",
+        "CHROMA_PATH": chroma_path,
+        "OPENAI_API_KEY": "sk-loadtest",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.stub_port}/v1",
+        "BCRYPT_ROUNDS": str(args.bcrypt_rounds)
+    }
+    return environment
+
+
+def start_process(command: List[str], environment: Dict[str, str], health_url: str, timeout: float = 120.0) -> subprocess.Popen:
+    """start a server subprocess and block until its health check URL responds"""
+
+    process = subprocess.Popen(command, env=environment, cwd=SRC_PATH)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"process exited with code={process.returncode}: {' '.join(command)}")
+        try:
+            httpx.get(health_url, timeout=1.0)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    process.terminate()
+    raise TimeoutError(f"process did not become healthy within {timeout}s: {' '.join(command)}")
+
+
+def make_request(rng: random.Random, endpoint: str, args) -> Tuple[str, str, dict]:
+    """build a random [method, path, json] request for the given traffic class"""
+
+    user_id = str(rng.randrange(args.users))
+    if endpoint == "search":
+        query = rng.choice(SEARCH_QUERIES).format(genre=rng.choice(GENRES).lower())
+        messages = [{"role": "system", "content": "You are a helpful movie recommendation assistant"}, {"role": "user", "content": query}]
+        payload = {"chat_messages": messages, "user_id": user_id if rng.random() < 0.5 else None}
+        return "POST", "/search/", payload
+    elif endpoint == "recommendations":
+        return "GET", f"/users/{user_id}/recommendations/", None
+    elif endpoint == "ratings":
+        payload = [{"tmdb_id": str(rng.randrange(1, args.movies + 1)), "rating": rng.choice([1.0, 2.5, 3.5, 4.0, 5.0])} for _ in range(5)]
+        return "POST", f"/users/{user_id}/ratings/", payload
+    elif endpoint == "login":
+        payload = {"email": f"user{user_id}@loadtest.com", "password": LOADTEST_PASSWORD}
+        return "POST", "/login/", payload
+    else:
+        raise ValueError(f"unknown endpoint={endpoint}")
+
+
+async def run_stage(base_url: str, concurrency: int, mix: Dict[str, float], args) -> Dict:
+    """drive [concurrency] closed-loop virtual users with mixed traffic for the configured duration"""
+
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    endpoints, weights = list(mix.keys()), list(mix.values())
+    deadline = time.monotonic() + args.duration
+
+    async def virtual_user(index: int, client: httpx.AsyncClient) -> None:
+        rng = random.Random(args.seed * 1_000_003 + index)
+        while time.monotonic() < deadline:
+            endpoint = rng.choices(endpoints, weights=weights)[0]
+            method, path, payload = make_request(rng, endpoint, args)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=payload)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            elapsed = time.perf_counter() - start
+            if failed:
+                errors[endpoint] += 1
+            else:
+                samples[endpoint].append(elapsed)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        start = time.monotonic()
+        await asyncio.gather(*[virtual_user(index, client) for index in range(concurrency)])
+        elapsed = time.monotonic() - start
+
+    endpoints = {}
+    for endpoint in mix:
+        latencies = np.array(samples[endpoint]) * 1000
+        endpoints[endpoint] = {
+            "requests": len(latencies),
+            "errors": errors[endpoint],
+            "throughput_rps": len(latencies) / elapsed,
+            "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+            "p95_ms": float(np.percentile(latencies, 95)) if len(latencies) else None,
+            "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None
+        }
+
+    total = sum(result["requests"] for result in endpoints.values())
+    stage = {"concurrency": concurrency, "duration_s": elapsed, "throughput_rps": total / elapsed, "endpoints": endpoints}
+    return stage
+
+
+def print_stage(stage: Dict) -> None:
+    """print a human-readable summary table for a single concurrency stage"""
+
+    print(f"\nconcurrency={stage['concurrency']} throughput={stage['throughput_rps']:.1f} rps", file=sys.stderr)
+    print(f"{'endpoint':<16} {'requests':>9} {'errors':>7} {'rps':>8} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9}", file=sys.stderr)
+    for endpoint, result in stage["endpoints"].items():
+        percentiles = [f"{result[key]:>9.1f}" if result[key] is not None else f"{'-':>9}" for key in ["p50_ms", "p95_ms", "p99_ms"]]
+        print(f"{endpoint:<16} {result['requests']:>9} {result['errors']:>7} {result['throughput_rps']:>8.1f} {' '.join(percentiles)}", file=sys.stderr)
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """parse a traffic mix string of the form [search=1,recommendations=2,...] into a dictionary of weights"""
+
+    weights = {}
+    for item in mix.split(","):
+        endpoint, weight = item.split("=")
+        weights[endpoint.strip()] = float(weight)
+    return weights
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(description="end-to-end load test of the backend against local OpenAI/Chroma/DuckDB stand-ins")
+    parser.add_argument("--movies", type=int, default=5_000, help="number of synthetic movies in the catalog")
+    parser.add_argument("--ratings", type=int, default=200_000, help="number of synthetic ratings")
+    parser.add_argument("--users", type=int, default=2_000, help="number of synthetic users")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64], help="closed-loop concurrency levels to run in sequence")
+    parser.add_argument("--duration", type=float, default=30.0, help="duration of each concurrency stage in seconds")
+    parser.add_argument("--mix", type=str, default="search=2,recommendations=3,ratings=2,login=1", help="relative traffic weights")
+    parser.add_argument("--timeout", type=float, default=60.0, help="client-side request timeout in seconds")
+    parser.add_argument("--embedding-latency-ms", type=float, default=50.0, help="simulated OpenAI embeddings latency")
+    parser.add_argument("--chat-latency-ms", type=float, default=1500.0, help="simulated OpenAI chat completions latency")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="bcrypt cost factor for the synthetic users' passwords")
+    parser.add_argument("--backend-port", type=int, default=8090)
+    parser.add_argument("--stub-port", type=int, default=8091)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=str, help="write results as JSON to this path instead of stdout")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="robot-ebert-loadtest-")
+    environment = prepare_environment(workdir, args)
+    mix = parse_mix(args.mix)
+
+    stub_command = [
+        sys.executable, "-m", "benchmarks.stubs", "--port", str(args.stub_port),
+        "--embedding-latency-ms", str(args.embedding_latency_ms), "--chat-latency-ms", str(args.chat_latency_ms)
+    ]
+    # NOTE: the backend runs a single worker process since a DuckDB database file only supports one writer process
+    backend_command = [sys.executable, "-m", "uvicorn", "backend.app.main:app", "--port", str(args.backend_port), "--log-level", "warning"]
+
+    processes = []
+    try:
+        stub_environment = {**environment, "PYTHONPATH": os.pathsep.join([ROOT_PATH, SRC_PATH])}
+        processes.append(start_process(stub_command, stub_environment, health_url=f"http://127.0.0.1:{args.stub_port}/docs"))
+        processes.append(start_process(backend_command, environment, health_url=f"http://127.0.0.1:{args.backend_port}/"))
+
+        stages = []
+        for concurrency in args.concurrency:
+            stage = asyncio.run(run_stage(f"http://127.0.0.1:{args.backend_port}", concurrency=concurrency, mix=mix, args=args))
+            print_stage(stage)
+            stages.append(stage)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    report = {"parameters": vars(args), "stages": stages}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,175 @@
+import os
+import sys
+import json
+import asyncio
+import time
+import platform
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+
+from argparse import ArgumentParser
+from datetime import datetime
+from typing import Callable, Dict, List
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+# NOTE: hack to make the [backend] and [shared] packages importable when running "python -m benchmarks.ranking" from the repo root
+
+from benchmarks.synthetic import configure_offline_environment, load_duckdb, make_collab_embeddings, make_movies, make_ratings  # noqa: E402
+
+
+def measure(fn: Callable[[int], object], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """time repeated calls of [fn(iteration)] and summarize the wall-clock latency distribution in milliseconds"""
+
+    for iteration in range(warmup):
+        fn(-iteration - 1)
+
+    timings = []
+    for iteration in range(repeat):
+        start = time.perf_counter()
+        fn(iteration)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings = np.array(timings)
+    summary = {
+        "repeat": repeat,
+        "min_ms": float(timings.min()),
+        "median_ms": float(np.median(timings)),
+        "p95_ms": float(np.percentile(timings, 95)),
+        "mean_ms": float(timings.mean())
+    }
+    return summary
+
+
+def get_metadata(args) -> Dict:
+    """describe the environment so results from different runs/machines can be compared sensibly"""
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    metadata = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parameters": vars(args)
+    }
+    return metadata
+
+
+def run_benchmarks(args) -> List[Dict]:
+    """generate synthetic datasets of increasing size and time the ranking hot paths against each one"""
+
+    workdir = tempfile.mkdtemp(prefix="robot-ebert-bench-")
+    configure_offline_environment(workdir)
+
+    # NOTE: the backend modules must be imported after the offline environment has been configured
+    from backend.app import catalog, database, lib, migrations, registry, routing
+    from backend.app.api import users
+    from shared.models import AddRatingRequest
+
+    engine = database.get_engine()
+    engine_router = routing.EngineRouter(primary=database.ThreadedAsyncEngine(engine))
+    lib.engine = engine
+    lib.engine_router = engine_router
+    users.engine_router = engine_router
+
+    results = []
+    for n_movies in args.movies:
+
+        print(f"generating synthetic data: movies={n_movies} ratings={args.ratings} users={args.users}", file=sys.stderr)
+        movies = make_movies(n_movies=n_movies, seed=args.seed)
+        ratings = make_ratings(n_ratings=args.ratings, n_users=args.users, n_movies=n_movies, seed=args.seed)
+
+        database.metadata.drop_all(engine)
+        migrations.migrations_metadata.drop_all(engine)
+        migrations.migrate(engine)
+        engine.dispose()
+        load_duckdb(os.path.join(workdir, "database.duckdb"), movies=movies, ratings=ratings)
+        collab_embeddings = make_collab_embeddings(movies["tmdb_id"].values, dim=args.dim, seed=args.seed)
+        snapshot = registry.ModelSnapshot(version=f"synthetic-{n_movies}", collab_embeddings=collab_embeddings)
+        lib.model_registry = registry.ModelRegistry(path=None, fallback=lambda: snapshot)
+        lib.movie_catalog = catalog.CatalogCache(loader=lambda: catalog.MovieCatalog.from_engine(engine))
+
+        rng = np.random.default_rng(args.seed)
+        sample_users = rng.choice(ratings["user_id"].unique(), size=args.repeat + 1)
+        sample_movies = [rng.choice(movies["tmdb_id"].values, size=args.k, replace=False) for _ in range(args.repeat + 1)]
+        sample_scores = [pd.Series(rng.uniform(0.7, 0.9, size=args.k), index=tmdb_ids) for tmdb_ids in sample_movies]
+        sample_candidates = [rng.choice(movies["tmdb_id"].values, size=min(lib.RERANK_CANDIDATES, n_movies), replace=False) for _ in range(args.repeat + 1)]
+        sample_pools = [pd.Series(rng.uniform(0.7, 0.9, size=len(tmdb_ids)), index=tmdb_ids) for tmdb_ids in sample_candidates]
+        sample_ratings = [[AddRatingRequest(tmdb_id=tmdb_id, rating=4.0) for tmdb_id in tmdb_ids] for tmdb_ids in sample_movies]
+
+        benchmarks = {
+            "get_user_recs": lambda i: asyncio.run(lib.get_user_recs(user_id=sample_users[i], k=args.k)),
+            "rerank_matches/anonymous": lambda i: asyncio.run(lib.rerank_matches(query_movie_scores=sample_scores[i])),
+            "rerank_matches/personalized": lambda i: asyncio.run(lib.rerank_matches(query_movie_scores=sample_scores[i], user_id=sample_users[i])),
+            "rerank_matches/personalized-wide": lambda i: asyncio.run(
+                lib.rerank_matches(query_movie_scores=sample_pools[i], user_id=sample_users[i], k=args.k)
+            ),
+            "get_movies": lambda i: asyncio.run(lib.get_movies(tmdb_ids=sample_movies[i].tolist())),
+            "add_user_ratings/insert": lambda i: asyncio.run(users.add_user_ratings(user_id=f"bench-{n_movies}-{i}", requests=sample_ratings[i])),
+            "add_user_ratings/update": lambda i: asyncio.run(users.add_user_ratings(user_id=sample_users[0], requests=sample_ratings[0]))
+        }
+
+        for name, fn in benchmarks.items():
+            if args.only and name.split("/")[0] not in args.only:
+                continue
+            print(f"running benchmark: {name} movies={n_movies}", file=sys.stderr)
+            summary = measure(fn, repeat=args.repeat)
+            results.append({"benchmark": name, "n_movies": n_movies, "n_ratings": len(ratings), **summary})
+
+    return results
+
+
+def compare(results: List[Dict], baseline: List[Dict], tolerance: float) -> bool:
+    """print the median latency ratio of each benchmark wrt a baseline run and return whether any regressed past the tolerance"""
+
+    baseline = {(result["benchmark"], result["n_movies"]): result for result in baseline}
+    regressed = False
+
+    print(f"{'benchmark':<30} {'n_movies':>10} {'baseline_ms':>12} {'current_ms':>12} {'ratio':>8}", file=sys.stderr)
+    for result in results:
+        key = (result["benchmark"], result["n_movies"])
+        if key not in baseline:
+            continue
+        ratio = result["median_ms"] / baseline[key]["median_ms"]
+        flag = " REGRESSION" if ratio > 1 + tolerance else ""
+        regressed = regressed or bool(flag)
+        print(f"{key[0]:<30} {key[1]:>10} {baseline[key]['median_ms']:>12.2f} {result['median_ms']:>12.2f} {ratio:>8.2f}{flag}", file=sys.stderr)
+
+    return regressed
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(description="offline micro-benchmarks for the ranking hot paths on synthetic data")
+    parser.add_argument("--movies", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="catalog sizes to benchmark")
+    parser.add_argument("--ratings", type=int, default=1_000_000, help="number of synthetic ratings to generate")
+    parser.add_argument("--users", type=int, default=20_000, help="number of synthetic users to spread the ratings across")
+    parser.add_argument("--dim", type=int, default=32, help="dimension of the synthetic collaborative filtering embeddings")
+    parser.add_argument("--k", type=int, default=10, help="number of recommendations/matches per request")
+    parser.add_argument("--repeat", type=int, default=10, help="number of timed iterations per benchmark")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for the synthetic data")
+    parser.add_argument("--only", type=str, nargs="*", help="only run benchmarks with these names")
+    parser.add_argument("--output", type=str, help="write results as JSON to this path instead of stdout")
+    parser.add_argument("--baseline", type=str, help="compare against the results of a previous run")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown in median latency vs. the baseline")
+    args = parser.parse_args()
+
+    report = {"metadata": get_metadata(args), "results": run_benchmarks(args)}
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        if compare(report["results"], baseline, tolerance=args.tolerance):
+            sys.exit(1)
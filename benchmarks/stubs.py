@@ -0,0 +1,107 @@
+import re
+import time
+import base64
+import asyncio
+import hashlib
+import uvicorn
+import numpy as np
+
+from argparse import ArgumentParser
+from typing import List, Union
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+CONTENT_DIMENSION = 1536
+
+
+def deterministic_embedding(text: str, dim: int = CONTENT_DIMENSION) -> np.ndarray:
+    """generate a unit-norm pseudo-random embedding vector seeded by the text so repeated inputs map to the same vector"""
+
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    embedding = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return embedding / np.linalg.norm(embedding)
+
+
+class EmbeddingRequest(BaseModel):
+    input: Union[str, List[str], List[int], List[List[int]]]
+    model: str
+    encoding_format: str = "float"
+
+
+class ChatCompletionMessage(BaseModel):
+    role: str
+    content: str = ""
+
+
+class ChatCompletionRequest(BaseModel):
+    messages: List[ChatCompletionMessage]
+    model: str
+
+
+def create_app(embedding_latency: float = 0.0, chat_latency: float = 0.0) -> FastAPI:
+    """create a stand-in for the subset of the OpenAI API used by the backend with a configurable response latency"""
+
+    app = FastAPI()
+
+    @app.post("/v1/embeddings")
+    async def create_embeddings(request: EmbeddingRequest) -> dict:
+        """return deterministic unit vectors for each input"""
+
+        await asyncio.sleep(embedding_latency)
+        inputs = [request.input] if isinstance(request.input, str) or isinstance(request.input[0], int) else request.input
+
+        data = []
+        for index, text in enumerate(inputs):
+            embedding = deterministic_embedding(str(text))
+            if request.encoding_format == "base64":
+                embedding = base64.b64encode(embedding.astype("<f4").tobytes()).decode("ascii")
+            else:
+                embedding = embedding.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+
+        n_tokens = sum(len(str(text).split()) for text in inputs)
+        response = {"object": "list", "data": data, "model": request.model, "usage": {"prompt_tokens": n_tokens, "total_tokens": n_tokens}}
+        return response
+
+    @app.post("/v1/chat/completions")
+    async def create_chat_completion(request: ChatCompletionRequest) -> dict:
+        """echo the current message for condense-question prompts and return a templated answer otherwise"""
+
+        await asyncio.sleep(chat_latency)
+        prompt = request.messages[-1].content
+
+        condense_match = re.search(r"CURRENT_MESSAGE:\s*(.*?)\s*STANDALONE_QUERY:", prompt, flags=re.DOTALL)
+        query_match = re.search(r"SEARCH_QUERY:\s*(.*?)\s*RECOMMENDED_MOVIES:", prompt, flags=re.DOTALL)
+        if condense_match:
+            content = condense_match.group(1)
+        elif query_match:
+            content = f'Here are the top results for "{query_match.group(1)}".\n\nTo further refine your search try adding a director or actor.'
+        else:
+            content = "ok"
+
+        n_prompt_tokens = sum(len(message.content.split()) for message in request.messages)
+        n_completion_tokens = len(content.split())
+        response = {
+            "id": f"chatcmpl-{hashlib.md5(prompt.encode('utf-8')).hexdigest()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": n_prompt_tokens, "completion_tokens": n_completion_tokens, "total_tokens": n_prompt_tokens + n_completion_tokens}
+        }
+        return response
+
+    return app
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(description="local stand-in for the OpenAI embeddings and chat completions APIs")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--embedding-latency-ms", type=float, default=50.0, help="simulated latency of each embeddings request")
+    parser.add_argument("--chat-latency-ms", type=float, default=1500.0, help="simulated latency of each chat completions request")
+    args = parser.parse_args()
+
+    app = create_app(embedding_latency=args.embedding_latency_ms / 1000, chat_latency=args.chat_latency_ms / 1000)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
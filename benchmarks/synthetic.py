@@ -0,0 +1,188 @@
+import os
+import duckdb
+import numpy as np
+import pandas as pd
+
+from datetime import date, datetime
+from typing import Callable, List, Optional
+from pandas import DataFrame
+
+LANGUAGES = ["en", "fr", "es", "de", "it", "ja", "ko", "zh", "hi", "sv"]
+GENRES = [
+    "Action", "Adventure", "Animation", "Comedy", "Crime", "Documentary", "Drama", "Family", "Fantasy", "History",
+    "Horror", "Music", "Mystery", "Romance", "Science Fiction", "TV Movie", "Thriller", "War", "Western"
+]
+RATING_VALUES = np.arange(1.0, 5.5, 0.5)
+
+
+def make_movies(n_movies: int, seed: int = 0) -> DataFrame:
+    """generate a synthetic catalog of movies matching the [movies] table schema"""
+
+    rng = np.random.default_rng(seed)
+    tmdb_ids = np.arange(1, n_movies + 1).astype(str)
+
+    n_people = max(n_movies // 4, 10)
+    actor_ids = rng.integers(0, n_people, size=(n_movies, 5))
+    genre_ids = rng.integers(0, len(GENRES), size=(n_movies, 2))
+    keyword_ids = rng.integers(0, 1000, size=(n_movies, 3))
+    release_days = rng.integers(0, 365 * 100, size=n_movies)
+
+    movies = DataFrame({
+        "tmdb_id": tmdb_ids,
+        "tmdb_homepage": [f"https://www.themoviedb.org/movie/{tmdb_id}" for tmdb_id in tmdb_ids],
+        "title": [f"movie {tmdb_id}" for tmdb_id in tmdb_ids],
+        "language": rng.choice(LANGUAGES, size=n_movies),
+        "release_date": pd.Timestamp(date(1924, 1, 1)) + pd.to_timedelta(release_days, unit="D"),
+        "runtime": rng.integers(60, 200, size=n_movies),
+        "director": [f"director {i}" for i in rng.integers(0, n_people, size=n_movies)],
+        "actors": [[f"actor {i}" for i in row] for row in actor_ids],
+        "genres": [sorted({GENRES[i] for i in row}) for row in genre_ids],
+        "keywords": [[f"keyword {i}" for i in row] for row in keyword_ids],
+        "overview": [f"a synthetic plot overview for movie {tmdb_id}" for tmdb_id in tmdb_ids],
+        "budget": rng.integers(0, 200_000_000, size=n_movies),
+        "revenue": rng.integers(0, 1_000_000_000, size=n_movies),
+        "popularity": rng.exponential(10.0, size=n_movies),
+        "vote_average": rng.uniform(1.0, 10.0, size=n_movies),
+        "vote_count": rng.integers(0, 20_000, size=n_movies),
+        "updated_at": datetime.now()
+    })
+    movies["release_date"] = movies["release_date"].dt.date
+    return movies
+
+
+def make_ratings(n_ratings: int, n_users: int, n_movies: int, seed: int = 0) -> DataFrame:
+    """generate synthetic user ratings with popularity-skewed movie selection matching the [ratings] table schema"""
+
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, n_movies + 1) ** 0.8
+    popularity = popularity / popularity.sum()
+
+    # oversample [user, movie] pairs until there are enough unique pairs to satisfy the primary key
+    ratings = DataFrame(columns=["user_id", "tmdb_id"])
+    while len(ratings) < n_ratings:
+        batch = DataFrame({
+            "user_id": rng.integers(0, n_users, size=n_ratings).astype(str),
+            "tmdb_id": (rng.choice(n_movies, size=n_ratings, p=popularity) + 1).astype(str)
+        })
+        ratings = pd.concat([ratings, batch]).drop_duplicates(subset=["user_id", "tmdb_id"])
+
+    ratings = ratings.iloc[:n_ratings].reset_index(drop=True)
+    ratings["rating"] = rng.choice(RATING_VALUES, size=len(ratings))
+    ratings["updated_at"] = datetime.now()
+    return ratings
+
+
+def make_users(n_users: int, hashed_password: str) -> DataFrame:
+    """generate synthetic users matching the [ratings] user IDs which all share the same (pre-hashed) password"""
+
+    user_ids = np.arange(n_users).astype(str)
+    users = DataFrame({
+        "user_id": user_ids,
+        "email": [f"user{user_id}@loadtest.com" for user_id in user_ids],
+        "hashed_password": hashed_password,
+        "fname": "load",
+        "lname": "test",
+        "updated_at": datetime.now()
+    })
+    return users
+
+
+def make_collab_embeddings(tmdb_ids: np.ndarray, dim: int = 32, seed: int = 0) -> DataFrame:
+    """generate a synthetic collaborative filtering embedding matrix indexed by [tmdb_id]"""
+
+    rng = np.random.default_rng(seed)
+    embeddings = DataFrame(data=rng.standard_normal(size=(len(tmdb_ids), dim)), index=pd.Index(tmdb_ids))
+    return embeddings
+
+
+def load_duckdb(path: str, movies: DataFrame, ratings: DataFrame, users: Optional[DataFrame] = None) -> None:
+    """bulk load synthetic [movies], [ratings] and [users] into an existing DuckDB database using the native DataFrame scan"""
+
+    tables = {"movies": movies, "ratings": ratings, "users": users}
+    cnx = duckdb.connect(path)
+    try:
+        for table, frame in tables.items():
+            if frame is None:
+                continue
+            cnx.register(f"{table}_frame", frame)
+            cnx.execute(f"DELETE FROM {table}")
+            cnx.execute(f"INSERT INTO {table} ({', '.join(frame.columns)}) SELECT * FROM {table}_frame")
+        cnx.execute("CHECKPOINT")
+    finally:
+        cnx.close()
+
+
+def make_content_nodes(movies: DataFrame) -> List:
+    """build the [movies-content] text nodes for a catalog the same way as notebooks/create-embeddings.ipynb"""
+
+    from llama_index.schema import TextNode
+
+    embed_metadata_keys = ["genres", "keywords", "director", "actors", "decade"]
+    excluded_llm_metadata_keys = ["tmdb_homepage", "tmdb_id", "updated_at"]
+
+    nodes = []
+    for movie in movies.drop(columns=["updated_at"]).to_dict(orient="records"):
+        metadata = movie.copy()
+        text = metadata.pop("overview")
+        metadata["release_date"] = str(metadata["release_date"])
+        metadata["actors"] = ", ".join(metadata["actors"])
+        metadata["genres"] = ", ".join(metadata["genres"])
+        metadata["keywords"] = ", ".join(metadata["keywords"])
+        metadata["decade"] = metadata["release_date"][:3] + "0s"
+        metadata = {key: val.item() if isinstance(val, np.generic) else val for key, val in metadata.items()}
+        node = TextNode(
+            text=text,
+            metadata=metadata,
+            excluded_embed_metadata_keys=sorted(set(metadata.keys()) - set(embed_metadata_keys)),
+            excluded_llm_metadata_keys=excluded_llm_metadata_keys,
+            text_template="{metadata_str}\nplot overview: {content}"
+        )
+        node.id_ = metadata["tmdb_id"]
+        nodes.append(node)
+    return nodes
+
+
+def populate_chroma(path: str, movies: DataFrame, collab_embeddings: DataFrame, embed: Callable[[str], np.ndarray], batch_size: int = 1000) -> None:
+    """create the [movies-content] and [movies-collab] collections the same way as notebooks/create-embeddings.ipynb"""
+
+    import chromadb
+    from llama_index.schema import MetadataMode
+    from llama_index.vector_stores.utils import node_to_metadata_dict
+
+    chroma_client = chromadb.PersistentClient(path=path)
+    for name in ["movies-content", "users-collab", "movies-collab"]:
+        try:
+            chroma_client.delete_collection(name=name)
+        except ValueError:
+            pass
+    movies_content_collection = chroma_client.create_collection(name="movies-content", metadata={"hnsw:space": "cosine"})
+    movies_collab_collection = chroma_client.create_collection(name="movies-collab", metadata={"hnsw:space": "cosine"})
+    chroma_client.create_collection(name="users-collab", metadata={"hnsw:space": "cosine"})
+
+    for start in range(0, len(movies), batch_size):
+        nodes = make_content_nodes(movies.iloc[start:start + batch_size])
+        movies_content_collection.add(
+            ids=[node.node_id for node in nodes],
+            embeddings=[embed(node.get_content(metadata_mode=MetadataMode.EMBED)).tolist() for node in nodes],
+            documents=[node.get_content() for node in nodes],
+            metadatas=[node_to_metadata_dict(node, remove_text=True, flat_metadata=True) for node in nodes]
+        )
+
+    for start in range(0, len(collab_embeddings), batch_size):
+        batch = collab_embeddings.iloc[start:start + batch_size]
+        movies_collab_collection.add(ids=batch.index.tolist(), embeddings=batch.values.tolist())
+
+
+def configure_offline_environment(workdir: str) -> None:
+    """point the backend at local stand-ins so [backend.app.constants] imports without live OpenAI/Chroma/CloudSQL access"""
+
+    import chromadb
+
+    chroma_path = os.path.join(workdir, "chroma")
+    chroma_client = chromadb.PersistentClient(path=chroma_path)
+    for name in ["movies-content", "users-collab", "movies-collab"]:
+        chroma_client.get_or_create_collection(name=name)
+
+    os.environ["CHROMA_PATH"] = chroma_path
+    os.environ["DATABASE_URL"] = f"duckdb:///{os.path.join(workdir, 'database.duckdb')}"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
@@ -0,0 +1,190 @@
+import os
+import math
+import time
+import asyncio
+
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+from prometheus_client import Counter, Gauge
+from starlette.requests import Request
+
+ADMISSION_LLM_CONCURRENCY = int(os.environ.get("ADMISSION_LLM_CONCURRENCY", "8"))
+ADMISSION_LLM_QUEUE = int(os.environ.get("ADMISSION_LLM_QUEUE", "32"))
+ADMISSION_LLM_PER_USER = int(os.environ.get("ADMISSION_LLM_PER_USER", "2"))
+ADMISSION_STANDARD_CONCURRENCY = int(os.environ.get("ADMISSION_STANDARD_CONCURRENCY", "64"))
+ADMISSION_STANDARD_QUEUE = int(os.environ.get("ADMISSION_STANDARD_QUEUE", "256"))
+ADMISSION_STANDARD_PER_USER = int(os.environ.get("ADMISSION_STANDARD_PER_USER", "16"))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "10"))
+ADMISSION_MAX_RETRY_AFTER = 60
+USER_HEADER = "X-User-Id"
+CLIENT_HEADER = "X-Client-Id"
+
+
+admission_in_flight = Gauge("admission_in_flight", "requests currently admitted by budget", ["budget"])
+admission_queue_depth = Gauge("admission_queue_depth", "requests waiting for admission by budget", ["budget"])
+admission_shed_total = Counter("admission_shed_total", "requests rejected by admission control by budget and reason", ["budget", "reason"])
+
+
+class AdmissionRejected(Exception):
+    """raised when a request is shed rather than admitted"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """concurrency limit for a class of routes with a bounded wait queue served round-robin across clients
+
+    requests over a client's own limit are rejected with a 429 and requests which find the queue full (or time out
+    waiting in it) are rejected with a 503 so an overloaded instance fails fast rather than queueing everything
+    """
+
+    def __init__(self, budget: str, concurrency: int, max_queue: int, per_user: int, queue_timeout: float = ADMISSION_QUEUE_TIMEOUT) -> None:
+        self.budget = budget
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.per_user = per_user
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.queued = 0
+        self.service_seconds = 1.0
+        self._clients: Dict[str, int] = {}
+        self._waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+    def retry_after(self) -> int:
+        """estimate the seconds until a slot frees up from the average service time and the queue ahead"""
+
+        waves = (self.queued + 1) / self.concurrency
+        return max(1, min(ADMISSION_MAX_RETRY_AFTER, math.ceil(self.service_seconds * waves)))
+
+    def _shed(self, reason: str, status_code: int, detail: str) -> AdmissionRejected:
+        admission_shed_total.labels(self.budget, reason).inc()
+        return AdmissionRejected(status_code=status_code, detail=detail, retry_after=self.retry_after())
+
+    def _update_gauges(self) -> None:
+        admission_in_flight.labels(self.budget).set(self.active)
+        admission_queue_depth.labels(self.budget).set(self.queued)
+
+    def _forget(self, client: str) -> None:
+        self._clients[client] -= 1
+        if self._clients[client] == 0:
+            del self._clients[client]
+
+    async def acquire(self, client: str) -> None:
+        """wait for a slot for the client raising AdmissionRejected if the request should be shed instead"""
+
+        if self._clients.get(client, 0) >= self.per_user:
+            raise self._shed("per_user", 429, f"too many concurrent {self.budget} requests for this user, please retry")
+
+        self._clients[client] = self._clients.get(client, 0) + 1
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self._update_gauges()
+            return
+
+        if self.queued >= self.max_queue:
+            self._forget(client)
+            raise self._shed("queue_full", 503, f"too many concurrent {self.budget} requests, please retry")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(client, deque()).append(future)
+        self.queued += 1
+        self._update_gauges()
+
+        try:
+            await asyncio.wait({future}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # the client went away while waiting: give the slot back if it was granted in the meantime
+            self._abandon(client, future)
+            raise
+
+        if not future.done():
+            self._abandon(client, future)
+            raise self._shed("timeout", 503, f"timed out waiting for a {self.budget} request slot, please retry")
+
+    def _abandon(self, client: str, future: asyncio.Future) -> None:
+        if future.done():
+            self.release(client)
+            return
+        future.cancel()
+        self._waiters[client].remove(future)
+        if not self._waiters[client]:
+            del self._waiters[client]
+        self.queued -= 1
+        self._forget(client)
+        self._update_gauges()
+
+    def release(self, client: str, elapsed: Optional[float] = None) -> None:
+        """free the client's slot and hand it to the next waiting client in round-robin order"""
+
+        self.active -= 1
+        self._forget(client)
+        if elapsed is not None:
+            self.service_seconds = 0.9 * self.service_seconds + 0.1 * elapsed
+
+        while self.active < self.concurrency and self._waiters:
+            next_client, waiters = next(iter(self._waiters.items()))
+            future = waiters.popleft()
+            # rotate the client to the back so each client gets a turn before any client gets a second one
+            del self._waiters[next_client]
+            if waiters:
+                self._waiters[next_client] = waiters
+            self.queued -= 1
+            self.active += 1
+            future.set_result(None)
+        self._update_gauges()
+
+    @asynccontextmanager
+    async def admit(self, client: str) -> AsyncIterator[None]:
+        """hold a slot for the duration of the block"""
+
+        await self.acquire(client)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(client, elapsed=time.perf_counter() - start)
+
+
+def get_client_key(request: Request) -> str:
+    """identify the client for per-user fairness by the user ID header, then the (anonymous) per-browser-session client ID
+    header, falling back to the originating IP address for clients which send neither
+    """
+
+    user_id = request.headers.get(USER_HEADER)
+    if user_id:
+        return f"user:{user_id}"
+
+    # NOTE: anonymous users all reach the backend from the frontend server so they can only be told apart by client ID
+    client_id = request.headers.get(CLIENT_HEADER)
+    if client_id:
+        return f"client:{client_id}"
+
+    # NOTE: fairness is best-effort so the (spoofable) first X-Forwarded-For hop is good enough
+    forwarded_for = request.headers.get("X-Forwarded-For")
+    if forwarded_for:
+        return f"ip:{forwarded_for.split(',')[0].strip()}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+llm_limiter = AdmissionLimiter("llm", concurrency=ADMISSION_LLM_CONCURRENCY, max_queue=ADMISSION_LLM_QUEUE, per_user=ADMISSION_LLM_PER_USER)
+standard_limiter = AdmissionLimiter(
+    "standard",
+    concurrency=ADMISSION_STANDARD_CONCURRENCY,
+    max_queue=ADMISSION_STANDARD_QUEUE,
+    per_user=ADMISSION_STANDARD_PER_USER
+)
+
+
+def get_limiter(path: str) -> Optional[AdmissionLimiter]:
+    """get the admission budget for a request path: LLM-backed search, LLM-free API routes, or none for operational routes"""
+
+    if path == "/search/" or (path.startswith("/sessions/") and path.endswith("/search/")):
+        return llm_limiter
+    if path in ("/", "/metrics") or path.startswith("/admin/"):
+        return None
+    return standard_limiter
@@ -0,0 +1,90 @@
+from typing import List
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from backend.app.constants import model_registry
+from backend.app.memory import memory_tracker
+from backend.app.profiling import profiler
+from shared.models import MemoryAllocation, MemoryComponent, MemoryReport, ModelVersion, ProfileSummary
+
+
+router = APIRouter()
+
+
+@router.get("/admin/profiles/")
+def list_profiles() -> List[ProfileSummary]:
+    """list the request profiles currently held in the ring buffer (most recent first)"""
+
+    profiles = [
+        ProfileSummary(
+            profile_id=profile.profile_id,
+            method=profile.method,
+            path=profile.path,
+            trigger=profile.trigger,
+            started_at=profile.started_at,
+            duration_ms=profile.duration_ms,
+            samples=profile.samples
+        )
+        for profile in reversed(profiler.profiles)
+    ]
+    return profiles
+
+
+@router.get("/admin/profiles/{profile_id}/", response_class=PlainTextResponse)
+def get_profile(profile_id: str) -> str:
+    """download a request profile as folded stacks for flamegraph.pl/speedscope/inferno"""
+
+    profile = profiler.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"profile with profile_id={profile_id} not found")
+    return profile.folded()
+
+
+@router.get("/admin/models/")
+def get_model_version() -> ModelVersion:
+    """get the version and load time of the active model snapshot"""
+
+    snapshot = model_registry.get()
+    model_version = ModelVersion(
+        version=snapshot.version,
+        created_at=snapshot.created_at,
+        loaded_at=snapshot.loaded_at,
+        load_seconds=snapshot.load_seconds,
+        collab_movies=len(snapshot.collab_embeddings),
+        content_index_movies=len(snapshot.content_index) if snapshot.content_index is not None else None,
+        catalog_stats=snapshot.catalog_stats
+    )
+    return model_version
+
+
+@router.post("/admin/models/check/")
+def check_model_version() -> ModelVersion:
+    """load and swap in the registry's current model snapshot now rather than waiting for the next poll"""
+
+    model_registry.check()
+    return get_model_version()
+
+
+@router.get("/admin/memory/")
+def get_memory_report() -> MemoryReport:
+    """take a memory snapshot reporting the process RSS and the size of each major in-memory structure along with their
+    growth since the previous snapshot (and the fastest-growing allocation sites if MEMORY_TRACEMALLOC_FRAMES is set)
+    """
+
+    snapshot = memory_tracker.snapshot()
+    memory_report = MemoryReport(
+        taken_at=snapshot.taken_at,
+        rss_bytes=snapshot.rss_bytes,
+        rss_growth_bytes=snapshot.rss_growth_bytes,
+        attributed_bytes=snapshot.attributed_bytes,
+        measure_seconds=snapshot.measure_seconds,
+        components=[
+            MemoryComponent(component=component, bytes=size, growth_bytes=snapshot.component_growth_bytes.get(component))
+            for component, size in sorted(snapshot.components.items(), key=lambda x: x[1], reverse=True)
+        ],
+        allocations=[
+            MemoryAllocation(location=allocation.location, size_bytes=allocation.size_bytes, growth_bytes=allocation.growth_bytes, count=allocation.count)
+            for allocation in snapshot.allocations
+        ]
+    )
+    return memory_report
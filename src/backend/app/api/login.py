@@ -1,31 +1,35 @@
 from fastapi import APIRouter, HTTPException
 from sqlalchemy import insert, select, update, delete
 from sqlalchemy.exc import NoResultFound
-from passlib.context import CryptContext
 
 from backend.app import database
-from backend.app.constants import engine
+from backend.app.constants import engine_router
+from backend.app.profiling import ProfiledRoute
+from backend.app.security import PasswordPoolFull, password_pool
 from shared.models import LoginRequest, User
 
 
-router = APIRouter()
-password_context = CryptContext(schemes=["bcrypt"])
+router = APIRouter(route_class=ProfiledRoute)
 
 
 @router.post("/login/")
-def login_user(login_request: LoginRequest) -> str:
+async def login_user(login_request: LoginRequest) -> str:
     """authenticate a user login request returning the corresponding user_id"""
 
     # select the user record corresponding to the login request
     try:
-        with engine.begin() as cnx:
+        async with engine_router.primary.begin() as cnx:
             statement = select(database.users).where(database.users.c.email == login_request.email)
-            user = User(**cnx.execute(statement).one()._asdict())
+            user = User(**(await cnx.execute(statement)).one()._asdict())
     except NoResultFound:
         raise HTTPException(status_code=400, detail=f"user account with email={login_request.email} not found")
 
     # verify that the user's stored password matches the login request's password and return the user_id
-    verified = password_context.verify(login_request.password, user.hashed_password)
+    try:
+        verified = await password_pool.averify(login_request.password, user.hashed_password)
+    except PasswordPoolFull:
+        raise HTTPException(status_code=503, detail="too many concurrent login requests, please retry", headers={"Retry-After": "1"})
+
     if verified:
         return user.user_id
     else:
@@ -1,53 +1,67 @@
 from datetime import datetime
-from fastapi import APIRouter
+from typing import Optional
+from fastapi import APIRouter, Header, Response
 from sqlalchemy import insert, select, update, delete
 from sqlalchemy.exc import NoResultFound
 
 from backend.app import database
-from backend.app.constants import engine
+from backend.app.constants import engine_router
+from backend.app.etags import check_not_modified, make_etag, tag_response
+from backend.app.profiling import ProfiledRoute
 from shared.models import Movie
 
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 
 @router.post("/movies/")
-def create_movie(movie: Movie) -> str:
+async def create_movie(movie: Movie) -> str:
     """create a new movie"""
 
-    with engine.begin() as cnx:
+    async with engine_router.writer().begin() as cnx:
         statement = insert(
             database.movies
         ).values(
             updated_at=datetime.now(),
             **movie.dict()
         )
-        cnx.execute(statement)
+        await cnx.execute(statement)
         return movie.tmdb_id
 
 
 @router.get("/movies/{tmdb_id}/")
-def get_movie(tmdb_id: str) -> Movie:
-    """get an existing movie by ID"""
+async def get_movie(tmdb_id: str, response: Response, if_none_match: Optional[str] = Header(None)) -> Movie:
+    """get an existing movie by ID responding with a 304 if the client's ETag (derived from [updated_at]) is still current"""
+
+    async with engine_router.reader().begin() as cnx:
+
+        # check only the movie's version before reading the full row for conditional requests
+        if if_none_match:
+            statement = select(database.movies.c.updated_at).where(database.movies.c.tmdb_id == tmdb_id)
+            updated_at = (await cnx.execute(statement)).scalar_one()
+            not_modified = check_not_modified("movie", if_none_match, make_etag("movie", tmdb_id, updated_at))
+            if not_modified is not None:
+                return not_modified
 
-    with engine.begin() as cnx:
         statement = select(
             database.movies
         ).where(
             database.movies.c.tmdb_id == tmdb_id
         )
-        movie = Movie(**cnx.execute(statement).one()._asdict())
+        row = (await cnx.execute(statement)).one()
+        tag_response(response, make_etag("movie", tmdb_id, row.updated_at))
+        movie = Movie(**row._asdict())
         return movie
 
 
 @router.put("/movies/{tmdb_id}/")
-def update_movie(tmdb_id: str, movie: Movie) -> None:
+async def update_movie(tmdb_id: str, movie: Movie) -> None:
     """update an existing movie by ID"""
 
     movie_data = movie.dict()
     del movie_data["tmdb_id"]
 
-    with engine.begin() as cnx:
+    async with engine_router.writer().begin() as cnx:
         statement = update(
             database.movies
         ).where(
@@ -56,17 +70,17 @@ def update_movie(tmdb_id: str, movie: Movie) -> None:
             updated_at=datetime.now(),
             **movie_data
         )
-        cnx.execute(statement)
+        await cnx.execute(statement)
 
 
 @router.delete("/movies/{tmdb_id}/")
-def delete_movie(tmdb_id: str) -> None:
+async def delete_movie(tmdb_id: str) -> None:
     """delete an existing movie by ID"""
 
-    with engine.begin() as cnx:
+    async with engine_router.writer().begin() as cnx:
         statement = delete(
             database.movies
         ).where(
             database.movies.c.tmdb_id == tmdb_id
         )
-        cnx.execute(statement)
+        await cnx.execute(statement)
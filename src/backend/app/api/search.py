@@ -3,15 +3,32 @@ from typing import List, Tuple
 from uuid import uuid4
 
 from shared.models import SearchRequest, SearchResponse
+from backend.app.coalescing import SingleFlight, request_key
+from backend.app.deadlines import Deadline
 from backend.app.lib import run_search
+from backend.app.profiling import ProfiledRoute
 
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+search_flight = SingleFlight("search")
 
 
 @router.post("/search/")
-def search(search_request: SearchRequest) -> SearchResponse:
+async def search(search_request: SearchRequest) -> SearchResponse:
     """search for movies using a natural language query"""
 
-    search_response = run_search(chat_messages=search_request.chat_messages, user_id=search_request.user_id)
+    # the latency budget starts now: LLM stages which can't finish within it fall back rather than delay the response
+    deadline = Deadline.from_ms(search_request.deadline_ms)
+
+    # identical concurrent searches (e.g. a trending query) share a single computation and LLM call
+    search_response = await search_flight.ado(
+        request_key(search_request),
+        run_search,
+        chat_messages=search_request.chat_messages,
+        user_id=search_request.user_id,
+        k=search_request.k,
+        filters=search_request.filters,
+        context_tokens=search_request.context_tokens,
+        deadline=deadline
+    )
     return search_response
@@ -0,0 +1,78 @@
+from fastapi import APIRouter, HTTPException
+from llama_index.llms import ChatMessage, MessageRole
+
+from backend.app.constants import engine_router
+from backend.app.deadlines import Deadline
+from backend.app.lib import run_session_search
+from backend.app.profiling import ProfiledRoute
+from backend.app.sessions import SESSION_HISTORY_MESSAGES, SessionConflict, append_turn, create_session, delete_session, get_recent_messages, get_session
+from backend.app.telemetry import stage, timed_abegin
+from shared.models import ConversationSession, CreateSessionRequest, SearchResponse, SessionSearchRequest
+
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+@router.post("/sessions/")
+async def create_conversation_session(session_request: CreateSessionRequest) -> ConversationSession:
+    """create a new server-side conversation session for search"""
+
+    async with engine_router.writer(session_request.user_id).begin() as cnx:
+        session = await create_session(cnx, user_id=session_request.user_id)
+        return session
+
+
+@router.get("/sessions/{session_id}/")
+async def get_conversation_session(session_id: str) -> ConversationSession:
+    """get an existing conversation session by ID including its full message history"""
+
+    async with engine_router.primary.begin() as cnx:
+        session = await get_session(cnx, session_id=session_id, include_messages=True)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"session with session_id={session_id} not found")
+    return session
+
+
+@router.delete("/sessions/{session_id}/")
+async def delete_conversation_session(session_id: str) -> None:
+    """delete an existing conversation session by ID"""
+
+    async with engine_router.primary.begin() as cnx:
+        await delete_session(cnx, session_id=session_id)
+
+
+@router.post("/sessions/{session_id}/search/")
+async def search_conversation_session(session_id: str, search_request: SessionSearchRequest) -> SearchResponse:
+    """search for movies using the next natural language message of a conversation session"""
+
+    deadline = Deadline.from_ms(search_request.deadline_ms)
+
+    # load the previous standalone query and only the most recent messages rather than the full transcript
+    with stage("session_lookup"):
+        async with timed_abegin(engine_router.primary) as cnx:
+            session = await get_session(cnx, session_id=session_id)
+            if session is None:
+                raise HTTPException(status_code=404, detail=f"session with session_id={session_id} not found")
+            recent_messages = await get_recent_messages(cnx, session_id=session_id, limit=SESSION_HISTORY_MESSAGES)
+
+    # NOTE: no database connection is held open while the LLM calls run
+    user_id = search_request.user_id or session.user_id
+    search_response = await run_session_search(
+        message=search_request.message,
+        previous_query=session.standalone_query,
+        recent_messages=recent_messages,
+        user_id=user_id,
+        k=search_request.k,
+        filters=search_request.filters,
+        context_tokens=search_request.context_tokens,
+        deadline=deadline
+    )
+
+    messages = [ChatMessage(role=MessageRole.USER, content=search_request.message), ChatMessage(role=MessageRole.ASSISTANT, content=search_response.message)]
+    try:
+        async with engine_router.writer(user_id).begin() as cnx:
+            await append_turn(cnx, session=session, messages=messages, standalone_query=search_response.standalone_query)
+    except SessionConflict:
+        raise HTTPException(status_code=409, detail=f"session with session_id={session_id} was updated by a concurrent search, please retry")
+
+    return search_response
@@ -1,37 +1,47 @@
 
 from uuid import uuid4
 from datetime import datetime
-from typing import List
-from fastapi import APIRouter, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Header, HTTPException, Response, status
 from sqlalchemy import insert, select, update, delete
-from sqlalchemy.exc import DatabaseError
-from passlib.context import CryptContext
+from sqlalchemy.exc import DatabaseError, IntegrityError
 
 from backend.app import database
-from backend.app.constants import engine
-from backend.app.lib import get_user_recs
+from backend.app.coalescing import SingleFlight, request_key
+from backend.app.constants import engine_router, model_registry
+from backend.app.etags import bump_ratings_version, check_not_modified, get_ratings_version, make_etag, tag_response
+from backend.app.lib import get_recommendations, get_user_recs
+from backend.app.profiling import ProfiledRoute
+from backend.app.recommendations import RECS_TOP_N, aget_materialized_recs, recs_served_total
+from backend.app.security import PasswordPoolFull, password_pool
+from backend.app.telemetry import stage, timed_abegin
 from shared.models import AddUserRequest, UpdateUserRequest, User, DisplayRating, AddRatingRequest, AddRatingsResponse, Recommendation
 
 
-router = APIRouter()
-password_context = CryptContext(schemes=["bcrypt"])
+router = APIRouter(route_class=ProfiledRoute)
+recommendations_flight = SingleFlight("recommendations")
 
 
 @router.post("/users/")
-def create_user(user_request: AddUserRequest) -> str:
+async def create_user(user_request: AddUserRequest) -> str:
     """create a new user"""
 
-    with engine.begin() as cnx:
+    # hash the user's password for storage in the password pool before holding open a database connection
+    try:
+        hashed_password = await password_pool.ahash(user_request.password)
+    except PasswordPoolFull:
+        raise HTTPException(status_code=503, detail="too many concurrent signup requests, please retry", headers={"Retry-After": "1"})
+
+    async with engine_router.writer().begin() as cnx:
 
         # check to make sure there's not already an existing user with the same email
         statement = select(database.users).where(database.users.c.email == user_request.email)
-        result = cnx.execute(statement).all()
+        result = (await cnx.execute(statement)).all()
         if result:
             raise HTTPException(status_code=400, detail=f"a user with email={user_request.email} already exists!")
 
-        # generate a random user_id and hash the user's password for storage
+        # generate a random user_id for the new user
         user_id = str(uuid4())
-        hashed_password = password_context.hash(user_request.password)
 
         # insert a new user record into the database
         statement = insert(
@@ -45,29 +55,33 @@ def create_user(user_request: AddUserRequest) -> str:
             updated_at=datetime.now()
         )
 
-        cnx.execute(statement)
+        # NOTE: a concurrent signup with the same email can pass the check above so the unique index has the final say
+        try:
+            await cnx.execute(statement)
+        except IntegrityError:
+            raise HTTPException(status_code=400, detail=f"a user with email={user_request.email} already exists!")
         return user_id
 
 
 @router.get("/users/{user_id}/")
-def get_user(user_id: str) -> User:
+async def get_user(user_id: str) -> User:
     """get an existing user by ID"""
 
-    with engine.begin() as cnx:
+    async with engine_router.reader(user_id).begin() as cnx:
         statement = select(
             database.users
         ).where(
             database.users.c.user_id == user_id
         )
-        user = User(**cnx.execute(statement).one()._asdict())
+        user = User(**(await cnx.execute(statement)).one()._asdict())
         return user
 
 
 @router.put("/users/{user_id}/")
-def update_user(user_id: str, user_request: UpdateUserRequest) -> None:
+async def update_user(user_id: str, user_request: UpdateUserRequest) -> None:
     """update an existing user by ID"""
 
-    with engine.begin() as cnx:
+    async with engine_router.writer(user_id).begin() as cnx:
         statement = update(
             database.users
         ).where(
@@ -76,27 +90,34 @@ def update_user(user_id: str, user_request: UpdateUserRequest) -> None:
             updated_at=datetime.now(),
             **user_request.dict()
         )
-        cnx.execute(statement)
+        await cnx.execute(statement)
 
 
 @router.delete("/users/{user_id}/")
-def delete_user(user_id: str) -> None:
+async def delete_user(user_id: str) -> None:
     """delete an existing user by ID"""
 
-    with engine.begin() as cnx:
+    async with engine_router.writer(user_id).begin() as cnx:
         statement = delete(
             database.users
         ).where(
             database.users.c.user_id == user_id
         )
-        cnx.execute(statement)
+        await cnx.execute(statement)
 
 
 @router.get("/users/{user_id}/ratings/")
-def get_user_ratings(user_id: str) -> List[DisplayRating]:
-    """get ratings for an existing user by ID"""
+async def get_user_ratings(user_id: str, response: Response, if_none_match: Optional[str] = Header(None)) -> List[DisplayRating]:
+    """get ratings for an existing user by ID responding with a 304 if the client's ETag (derived from the ratings version) is still current"""
+
+    async with engine_router.reader(user_id).begin() as cnx:
+
+        # check the user's ratings version counter before running the ratings/movies join
+        etag = make_etag("ratings", user_id, await get_ratings_version(cnx, user_id=user_id))
+        not_modified = check_not_modified("ratings", if_none_match, etag)
+        if not_modified is not None:
+            return not_modified
 
-    with engine.begin() as cnx:
         statement = select(
             database.movies.c.tmdb_id,
             database.movies.c.tmdb_homepage,
@@ -109,30 +130,33 @@ def get_user_ratings(user_id: str) -> List[DisplayRating]:
             database.ratings.c.user_id == user_id
         )
 
-        user_ratings = [DisplayRating(**row._asdict()) for row in cnx.execute(statement).all()]
+        user_ratings = [DisplayRating(**row._asdict()) for row in (await cnx.execute(statement)).all()]
+        tag_response(response, etag)
         return user_ratings
 
 
 @router.post("/users/{user_id}/ratings/")
-def add_user_ratings(user_id: str, requests: List[AddRatingRequest]) -> AddRatingsResponse:
+async def add_user_ratings(user_id: str, requests: List[AddRatingRequest]) -> AddRatingsResponse:
     """add ratings for an existing user by ID"""
 
     cnt_added, cnt_updated = 0, 0
     updated_at = datetime.now()
 
+    # bump the ratings version in the same transaction as each rating so a committed rating always has a new version
     for request in requests:
         try:
-            with engine.begin() as cnx:
+            async with engine_router.writer(user_id).begin() as cnx:
                 statement = insert(database.ratings).values(
                     user_id=user_id,
                     tmdb_id=request.tmdb_id,
                     rating=request.rating,
                     updated_at=updated_at,
                 )
-                result = cnx.execute(statement)
+                result = await cnx.execute(statement)
+                await bump_ratings_version(cnx, user_id=user_id)
                 cnt_added += result.rowcount
         except DatabaseError:
-            with engine.begin() as cnx:
+            async with engine_router.writer(user_id).begin() as cnx:
                 statement = update(database.ratings).where(
                     database.ratings.c.user_id == user_id,
                     database.ratings.c.tmdb_id == request.tmdb_id
@@ -140,7 +164,8 @@ def add_user_ratings(user_id: str, requests: List[AddRatingRequest]) -> AddRatin
                     rating=request.rating,
                     updated_at=updated_at,
                 )
-                result = cnx.execute(statement)
+                result = await cnx.execute(statement)
+                await bump_ratings_version(cnx, user_id=user_id)
                 cnt_updated += result.rowcount
 
     response = AddRatingsResponse(cnt_added=cnt_added, cnt_updated=cnt_updated)
@@ -148,8 +173,42 @@ def add_user_ratings(user_id: str, requests: List[AddRatingRequest]) -> AddRatin
 
 
 @router.get("/users/{user_id}/recommendations/")
-def get_user_recommendations(user_id: str, k: int = 10) -> List[Recommendation]:
-    """get unconditional movie recommendations for an existing user by ID"""
-
-    user_recommendations = get_user_recs(user_id=user_id, k=k)
+async def get_user_recommendations(user_id: str, response: Response, k: int = 10, if_none_match: Optional[str] = Header(None)) -> List[Recommendation]:
+    """get unconditional movie recommendations for an existing user by ID
+
+    responds with a 304 if the client's ETag is still current: materialized recommendations are versioned by when they
+    were computed and live recommendations by the user's ratings version and the model snapshot version
+    """
+
+    # serve the materialized top-N recommendations unless the user has rated movies (or a new model version was published) since they were computed
+    with stage("recs_lookup"):
+        async with timed_abegin(engine_router.reader(user_id)) as cnx:
+            materialized = await aget_materialized_recs(cnx, user_id=user_id)
+            ratings_version = await get_ratings_version(cnx, user_id=user_id)
+
+    fresh = materialized is not None and not materialized.stale and not materialized.predates(model_registry.get().created_at)
+    if fresh and k <= RECS_TOP_N:
+        etag = make_etag("recommendations", user_id, k, "materialized", materialized.computed_at)
+        not_modified = check_not_modified("recommendations", if_none_match, etag)
+        if not_modified is not None:
+            return not_modified
+
+        tag_response(response, etag)
+        recs_served_total.labels("materialized").inc()
+        response.headers["X-Recommendations-Source"] = "materialized"
+        response.headers["X-Recommendations-Age"] = str(int(materialized.age_seconds))
+        return await get_recommendations(materialized.scores.iloc[:k])
+
+    # check the versions the live recommendations depend on before scoring the catalog
+    etag = make_etag("recommendations", user_id, k, "live", ratings_version, model_registry.get().version)
+    not_modified = check_not_modified("recommendations", if_none_match, etag)
+    if not_modified is not None:
+        return not_modified
+
+    # frontend re-runs often reissue the same request while the previous one is still in flight
+    tag_response(response, etag)
+    recs_served_total.labels("live").inc()
+    response.headers["X-Recommendations-Source"] = "live"
+    response.headers["X-Recommendations-Age"] = "0"
+    user_recommendations = await recommendations_flight.ado(request_key(user_id, k), get_user_recs, user_id=user_id, k=k)
     return user_recommendations
@@ -0,0 +1,134 @@
+import os
+import time
+import queue
+import logging
+import threading
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional
+from prometheus_client import Histogram
+
+EMBEDDING_BATCH_WINDOW_MS = float(os.environ.get("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_BATCH_MAX_SIZE = int(os.environ.get("EMBEDDING_BATCH_MAX_SIZE", "64"))
+EMBEDDING_BATCH_CONCURRENCY = int(os.environ.get("EMBEDDING_BATCH_CONCURRENCY", "4"))
+EMBEDDING_TIMEOUT_SECONDS = float(os.environ.get("EMBEDDING_TIMEOUT_SECONDS", "30"))
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+BATCH_WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+
+logger = logging.getLogger(__name__)
+
+embedding_batch_size = Histogram("embedding_batch_size", "number of inputs per batched embeddings API call", buckets=BATCH_SIZE_BUCKETS)
+embedding_batch_wait_seconds = Histogram(
+    "embedding_batch_wait_seconds",
+    "time an embedding request waited for its batch to be sent",
+    buckets=BATCH_WAIT_BUCKETS
+)
+
+
+class _Pending:
+    """a single text waiting to be embedded as part of the next batch"""
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class EmbeddingBatcher:
+    """collects concurrent embedding requests for up to [window_ms] (or until [max_batch_size] texts arrive) and sends them
+    as a single multi-input API call handing each caller back its own vector
+
+    a daemon thread forms the batches and up to [concurrency] batches are in flight at once so the next batch keeps
+    filling while the previous one waits on the API. a window of 0 disables batching. callers give up after [timeout]
+    seconds (raising TimeoutError) if their batch hasn't returned
+    """
+
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], List[List[float]]],
+        window_ms: float = EMBEDDING_BATCH_WINDOW_MS,
+        max_batch_size: int = EMBEDDING_BATCH_MAX_SIZE,
+        concurrency: int = EMBEDDING_BATCH_CONCURRENCY,
+        timeout: Optional[float] = EMBEDDING_TIMEOUT_SECONDS
+    ) -> None:
+        self.embed_batch = embed_batch
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def embed(self, text: str) -> List[float]:
+        """embed a single text blocking until the batch containing it returns"""
+
+        if self.window <= 0:
+            embedding_batch_size.observe(1)
+            return self.embed_batch([text])[0]
+
+        self._start()
+        pending = _Pending(text)
+        self._queue.put(pending)
+        return pending.future.result(timeout=self.timeout)
+
+    def _start(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embedding-batch")
+                    self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+
+            # the first request opens a batch which closes after the window or as soon as it's full
+            batch = [self._queue.get()]
+            closes_at = time.perf_counter() + self.window
+            while len(batch) < self.max_batch_size:
+                remaining = closes_at - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._executor.submit(self._send, batch)
+
+    def _send(self, batch: List[_Pending]) -> None:
+        sent_at = time.perf_counter()
+        embedding_batch_size.observe(len(batch))
+        for pending in batch:
+            embedding_batch_wait_seconds.observe(sent_at - pending.enqueued_at)
+
+        try:
+            embeddings = self.embed_batch([pending.text for pending in batch])
+        except Exception as err:
+            logger.exception("batched embeddings request failed", extra={"batch_size": len(batch)})
+            for pending in batch:
+                pending.future.set_exception(err)
+            return
+
+        # NOTE: with a missing vector the rest can't be matched to their texts either so the whole batch fails
+        if len(embeddings) != len(batch):
+            logger.error("batched embeddings response size mismatch", extra={"batch_size": len(batch), "embeddings": len(embeddings)})
+            for pending in batch:
+                pending.future.set_exception(ValueError(f"expected {len(batch)} embeddings but got {len(embeddings)}"))
+            return
+
+        for pending, embedding in zip(batch, embeddings):
+            pending.future.set_result(embedding)
+
+
+def openai_embed_batch(client, model: str = "text-embedding-ada-002") -> Callable[[List[str]], List[List[float]]]:
+    """create a function which embeds a list of texts with a single OpenAI embeddings API call"""
+
+    def embed_batch(texts: List[str]) -> List[List[float]]:
+        response = client.embeddings.create(input=texts, model=model)
+        return [data.embedding for data in sorted(response.data, key=lambda x: x.index)]
+
+    return embed_batch
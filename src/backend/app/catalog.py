@@ -0,0 +1,247 @@
+import re
+import time
+import logging
+import threading
+import numpy as np
+import pandas as pd
+
+from functools import reduce
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import Engine, select
+
+from backend.app import database
+from shared.models import SearchFilters
+
+
+logger = logging.getLogger(__name__)
+
+CATALOG_TTL_SECONDS = 15 * 60
+LANGUAGE_CODES = {
+    "english": "en", "french": "fr", "spanish": "es", "german": "de", "italian": "it", "japanese": "ja", "korean": "ko",
+    "chinese": "zh", "mandarin": "zh", "cantonese": "cn", "hindi": "hi", "swedish": "sv", "danish": "da", "norwegian": "no",
+    "russian": "ru", "portuguese": "pt", "dutch": "nl", "polish": "pl", "turkish": "tr", "thai": "th", "persian": "fa", "arabic": "ar"
+}
+GENRE_ALIASES = {"sci-fi": "science fiction", "scifi": "science fiction", "animated": "animation", "romantic": "romance", "documentaries": "documentary"}
+# genres which are also common words only count when followed by a genre context word ("war movies" but not "war hero")
+AMBIGUOUS_GENRES = {"war", "family", "history", "music"}
+GENRE_CONTEXT = r"(?:movies?|films?|flicks?|genre|stories|story|shows?|documentar(?:y|ies))"
+GENRE_STOP_PHRASES = ("star wars", "star war", "family guy")
+AGE_CONTEXT = r"\b(?:my|his|her|their|your|our)\s+(?:(?:early|mid|late)[\s-]+)?$"
+PERSON_STOPWORDS = {"and", "or", "with", "in", "from", "set", "about", "directed", "starring", "featuring", "movies", "films"}
+
+
+def pack_rows(rows: np.ndarray, size: int) -> np.ndarray:
+    """convert an array of row numbers into a packed (1 bit per row) bitmap"""
+
+    mask = np.zeros(size, dtype=bool)
+    mask[rows] = True
+    return np.packbits(mask)
+
+
+def probe_bits(bitmap: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """test the bits of a packed bitmap at the given row numbers"""
+
+    return ((bitmap[rows >> 3] >> (7 - (rows & 7))) & 1).astype(bool)
+
+
+def build_postings(values: pd.Series) -> Dict[str, np.ndarray]:
+    """build an inverted index of lower-cased value -> sorted row numbers from a series of scalars or lists"""
+
+    exploded = values.explode().dropna()
+    if exploded.empty:
+        return {}
+    rows = exploded.index.to_numpy(dtype=np.int32)
+    groups = exploded.astype(str).str.lower().groupby(exploded.astype(str).str.lower().to_numpy()).indices
+    return {key: np.sort(rows[positions]) for key, positions in groups.items()}
+
+
+class MovieCatalog:
+    """read-only columnar copy of the [movies] table with inverted indexes for structured pre-filtering
+
+    rows are sorted by [tmdb_id]. low-cardinality attributes (genre, decade, language) are indexed with packed bitmaps
+    while high-cardinality attributes (actor, director) use sorted posting lists so memory stays proportional to the data
+    """
+
+    def __init__(self, movies: pd.DataFrame) -> None:
+        movies = movies.sort_values("tmdb_id").reset_index(drop=True)
+        release_year = pd.to_datetime(movies["release_date"], errors="coerce").dt.year
+
+        self.size = len(movies)
+        self.tmdb_ids = movies["tmdb_id"].to_numpy(dtype=str)
+        self.popularity = movies["popularity"].to_numpy(dtype=np.float32)
+        self.release_year = release_year.fillna(0).to_numpy(dtype=np.int16)
+
+        decades = (release_year // 10 * 10).dropna().astype(int).astype(str)
+        self.genre_bitmaps = {key: pack_rows(rows, self.size) for key, rows in build_postings(movies["genres"]).items()}
+        self.language_bitmaps = {key: pack_rows(rows, self.size) for key, rows in build_postings(movies["language"]).items()}
+        self.decade_bitmaps = {int(key): pack_rows(rows, self.size) for key, rows in build_postings(decades).items()}
+        self.actor_postings = build_postings(movies["actors"])
+        self.director_postings = build_postings(movies["director"])
+
+    @classmethod
+    def from_engine(cls, engine: Engine) -> "MovieCatalog":
+        """build the catalog from the current contents of the [movies] table"""
+
+        columns = ["tmdb_id", "language", "release_date", "director", "actors", "genres", "popularity"]
+        with engine.begin() as cnx:
+            statement = select(*[database.movies.c[column] for column in columns])
+            movies = pd.DataFrame(cnx.execute(statement).all(), columns=columns)
+        return cls(movies)
+
+    @property
+    def nbytes(self) -> int:
+        """approximate memory held by the catalog's arrays and indexes"""
+
+        arrays = [self.tmdb_ids, self.popularity, self.release_year]
+        indexes = [self.genre_bitmaps, self.language_bitmaps, self.decade_bitmaps, self.actor_postings, self.director_postings]
+        return sum(array.nbytes for array in arrays) + sum(array.nbytes for index in indexes for array in index.values())
+
+    def get_popularity(self, tmdb_ids: List[str]) -> np.ndarray:
+        """look up the popularity of each movie (NaN for movies not in the catalog)"""
+
+        tmdb_ids = np.asarray(tmdb_ids, dtype=str)
+        if self.size == 0:
+            return np.full(len(tmdb_ids), np.nan)
+        rows = np.clip(np.searchsorted(self.tmdb_ids, tmdb_ids), 0, self.size - 1)
+        return np.where(self.tmdb_ids[rows] == tmdb_ids, self.popularity[rows].astype(float), np.nan)
+
+    def filter(self, filters: SearchFilters) -> Optional[np.ndarray]:
+        """get the sorted row numbers matching the filters, or None if the filters don't restrict anything
+
+        genres and actors must all match while languages, decades and directors match any of the values given
+        """
+
+        postings, bitmaps = [], []
+        empty = np.array([], dtype=np.int32)
+
+        for actor in filters.actors or []:
+            postings.append(self.actor_postings.get(actor.lower(), empty))
+        if filters.directors:
+            postings.append(reduce(np.union1d, [self.director_postings.get(director.lower(), empty) for director in filters.directors]))
+
+        for genre in filters.genres or []:
+            bitmaps.append(self.genre_bitmaps.get(genre.lower()))
+        if filters.languages:
+            bitmaps.append(self._union_bitmaps([self.language_bitmaps.get(language.lower()) for language in filters.languages]))
+        if filters.decades:
+            bitmaps.append(self._union_bitmaps([self.decade_bitmaps.get(decade) for decade in filters.decades]))
+
+        if not postings and not bitmaps:
+            return None
+        if any(bitmap is None for bitmap in bitmaps):
+            return empty
+
+        if postings:
+            # intersect the posting lists starting from the most selective and then probe the bitmaps for each survivor
+            postings = sorted(postings, key=len)
+            rows = reduce(lambda x, y: np.intersect1d(x, y, assume_unique=True), postings)
+            for bitmap in bitmaps:
+                rows = rows[probe_bits(bitmap, rows)]
+            return rows
+        else:
+            combined = reduce(np.bitwise_and, bitmaps)
+            return np.flatnonzero(np.unpackbits(combined, count=self.size)).astype(np.int32)
+
+    def _union_bitmaps(self, bitmaps: List[Optional[np.ndarray]]) -> Optional[np.ndarray]:
+        """OR together the bitmaps for the known values (None if none of the values are known)"""
+
+        bitmaps = [bitmap for bitmap in bitmaps if bitmap is not None]
+        return reduce(np.bitwise_or, bitmaps) if bitmaps else None
+
+    def parse_filters(self, query: str) -> SearchFilters:
+        """extract structured filters (decades, languages, genres, actors, directors) mentioned in a natural language query"""
+
+        text = query.lower()
+        filters = SearchFilters()
+
+        decades = []
+        for match in re.finditer(r"\b(19|20)?(\d)0'?s\b", text):
+            century, decade = match.groups()
+            if century:
+                decades.append(int(century + decade + "0"))
+            elif not re.search(AGE_CONTEXT, text[:match.start()]):
+                # a bare "40s" after a possessive is an age ("in his 40s") rather than a decade
+                decades.append(2000 + int(decade) * 10 if int(decade) <= 2 else 1900 + int(decade) * 10)
+        filters.decades = sorted(set(decades)) or None
+
+        languages = [code for name, code in LANGUAGE_CODES.items() if re.search(rf"\b{name}\b", text) and code in self.language_bitmaps]
+        filters.languages = sorted(set(languages)) or None
+
+        genres = []
+        genre_text = text
+        for phrase in GENRE_STOP_PHRASES:
+            genre_text = re.sub(rf"\b{phrase}\b", " ", genre_text)
+        for genre in self.genre_bitmaps:
+            variants = [genre, genre + "s", genre[:-1] + "ies" if genre.endswith("y") else genre]
+            variants += [alias for alias, target in GENRE_ALIASES.items() if target == genre]
+            context = rf"\s+{GENRE_CONTEXT}\b" if genre in AMBIGUOUS_GENRES else ""
+            if any(re.search(rf"\b{re.escape(variant)}\b{context}", genre_text) for variant in variants):
+                genres.append(genre)
+        filters.genres = sorted(set(genres)) or None
+
+        filters.actors = self._parse_people(text, r"\b(?:starring|featuring|with)\s+", self.actor_postings)
+        filters.directors = self._parse_people(text, r"\b(?:directed by|director)\s+", self.director_postings)
+        return filters
+
+    def _parse_people(self, text: str, prefix: str, postings: Dict[str, np.ndarray]) -> Optional[List[str]]:
+        """match the longest known names (up to 4 words each, separated by 'and' or commas) following a prefix"""
+
+        people = []
+        for match in re.finditer(prefix, text):
+            tokens = re.findall(r"[\w'.-]+|,", text[match.end():])
+            while tokens:
+                for length in range(min(4, len(tokens)), 0, -1):
+                    name = " ".join(tokens[:length])
+                    if name in postings and tokens[0] not in PERSON_STOPWORDS:
+                        people.append(name)
+                        tokens = tokens[length:]
+                        break
+                else:
+                    break
+                if tokens and tokens[0] in {"and", ","}:
+                    tokens = tokens[1:]
+                else:
+                    break
+        return sorted(set(people)) or None
+
+
+class CatalogCache:
+    """lazily built catalog which is rebuilt in the background once it is older than the TTL"""
+
+    def __init__(self, loader: Callable[[], MovieCatalog], ttl: float = CATALOG_TTL_SECONDS) -> None:
+        self.loader = loader
+        self.ttl = ttl
+        self.catalog = None
+        self.loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self) -> MovieCatalog:
+        """get the current catalog building it synchronously the first time it is needed"""
+
+        with self._lock:
+            if self.catalog is None:
+                self._load()
+            elif time.monotonic() - self.loaded_at > self.ttl and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh, name="catalog-refresh", daemon=True).start()
+            return self.catalog
+
+    def _load(self) -> None:
+        start = time.perf_counter()
+        self.catalog = self.loader()
+        self.loaded_at = time.monotonic()
+        logger.info("movie catalog loaded", extra={"movies": self.catalog.size, "nbytes": self.catalog.nbytes, "seconds": time.perf_counter() - start})
+
+    def _refresh(self) -> None:
+        try:
+            start = time.perf_counter()
+            catalog = self.loader()
+            with self._lock:
+                self.catalog = catalog
+                self.loaded_at = time.monotonic()
+            logger.info("movie catalog refreshed", extra={"movies": catalog.size, "nbytes": catalog.nbytes, "seconds": time.perf_counter() - start})
+        except Exception:
+            logger.exception("movie catalog refresh failed")
+        finally:
+            self._refreshing = False
@@ -0,0 +1,99 @@
+import json
+import asyncio
+import hashlib
+import threading
+
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+from prometheus_client import Counter
+from pydantic import BaseModel
+
+from backend.app.telemetry import stage
+
+T = TypeVar("T")
+
+
+coalesced_requests_total = Counter("coalesced_requests_total", "requests served by waiting on an identical in-flight computation", ["operation"])
+
+
+def request_key(*parts: Any) -> str:
+    """canonical hash of a request's parameters (pydantic models are compared by their field values)"""
+
+    def default(value: Any) -> Any:
+        return value.dict() if isinstance(value, BaseModel) else str(value)
+
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=default)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class _Call:
+    """a single in-flight computation shared by every caller with the same key"""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """coalesce concurrent calls with the same key so only the first caller runs the computation and the rest share its result
+
+    nothing is cached: once the in-flight computation finishes the next call with the same key computes it again
+    """
+
+    def __init__(self, operation: str) -> None:
+        self.operation = operation
+        self._calls: Dict[str, _Call] = {}
+        self._tasks: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[..., T], *args, **kwargs) -> T:
+        """run [fn] for the key or wait on the identical call already in flight (for sync routes on worker threads)"""
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            coalesced_requests_total.labels(self.operation).inc()
+            with stage("coalesced_wait"):
+                call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key: str, fn: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        """await [fn] for the key or the identical call already in flight (for async routes on the event loop)
+
+        the computation runs in its own task which every caller (the first one included) awaits through a shield, so
+        any caller disconnecting (and being cancelled) leaves the shared computation and the other callers unaffected
+        """
+
+        task = self._tasks.get(key)
+        if task is not None:
+            coalesced_requests_total.labels(self.operation).inc()
+            with stage("coalesced_wait"):
+                return await asyncio.shield(task)
+
+        task = self._tasks[key] = asyncio.ensure_future(fn(*args, **kwargs))
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Future) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # mark the exception as retrieved in case every caller went away before the task finished
+        if not task.cancelled():
+            task.exception()
@@ -6,15 +6,18 @@ from dotenv import load_dotenv
 from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
 from pandas import DataFrame
 
-from llama_index import ServiceContext
 from llama_index.llms import OpenAI
-from llama_index.embeddings import OpenAIEmbedding
-from llama_index.vector_stores import ChromaVectorStore
-from llama_index.indices.vector_store import VectorStoreIndex
 from llama_index.llms import ChatMessage, MessageRole
 
-from backend.app.database import get_prod_engine
-from backend.app.prompts import CONDENSE_QUESTION_PROMPT, TEXT_QA_PROMPT
+from backend.app.batching import EmbeddingBatcher, openai_embed_batch
+from backend.app.catalog import CatalogCache, MovieCatalog
+from backend.app.database import get_async_engine, get_engine, get_replica_async_engine
+from backend.app.memory import estimate_hnsw_bytes, memory_tracker, sizeof_nbytes
+from backend.app.routing import EngineRouter
+from backend.app.registry import ModelRegistry, ModelSnapshot
+from backend.app.sharding import ShardedScorer
+from backend.app.tokenizer import get_encoding
+from backend.app.vectors import ContentIndex
 
 LIKED_MOVIE_SCORE = 3.5
 QUERY_SCORE_WEIGHT = 0.90
@@ -23,34 +26,67 @@ SIMILARITY_TOP_K = 10
 
 load_dotenv()
 
-engine = get_prod_engine()
+CHROMA_PATH = os.environ.get("CHROMA_PATH", "./chroma")
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL")
+FILTER_BRUTE_FORCE_MAX = int(os.environ.get("FILTER_BRUTE_FORCE_MAX", "5000"))
+FILTER_OVERSAMPLE = int(os.environ.get("FILTER_OVERSAMPLE", "10"))
+CONTENT_INDEX_PATH = os.environ.get("CONTENT_INDEX_PATH")
+MODEL_REGISTRY_PATH = os.environ.get("MODEL_REGISTRY_PATH")
+CONDENSE_TOKEN_BUDGET = int(os.environ.get("CONDENSE_TOKEN_BUDGET", "1024"))
+QA_CONTEXT_TOKEN_BUDGET = int(os.environ.get("QA_CONTEXT_TOKEN_BUDGET", "600"))
+QA_CONTEXT_TOKEN_MAX = int(os.environ.get("QA_CONTEXT_TOKEN_MAX", "4000"))
+QA_CONTEXT_MAX_MOVIES = int(os.environ.get("QA_CONTEXT_MAX_MOVIES", "5"))
+QA_CONTEXT_OVERVIEW_TOKENS = int(os.environ.get("QA_CONTEXT_OVERVIEW_TOKENS", "48"))
+QA_CONTEXT_FIELDS = os.environ.get("QA_CONTEXT_FIELDS", "title,genres,keywords,director,actors,decade").split(",")
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", "300"))
 
-openai_client = openai.OpenAI(api_key=os.environ["OPENAI_API_KEY"])
-chroma_client = chromadb.PersistentClient(path="./chroma")
+engine = get_engine()
+async_engine = get_async_engine()
+engine_router = EngineRouter(primary=async_engine, replica=get_replica_async_engine())
+movie_catalog = CatalogCache(loader=lambda: MovieCatalog.from_engine(engine))
 
-embedding_function = OpenAIEmbeddingFunction(api_key=os.environ["OPENAI_API_KEY"], model_name="text-embedding-ada-002")
+openai_client = openai.OpenAI(api_key=os.environ["OPENAI_API_KEY"], base_url=OPENAI_BASE_URL)
+# NOTE: concurrent query embeddings are sent to the API together as multi-input calls (EMBEDDING_BATCH_WINDOW_MS=0 to disable)
+embedding_batcher = EmbeddingBatcher(embed_batch=openai_embed_batch(openai_client))
+chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
+
+embedding_function = OpenAIEmbeddingFunction(api_key=os.environ["OPENAI_API_KEY"], api_base=OPENAI_BASE_URL, model_name="text-embedding-ada-002")
 movies_content_collection = chroma_client.get_collection(name="movies-content", embedding_function=embedding_function)
 users_collab_collection = chroma_client.get_collection(name="users-collab", embedding_function=embedding_function)
 movies_collab_collection = chroma_client.get_collection(name="movies-collab", embedding_function=embedding_function)
 
-llm = OpenAI(model="gpt-4-1106-preview", temperature=0.1, max_tokens=256, api_key=os.environ["OPENAI_API_KEY"])
-embed_model = OpenAIEmbedding(model="text-embedding-ada-002", api_key=os.environ["OPENAI_API_KEY"])
-service_context = ServiceContext.from_defaults(llm=llm, embed_model=embed_model)
+llm = OpenAI(model="gpt-4-1106-preview", temperature=0.1, max_tokens=256, api_key=os.environ["OPENAI_API_KEY"], api_base=OPENAI_BASE_URL)
 
-movies_content_vector_store = ChromaVectorStore(chroma_collection=movies_content_collection)
-movies_content_vector_index = VectorStoreIndex.from_vector_store(vector_store=movies_content_vector_store, service_context=service_context)
 
-movies_content_retriever = movies_content_vector_index.as_retriever(
-    similarity_top_k=SIMILARITY_TOP_K,
-    verbose=True
-)
-movies_content_chat_engine = movies_content_vector_index.as_chat_engine(
-    chat_mode="condense_question",
-    condense_question_prompt=CONDENSE_QUESTION_PROMPT,
-    text_qa_template=TEXT_QA_PROMPT,
-    similarity_top_k=SIMILARITY_TOP_K,
-    verbose=True
-)
+def load_initial_snapshot() -> ModelSnapshot:
+    """snapshot of the [movies-collab] embeddings in Chroma (and the CONTENT_INDEX_PATH index if set) used until a version is published"""
+
+    movies_collab_embeddings = movies_collab_collection.get(include=["embeddings"])
+    snapshot = ModelSnapshot(
+        version="initial",
+        collab_embeddings=DataFrame(data=movies_collab_embeddings["embeddings"], index=movies_collab_embeddings["ids"]),
+        # NOTE: content search is served from the in-process quantized index when one has been built (python -m backend.app.vectors build)
+        content_index=ContentIndex(CONTENT_INDEX_PATH) if CONTENT_INDEX_PATH else None
+    )
+    return snapshot
 
-movies_collab_embeddings = movies_collab_collection.get(include=["embeddings"])
-movies_collab_embeddings = DataFrame(data=movies_collab_embeddings["embeddings"], index=movies_collab_embeddings["ids"])
+
+# NOTE: the collab factors, content index, and catalog statistics are versioned in the registry (python -m backend.app.registry)
+model_registry = ModelRegistry(path=MODEL_REGISTRY_PATH, fallback=load_initial_snapshot)
+
+# NOTE: collab scoring is scattered across COLLAB_SHARDS worker processes once the catalog reaches COLLAB_SHARD_MIN_MOVIES
+collab_scorer = ShardedScorer()
+
+# NOTE: components are measured in this order and objects shared between them are counted against the first (GET /admin/memory/)
+memory_tracker.register("collab_embeddings", lambda: model_registry.snapshot and model_registry.snapshot.collab_embeddings)
+memory_tracker.register("content_index", lambda: model_registry.snapshot and model_registry.snapshot.content_index, sizer=sizeof_nbytes)
+memory_tracker.register("collab_shared_memory", lambda: collab_scorer, sizer=sizeof_nbytes)
+memory_tracker.register("movie_catalog", lambda: movie_catalog.catalog, sizer=sizeof_nbytes)
+memory_tracker.register(
+    "chroma_hnsw_indexes",
+    lambda: [movies_content_collection, users_collab_collection, movies_collab_collection],
+    sizer=lambda collections, seen: sum(estimate_hnsw_bytes(collection) for collection in collections)
+)
+memory_tracker.register("tokenizer", lambda: get_encoding() if get_encoding.cache_info().currsize else None)
+memory_tracker.register("llama_index", lambda: [llm])
+memory_tracker.register("clients", lambda: [openai_client, embedding_batcher, chroma_client, engine, async_engine, engine_router])
@@ -0,0 +1,290 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import httpx
+
+from argparse import ArgumentParser
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set
+from dotenv import load_dotenv
+from pydantic import ValidationError
+
+from shared.models import Movie
+
+TMDB_API_URL = os.environ.get("TMDB_API_URL", "https://api.themoviedb.org/3")
+TMDB_MAX_RPS = float(os.environ.get("TMDB_MAX_RPS", "40"))
+TMDB_CONCURRENCY = int(os.environ.get("TMDB_CONCURRENCY", "32"))
+TMDB_MAX_RETRIES = int(os.environ.get("TMDB_MAX_RETRIES", "5"))
+TMDB_BACKOFF_SECONDS = float(os.environ.get("TMDB_BACKOFF_SECONDS", "0.5"))
+TMDB_BACKOFF_MAX_SECONDS = 30.0
+TMDB_TIMEOUT_SECONDS = 10.0
+MAX_CAST_MEMBERS = 5
+PROGRESS_INTERVAL = 500
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+logger = logging.getLogger(__name__)
+
+
+class MovieNotFound(Exception):
+    """raised when TMDB has no movie with the requested ID"""
+
+
+class RateLimiter:
+    """spaces requests [1 / rate] seconds apart across every request of a crawl so the total request rate stays under the
+    API's rate limit
+
+    each caller reserves the next free slot on a fixed schedule (so sleep overshoot doesn't eat into the rate) and a
+    rate limited response pauses every caller, not just the one that got it
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1 / rate
+        self._next = 0.0
+        self._resume_at = 0.0
+
+    async def acquire(self) -> None:
+        """wait for a request slot"""
+
+        while True:
+            now = time.monotonic()
+            slot = max(self._next, now, self._resume_at)
+            self._next = slot + self.interval
+            if slot > now:
+                await asyncio.sleep(slot - now)
+            # a pause which started while this caller was waiting pushes it back behind the pause
+            if time.monotonic() >= self._resume_at:
+                return
+
+    def pause(self, seconds: float) -> None:
+        """hold back all requests for [seconds] (e.g. the Retry-After of a 429 response)"""
+
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+
+def get_backoff(attempt: int, base: float, retry_after: Optional[str] = None) -> float:
+    """seconds to wait before the next attempt: the server's Retry-After if given, otherwise exponential backoff with full jitter"""
+
+    if retry_after:
+        try:
+            return min(float(retry_after), TMDB_BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    return random.uniform(0, min(TMDB_BACKOFF_MAX_SECONDS, base * 2 ** attempt))
+
+
+async def fetch_json(
+    client: httpx.AsyncClient,
+    limiter: RateLimiter,
+    path: str,
+    max_retries: int = TMDB_MAX_RETRIES,
+    backoff: float = TMDB_BACKOFF_SECONDS
+) -> Dict:
+    """GET a TMDB API resource retrying rate limited, server error and network failures with backoff"""
+
+    for attempt in range(max_retries + 1):
+        await limiter.acquire()
+        try:
+            response = await client.get(path)
+        except httpx.TransportError as err:
+            if attempt == max_retries:
+                raise
+            logger.warning("TMDB request failed, retrying", extra={"path": path, "attempt": attempt, "error": str(err)})
+            await asyncio.sleep(get_backoff(attempt, backoff))
+            continue
+
+        if response.status_code == 404:
+            raise MovieNotFound(path)
+        if response.status_code in RETRY_STATUS_CODES and attempt < max_retries:
+            delay = get_backoff(attempt, backoff, retry_after=response.headers.get("Retry-After"))
+            if response.status_code == 429:
+                limiter.pause(delay)
+            logger.warning("TMDB request failed, retrying", extra={"path": path, "attempt": attempt, "status_code": response.status_code})
+            await asyncio.sleep(delay)
+            continue
+
+        response.raise_for_status()
+        return response.json()
+
+
+def parse_movie(tmdb_id: str, details: Dict, credits: Dict, keywords: Dict) -> Movie:
+    """combine the TMDB details, credits and keywords responses into a [Movie] the same way as the frontend's add_movie()"""
+
+    director = [item for item in credits["crew"] if item["job"] == "Director"]
+    top_cast = sorted(credits["cast"], key=lambda x: x["order"])[:MAX_CAST_MEMBERS]
+    movie = Movie(
+        tmdb_id=str(tmdb_id),
+        tmdb_homepage=f"https://www.themoviedb.org/movie/{tmdb_id}",
+        title=details["title"],
+        language=details["original_language"],
+        release_date=details["release_date"],
+        runtime=details["runtime"],
+        director=director[0]["name"] if len(director) >= 1 else "",
+        actors=[actor["name"] for actor in top_cast],
+        genres=[genre["name"] for genre in details["genres"]],
+        keywords=[item["name"] for item in keywords["keywords"]],
+        overview=details["overview"],
+        budget=details["budget"],
+        revenue=details["revenue"],
+        popularity=details["popularity"],
+        vote_average=details["vote_average"],
+        vote_count=details["vote_count"]
+    )
+    return movie
+
+
+async def fetch_movie(
+    client: httpx.AsyncClient,
+    limiter: RateLimiter,
+    tmdb_id: str,
+    max_retries: int = TMDB_MAX_RETRIES,
+    backoff: float = TMDB_BACKOFF_SECONDS
+) -> Movie:
+    """fetch a movie's details, credits and keywords concurrently"""
+
+    details, credits, keywords = await asyncio.gather(
+        fetch_json(client, limiter, f"/movie/{tmdb_id}", max_retries=max_retries, backoff=backoff),
+        fetch_json(client, limiter, f"/movie/{tmdb_id}/credits", max_retries=max_retries, backoff=backoff),
+        fetch_json(client, limiter, f"/movie/{tmdb_id}/keywords", max_retries=max_retries, backoff=backoff)
+    )
+    return parse_movie(tmdb_id, details, credits, keywords)
+
+
+def repair_jsonl(path: str) -> None:
+    """drop a partially written last line left behind by an interrupted crawl so appended lines stay well-formed"""
+
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def load_completed(output_path: str, checkpoint_path: str) -> Set[str]:
+    """IDs already written to the output or recorded in the checkpoint (not found/invalid) by a previous run"""
+
+    completed = set()
+    for path in [output_path, checkpoint_path]:
+        repair_jsonl(path)
+        if os.path.exists(path):
+            with open(path) as f:
+                completed.update(json.loads(line)["tmdb_id"] for line in f if line.strip())
+    return completed
+
+
+async def crawl(
+    tmdb_ids: Iterable[str],
+    output_path: str,
+    checkpoint_path: Optional[str] = None,
+    access_token: Optional[str] = None,
+    max_rps: float = TMDB_MAX_RPS,
+    concurrency: int = TMDB_CONCURRENCY,
+    max_retries: int = TMDB_MAX_RETRIES,
+    backoff: float = TMDB_BACKOFF_SECONDS,
+    base_url: str = TMDB_API_URL,
+    transport: Optional[httpx.AsyncBaseTransport] = None
+) -> Dict[str, float]:
+    """crawl TMDB for the given movie IDs appending [Movie] JSON lines to [output_path] and return counts by outcome
+
+    [concurrency] movies are fetched at once (each with its 3 requests in flight together) under a global [max_rps]
+    limit so throughput is bounded by the rate limit rather than request latency. each completed ID is checkpointed as
+    soon as it finishes: movies by their output line, and IDs TMDB doesn't have (or with unusable data) in the checkpoint
+    file, so re-running the same command resumes where an interrupted crawl stopped. IDs that still fail after
+    [max_retries] retries aren't checkpointed and are retried by the next run
+    """
+
+    checkpoint_path = checkpoint_path or f"{output_path}.checkpoint"
+    completed = load_completed(output_path, checkpoint_path)
+    pending = list(dict.fromkeys(str(tmdb_id) for tmdb_id in tmdb_ids if str(tmdb_id) not in completed))
+    outcomes = Counter({"ok": 0, "not_found": 0, "invalid": 0, "failed": 0})
+    logger.info("starting TMDB crawl", extra={"pending": len(pending), "completed": len(completed), "max_rps": max_rps, "concurrency": concurrency})
+
+    limiter = RateLimiter(rate=max_rps)
+    queue: "asyncio.Queue[str]" = asyncio.Queue()
+    for tmdb_id in pending:
+        queue.put_nowait(tmdb_id)
+
+    headers = {"accept": "application/json", "Authorization": f"Bearer {access_token or os.environ['TMDB_ACCESS_TOKEN']}"}
+    limits = httpx.Limits(max_connections=3 * concurrency, max_keepalive_connections=3 * concurrency)
+    start = time.perf_counter()
+
+    with open(output_path, "a") as output, open(checkpoint_path, "a") as checkpoint:
+
+        def record(tmdb_id: str, outcome: str) -> None:
+            outcomes[outcome] += 1
+            if outcome in ("not_found", "invalid"):
+                checkpoint.write(json.dumps({"tmdb_id": tmdb_id, "status": outcome}) + "\n")
+                checkpoint.flush()
+            done = sum(outcomes.values())
+            if done % PROGRESS_INTERVAL == 0:
+                elapsed = time.perf_counter() - start
+                logger.info("TMDB crawl progress", extra={"done": done, "pending": len(pending) - done, "movies_per_second": done / elapsed, **outcomes})
+
+        async def worker(client: httpx.AsyncClient) -> None:
+            while not queue.empty():
+                tmdb_id = queue.get_nowait()
+                try:
+                    movie = await fetch_movie(client, limiter, tmdb_id, max_retries=max_retries, backoff=backoff)
+                except MovieNotFound:
+                    record(tmdb_id, "not_found")
+                except (ValidationError, KeyError, TypeError) as err:
+                    logger.warning("TMDB movie has unusable data", extra={"tmdb_id": tmdb_id, "error": str(err)})
+                    record(tmdb_id, "invalid")
+                except httpx.HTTPError as err:
+                    logger.error("TMDB movie failed after retries", extra={"tmdb_id": tmdb_id, "error": str(err)})
+                    record(tmdb_id, "failed")
+                else:
+                    output.write(movie.json() + "\n")
+                    output.flush()
+                    record(tmdb_id, "ok")
+
+        async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=TMDB_TIMEOUT_SECONDS, limits=limits, transport=transport) as client:
+            await asyncio.gather(*[worker(client) for _ in range(min(concurrency, len(pending)))])
+
+    elapsed = time.perf_counter() - start
+    summary = {"skipped": len(completed), **outcomes, "seconds": elapsed, "movies_per_second": (len(pending) / elapsed) if elapsed > 0 else 0.0}
+    logger.info("finished TMDB crawl", extra=summary)
+    return summary
+
+
+def read_ids(path: str) -> List[str]:
+    """read one TMDB ID per line ('-' for stdin) ignoring blank lines"""
+
+    f = sys.stdin if path == "-" else open(path)
+    try:
+        return [line.strip() for line in f if line.strip()]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+if __name__ == "__main__":
+
+    from backend.app.telemetry import configure_logging
+
+    load_dotenv()
+    configure_logging()
+
+    parser = ArgumentParser(description="crawl TMDB movie details, credits and keywords into Movie JSON lines (re-run the same command to resume)")
+    parser.add_argument("--ids", type=str, required=True, help="file of TMDB movie IDs to crawl, one per line ('-' for stdin)")
+    parser.add_argument("--output", type=str, required=True, help="JSON lines file the movies are appended to")
+    parser.add_argument("--checkpoint", type=str, help="file recording IDs that are not found or invalid (default: [output].checkpoint)")
+    parser.add_argument("--max-rps", type=float, default=TMDB_MAX_RPS, help="global limit on TMDB requests per second")
+    parser.add_argument("--concurrency", type=int, default=TMDB_CONCURRENCY, help="number of movies fetched concurrently")
+    parser.add_argument("--max-retries", type=int, default=TMDB_MAX_RETRIES, help="retries per request for rate limit, server and network errors")
+    args = parser.parse_args()
+
+    summary = asyncio.run(crawl(
+        read_ids(args.ids),
+        output_path=args.output,
+        checkpoint_path=args.checkpoint,
+        max_rps=args.max_rps,
+        concurrency=args.concurrency,
+        max_retries=args.max_retries
+    ))
+    print(json.dumps(summary, indent=2))
@@ -1,9 +1,14 @@
 import os
+import asyncio
 
-from argparse import ArgumentParser
-from sqlalchemy import MetaData, Table, Column, PrimaryKeyConstraint, Engine, create_engine
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Optional, Union
+from sqlalchemy import MetaData, Table, Column, PrimaryKeyConstraint, Engine, Result, create_engine
+from sqlalchemy import Connection as SyncConnection
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.types import ARRAY, BIGINT, Date, DateTime, Double, Integer, Text
-from google.cloud.sql.connector import Connector
+from google.cloud.sql.connector import Connector, create_async_connector
 from dotenv import load_dotenv
 from pg8000 import Connection
 
@@ -30,6 +35,89 @@ def make_connection() -> Connection:
     return cnx
 
 
+_async_connector: Optional[Connector] = None
+
+
+async def make_async_connection(instance: str = "robot-ebert"):
+    """generate a new asyncpg connection for a CloudSQL instance"""
+
+    # NOTE: the async connector must be created on the event loop which will use it so it's created lazily on first use
+    global _async_connector
+    if _async_connector is None:
+        _async_connector = await create_async_connector()
+
+    cnx = await _async_connector.connect_async(
+        f"robot-ebert:us-west1:{instance}",
+        "asyncpg",
+        user="postgres",
+        password=os.environ["POSTGRES_PASSWORD"],
+        db="app"
+    )
+    return cnx
+
+
+class ThreadedAsyncConnection:
+    """async facade over a sync SQLAlchemy Connection which runs each statement in a worker thread"""
+
+    def __init__(self, cnx: SyncConnection) -> None:
+        self.cnx = cnx
+
+    async def execute(self, statement: Any, parameters: Optional[Any] = None) -> Result:
+        """execute a statement returning a fully buffered result (like AsyncConnection.execute)"""
+
+        def execute():
+            result = self.cnx.execute(statement, parameters)
+            # NOTE: DuckDB reports that DML statements return rows even without RETURNING so keep those unbuffered for [rowcount]
+            context = result.context
+            dml = context.isinsert or context.isupdate or context.isdelete
+            if not result.returns_rows or (dml and not context.compiled.effective_returning):
+                return result
+            return result.freeze()()
+
+        return await asyncio.to_thread(execute)
+
+    @asynccontextmanager
+    async def begin(self) -> AsyncIterator["ThreadedAsyncConnection"]:
+        """run a transaction committing on success and rolling back on error"""
+
+        transaction = await asyncio.to_thread(self.cnx.begin)
+        try:
+            yield self
+        except BaseException:
+            await asyncio.to_thread(transaction.rollback)
+            raise
+        else:
+            await asyncio.to_thread(transaction.commit)
+
+
+class ThreadedAsyncEngine:
+    """async facade over a sync SQLAlchemy Engine for drivers without an asyncio dialect (e.g. DuckDB in tests)"""
+
+    def __init__(self, engine: Engine) -> None:
+        self.sync_engine = engine
+        self.dialect = engine.dialect
+
+    @asynccontextmanager
+    async def connect(self) -> AsyncIterator[ThreadedAsyncConnection]:
+        """check out a connection from the underlying engine's pool"""
+
+        cnx = await asyncio.to_thread(self.sync_engine.connect)
+        try:
+            yield ThreadedAsyncConnection(cnx)
+        finally:
+            await asyncio.to_thread(cnx.close)
+
+    @asynccontextmanager
+    async def begin(self) -> AsyncIterator[ThreadedAsyncConnection]:
+        """check out a connection and run a transaction on it (like AsyncEngine.begin)"""
+
+        async with self.connect() as cnx, cnx.begin():
+            yield cnx
+
+    async def dispose(self) -> None:
+        await asyncio.to_thread(self.sync_engine.dispose)
+
+
 def get_prod_engine(echo: bool = False) -> Engine:
     """get a new SQLAlchemy Engine to manage DB connections to the application CloudSQL database"""
 
@@ -37,13 +125,53 @@ def get_prod_engine(echo: bool = False) -> Engine:
     return engine
 
 
-def get_test_engine(echo: bool = False) -> Engine:
+def get_test_engine(echo: bool = False, path: str = "database.duckdb") -> Engine:
     """get a new SQLAlchemy Engine to manage DB connections to a local test DuckDB database"""
 
-    engine = create_engine("duckdb:///database.duckdb", echo=echo)
+    engine = create_engine(f"duckdb:///{path}", echo=echo)
     return engine
 
 
+def get_engine(echo: bool = False) -> Engine:
+    """get a new SQLAlchemy Engine for the DATABASE_URL database if set or the application CloudSQL database otherwise"""
+
+    database_url = os.environ.get("DATABASE_URL")
+    if database_url:
+        engine = create_engine(database_url, echo=echo)
+    else:
+        engine = get_prod_engine(echo=echo)
+    return engine
+
+
+def get_async_engine(echo: bool = False, database_url: Optional[str] = None, instance: str = "robot-ebert") -> Union[AsyncEngine, ThreadedAsyncEngine]:
+    """get a new async engine for the DATABASE_URL database if set or the application CloudSQL database (via asyncpg) otherwise
+
+    DATABASE_URL drivers without an asyncio dialect (e.g. duckdb:///database.duckdb) are wrapped in a ThreadedAsyncEngine
+    """
+
+    database_url = database_url or os.environ.get("DATABASE_URL")
+    if database_url and database_url.startswith("duckdb"):
+        engine = ThreadedAsyncEngine(create_engine(database_url, echo=echo))
+    elif database_url:
+        engine = create_async_engine(database_url, echo=echo)
+    else:
+        engine = create_async_engine("postgresql+asyncpg://", async_creator=partial(make_async_connection, instance=instance), echo=echo)
+    return engine
+
+
+def get_replica_async_engine(echo: bool = False) -> Optional[Union[AsyncEngine, ThreadedAsyncEngine]]:
+    """get a new async engine for the DATABASE_REPLICA_URL database or CLOUDSQL_REPLICA_INSTANCE read replica if either is set"""
+
+    replica_url = os.environ.get("DATABASE_REPLICA_URL")
+    replica_instance = os.environ.get("CLOUDSQL_REPLICA_INSTANCE")
+    if replica_url:
+        return get_async_engine(echo=echo, database_url=replica_url)
+    elif replica_instance:
+        return get_async_engine(echo=echo, instance=replica_instance)
+    return None
+
+
+# NOTE: apply schema changes (tables and indexes) through versioned migrations in [backend.app.migrations]
 metadata = MetaData()
 
 users = Table(
@@ -89,17 +217,43 @@ ratings = Table(
     PrimaryKeyConstraint("user_id", "tmdb_id")
 )
 
+ratings_versions = Table(
+    "ratings_versions",
+    metadata,
+    Column("user_id", Text, primary_key=True),
+    Column("version", BIGINT),
+    Column("updated_at", DateTime)
+)
 
-if __name__ == "__main__":
 
-    parser = ArgumentParser()
-    parser.add_argument("--test", type=bool, default=False)
-    parser.add_argument("--echo", type=bool, default=True)
-    args = parser.parse_args()
+user_recommendations = Table(
+    "user_recommendations",
+    metadata,
+    Column("user_id", Text, primary_key=True),
+    Column("tmdb_ids", ARRAY(Text)),
+    Column("scores", ARRAY(Double)),
+    Column("ratings_updated_at", DateTime),
+    Column("computed_at", DateTime)
+)
 
-    if args.test:
-        engine = get_test_engine(echo=args.echo)
-    else:
-        engine = get_prod_engine(echo=args.echo)
+conversations = Table(
+    "conversations",
+    metadata,
+    Column("session_id", Text, primary_key=True),
+    Column("user_id", Text),
+    Column("standalone_query", Text),
+    Column("turns", Integer),
+    Column("created_at", DateTime),
+    Column("updated_at", DateTime)
+)
 
-    metadata.create_all(engine)
+conversation_messages = Table(
+    "conversation_messages",
+    metadata,
+    Column("session_id", Text),
+    Column("position", Integer),
+    Column("role", Text),
+    Column("content", Text),
+    Column("created_at", DateTime),
+    PrimaryKeyConstraint("session_id", "position")
+)
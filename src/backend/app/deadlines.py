@@ -0,0 +1,64 @@
+import os
+import time
+import asyncio
+import logging
+
+from typing import Any, Callable, Optional, Tuple
+from prometheus_client import Counter
+
+from backend.app.profiling import to_thread
+
+SEARCH_DEADLINE_MS = int(os.environ.get("SEARCH_DEADLINE_MS", "8000"))
+SEARCH_DEADLINE_MAX_MS = int(os.environ.get("SEARCH_DEADLINE_MAX_MS", "30000"))
+CONDENSE_DEADLINE_SHARE = float(os.environ.get("CONDENSE_DEADLINE_SHARE", "0.3"))
+RESPONSE_DEADLINE_RESERVE = float(os.environ.get("RESPONSE_DEADLINE_RESERVE", "0.1"))
+
+
+logger = logging.getLogger(__name__)
+
+search_fallbacks_total = Counter("search_fallbacks_total", "search LLM stages which missed their deadline and fell back by stage", ["stage"])
+
+
+class Deadline:
+    """a request's latency budget measured from when the request started"""
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def from_ms(cls, deadline_ms: Optional[int] = None) -> "Deadline":
+        """create a deadline from a client-requested budget in milliseconds defaulting to (and capped by) the server settings"""
+
+        deadline_ms = SEARCH_DEADLINE_MS if deadline_ms is None else min(max(deadline_ms, 0), SEARCH_DEADLINE_MAX_MS)
+        return cls(deadline_ms / 1000)
+
+    def remaining(self) -> float:
+        """seconds left before the deadline (never negative)"""
+
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def share(self, fraction: float) -> float:
+        """seconds a stage may take: its [fraction] of the total budget or whatever is left of the budget if less"""
+
+        return min(fraction * self.seconds, self.remaining())
+
+    def reserve(self, fraction: float) -> float:
+        """seconds left before the deadline after holding back [fraction] of the total budget for the stages after this one"""
+
+        return max(0.0, self.remaining() - fraction * self.seconds)
+
+
+async def run_with_deadline(stage: str, timeout: float, fallback: Callable[[], Any], fn: Callable, *args, **kwargs) -> Tuple[Any, bool]:
+    """run a blocking [fn] on a worker thread returning ([fallback()], True) instead of its result if it takes longer than [timeout] seconds
+
+    NOTE: the worker thread can't be interrupted so an abandoned call still runs to completion in the background, but the
+    request no longer waits for it
+    """
+
+    try:
+        return await asyncio.wait_for(to_thread(fn, *args, **kwargs), timeout=timeout), False
+    except asyncio.TimeoutError:
+        search_fallbacks_total.labels(stage).inc()
+        logger.warning("search stage missed its deadline", extra={"stage": stage, "timeout": timeout})
+        return fallback(), True
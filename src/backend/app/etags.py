@@ -0,0 +1,76 @@
+import hashlib
+
+from datetime import datetime
+from typing import Any, Optional
+from fastapi import Response
+from prometheus_client import Counter
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from backend.app import database
+
+CACHE_CONTROL = "private, no-cache"
+
+
+conditional_requests_total = Counter("conditional_requests_total", "conditional GET requests by route and result (not_modified/modified)", ["route", "result"])
+
+
+def make_etag(*parts: Any) -> str:
+    """strong entity tag for a representation identified by its version [parts] (e.g. a row's [updated_at])"""
+
+    digest = hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """check an If-None-Match header against the current entity tag using weak comparison (RFC 9110 13.1.2)"""
+
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+
+def tag_response(response: Response, etag: str) -> None:
+    """attach the entity tag to a full response"""
+
+    # NOTE: no-cache lets clients store the response but makes them revalidate it with the ETag before every use
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+def check_not_modified(route: str, if_none_match: Optional[str], etag: str) -> Optional[Response]:
+    """return a bodiless 304 response if the client's cached copy is still current or None if the full response is needed"""
+
+    if not if_none_match:
+        return None
+    if etag_matches(if_none_match, etag):
+        conditional_requests_total.labels(route, "not_modified").inc()
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    conditional_requests_total.labels(route, "modified").inc()
+    return None
+
+
+async def get_ratings_version(cnx: Any, user_id: str) -> int:
+    """get the user's ratings version counter (0 if the user has never rated a movie)"""
+
+    statement = select(database.ratings_versions.c.version).where(database.ratings_versions.c.user_id == user_id)
+    version = (await cnx.execute(statement)).scalar()
+    return version or 0
+
+
+async def bump_ratings_version(cnx: Any, user_id: str) -> int:
+    """increment the user's ratings version counter in the same transaction as their ratings change returning the new version
+
+    a single upsert so concurrent first ratings can't fail (and roll back) the ratings written in the same transaction
+    """
+
+    versions = database.ratings_versions
+    statement = insert(versions).values(user_id=user_id, version=1, updated_at=datetime.now())
+    statement = statement.on_conflict_do_update(
+        index_elements=[versions.c.user_id],
+        set_={"version": versions.c.version + 1, "updated_at": statement.excluded.updated_at}
+    ).returning(versions.c.version)
+    return (await cnx.execute(statement)).scalar()
@@ -1,3 +1,6 @@
+import math
+import asyncio
+import logging
 import numpy as np
 import pandas as pd
 
@@ -5,121 +8,464 @@ from typing import List, Dict, Tuple, Optional
 from sklearn.metrics.pairwise import cosine_similarity
 from sqlalchemy import select
 from llama_index.llms import ChatMessage, MessageRole
+from llama_index.llms.generic_utils import messages_to_history_str
+from llama_index.schema import NodeWithScore
+from llama_index.vector_stores.utils import metadata_dict_to_node
 
 from backend.app import database
-from backend.app.constants import engine, openai_client, users_collab_collection, movies_collab_collection, movies_content_chat_engine, movies_collab_embeddings
-from backend.app.constants import LIKED_MOVIE_SCORE, QUERY_SCORE_WEIGHT
-from shared.models import Movie, Recommendation, SearchResponse
+from backend.app.constants import engine, engine_router, llm, embedding_batcher
+from backend.app.constants import movies_content_collection, movie_catalog, model_registry, collab_scorer
+from backend.app.constants import LIKED_MOVIE_SCORE, QUERY_SCORE_WEIGHT, SIMILARITY_TOP_K, RERANK_CANDIDATES
+from backend.app.constants import FILTER_BRUTE_FORCE_MAX, FILTER_OVERSAMPLE, CONDENSE_TOKEN_BUDGET
+from backend.app.constants import QA_CONTEXT_TOKEN_BUDGET, QA_CONTEXT_TOKEN_MAX, QA_CONTEXT_MAX_MOVIES, QA_CONTEXT_OVERVIEW_TOKENS, QA_CONTEXT_FIELDS
+from backend.app.deadlines import CONDENSE_DEADLINE_SHARE, RESPONSE_DEADLINE_RESERVE, Deadline, run_with_deadline
+from backend.app.prompts import CONDENSE_QUESTION_PROMPT, CONDENSE_SESSION_PROMPT, FALLBACK_ANSWER_TEMPLATE, TEXT_QA_PROMPT
+from backend.app.profiling import to_thread
+from backend.app.telemetry import qa_context_tokens, stage, timed_abegin, timed_begin
+from backend.app.tokenizer import count_tokens, fit_context, fit_messages, truncate_text
+from backend.app.vectors import ContentIndex
+from shared.models import Movie, Recommendation, SearchFilters, SearchResponse
+
+
+logger = logging.getLogger(__name__)
 
 
 def embed_query(query: str) -> List[float]:
     """encode a natural language query into an embedding vector"""
 
-    response = openai_client.embeddings.create(input=query, model="text-embedding-ada-002")
-    embedding = response.data[0].embedding
+    embedding = embedding_batcher.embed(query)
     return embedding
 
 
-def get_movies(tmdb_ids: List[str]) -> List[Movie]:
+async def get_movies(tmdb_ids: List[str]) -> List[Movie]:
     """get a list of Movie objects sorted by ID"""
 
-    with engine.begin() as cnx:
-        statement = select(database.movies).where(database.movies.c.tmdb_id.in_(tmdb_ids)).order_by(database.movies.c.tmdb_id)
-        movies = [Movie(**row._asdict()) for row in cnx.execute(statement).all()]
-        return movies
+    with stage("get_movies"):
+        async with timed_abegin(engine_router.reader()) as cnx:
+            statement = select(database.movies).where(database.movies.c.tmdb_id.in_(tmdb_ids)).order_by(database.movies.c.tmdb_id)
+            movies = [Movie(**row._asdict()) for row in (await cnx.execute(statement)).all()]
+            return movies
 
 
-def get_user_recs(user_id: str, k: int = 10) -> List[Recommendation]:
-    """get a list of movie recommendations based on a user's collaborative filtering embedding"""
+async def get_user_ratings(user_id: str) -> pd.DataFrame:
+    """get a dataframe of the user's [ratings] records"""
 
-    # get the user's ratings
-    with engine.begin() as cnx:
-        statement = select(database.ratings).where(database.ratings.c.user_id == user_id)
-        user_ratings = cnx.execute(statement).all()
-        if not user_ratings:
-            return []
+    # NOTE: served by the read replica unless the user rated movies within the read-your-writes window
+    with stage("ratings_fetch"):
+        async with timed_abegin(engine_router.reader(user_id)) as cnx:
+            statement = select(database.ratings).where(database.ratings.c.user_id == user_id)
+            user_ratings = pd.DataFrame((await cnx.execute(statement)).all(), columns=database.ratings.columns.keys())
+            return user_ratings
+
+
+async def get_liked_movies(user_id: str, movies_collab_embeddings: Optional[pd.DataFrame] = None) -> List[str]:
+    """get the IDs of the movies the user has liked which appear in the movie embeddings dataframe"""
+
+    movies_collab_embeddings = model_registry.get().collab_embeddings if movies_collab_embeddings is None else movies_collab_embeddings
+    user_ratings = await get_user_ratings(user_id=user_id)
+    user_ratings = user_ratings[user_ratings["tmdb_id"].isin(movies_collab_embeddings.index)]
+    liked_movies = user_ratings[user_ratings["rating"] >= LIKED_MOVIE_SCORE]["tmdb_id"].to_list()
+    return liked_movies
+
+
+def rank_unrated_movies(user_ratings: pd.DataFrame, k: int = 10, movies_collab_embeddings: Optional[pd.DataFrame] = None) -> pd.Series:
+    """score the top-k movies the user has not yet rated by their collaborative filtering similarity to the user's liked movies
+
+    returns a series of scores indexed by [tmdb_id] sorted by [tmdb_id] which is empty if the user has no liked movies
+    """
+
+    movies_collab_embeddings = model_registry.get().collab_embeddings if movies_collab_embeddings is None else movies_collab_embeddings
 
     # limit the user's ratings to only movies that appear in the movie embeddings dataframe
-    user_ratings = pd.DataFrame(user_ratings)
     user_ratings = user_ratings[user_ratings["tmdb_id"].isin(movies_collab_embeddings.index)]
 
     # select the movies the user has liked and those the user has not yet rated
     liked_movies = user_ratings[user_ratings["rating"] >= LIKED_MOVIE_SCORE]["tmdb_id"]
     unrated_movies = movies_collab_embeddings.index.difference(user_ratings["tmdb_id"])
+    if liked_movies.empty:
+        return pd.Series(dtype=float)
+
+    # score the catalog in this process or scatter it across the worker processes for catalogs too large for one core
+    with stage("cosine_scoring"):
+        recommended_movies = collab_scorer.score(movies_collab_embeddings, liked_movies=liked_movies.to_list(), unrated_movies=unrated_movies, k=k)
+        return recommended_movies
+
+
+def score_user_recs(user_id: str, k: int = 10) -> pd.Series:
+    """blocking equivalent of [get_user_recs] returning only the scores (for background workers outside the event loop)"""
+
+    with stage("ratings_fetch"), timed_begin(engine) as cnx:
+        statement = select(database.ratings).where(database.ratings.c.user_id == user_id)
+        user_ratings = pd.DataFrame(cnx.execute(statement).all(), columns=database.ratings.columns.keys())
 
-    # calculate the average cosine similarity of each candidate movie wrt to the user's liked movies
-    pairwise_similarities = cosine_similarity(movies_collab_embeddings.loc[liked_movies], movies_collab_embeddings)
-    movie_scores = pd.Series(pairwise_similarities.mean(axis=0), index=movies_collab_embeddings.index)
+    recommended_movies = rank_unrated_movies(user_ratings=user_ratings, k=k)
+    return recommended_movies
 
-    # select the top-k movies in terms of average cosine similarity that the user has not yet rated
-    recommended_movies = movie_scores.loc[unrated_movies].sort_values(ascending=False)[:k].sort_index()
+
+async def get_recommendations(movie_scores: pd.Series) -> List[Recommendation]:
+    """convert a series of scores indexed by [tmdb_id] into recommendation objects sorted by descending score"""
+
+    if movie_scores.empty:
+        return []
 
     # get sorted lists of [movies, scores] by tmdb_id
-    movies = get_movies(tmdb_ids=recommended_movies.index.values.tolist())
-    scores = recommended_movies.values.tolist()
+    movie_scores = movie_scores.sort_index()
+    movies = await get_movies(tmdb_ids=movie_scores.index.values.tolist())
+    scores = movie_scores.loc[[movie.tmdb_id for movie in movies]].values.tolist()
 
     # convert the [movie, score] pairs into recommendation objects and return sorted by descending score
     recommendations = [Recommendation(movie=movie, score=score) for movie, score in zip(movies, scores)]
     return sorted(recommendations, key=lambda x: x.score, reverse=True)
 
 
-def run_search(chat_messages: List[ChatMessage], user_id: Optional[str] = None, k: int = 10) -> SearchResponse:
-    """get a list of movie recommendations based on a user's search query embedding"""
+async def get_user_recs(user_id: str, k: int = 10) -> List[Recommendation]:
+    """get a list of movie recommendations based on a user's collaborative filtering embedding"""
 
-    # separate the user's most recent message from the previous chat history
-    message = chat_messages[-1].content
-    chat_history = chat_messages[:-1]
+    # fetch the user's ratings without blocking the event loop and score the whole catalog on a worker thread
+    user_ratings = await get_user_ratings(user_id=user_id)
+    if user_ratings.empty:
+        return []
+
+    recommended_movies = await to_thread(rank_unrated_movies, user_ratings=user_ratings, k=k, movies_collab_embeddings=model_registry.get().collab_embeddings)
+    return await get_recommendations(recommended_movies)
 
-    # send the user query to the chat agent for processing
-    chat_response = movies_content_chat_engine.chat(message=message, chat_history=chat_history)
-    source_nodes = sorted(chat_response.source_nodes, key=lambda x: x.node_id)
 
-    print(f"\nNEW USER MESSAGE: {message}")
-    print(f"\nCHAT HISTORY: {chat_history}")
-    print(f"\nNEW ASSISTANT MESSAGE: {chat_response.response}")
+async def rerank_matches(query_movie_scores: pd.Series, user_id: Optional[str] = None, k: int = SIMILARITY_TOP_K) -> List[Recommendation]:
+    """re-rank a pool of query match scores indexed by [tmdb_id] wrt the user's liked movies or overall movie popularity returning the top-k
 
-    # # find the best movie matches based on the user's query sorting the result by [tmdb_id]
-    # source_nodes = sorted(movies_content_retriever.retrieve(query), key=lambda x: x.node_id)
+    the whole candidate pool is scored in one vectorized pass over the in-memory collab embeddings (or catalog popularity)
+    and [Movie] rows are only loaded for the final top-k so a wide pool costs little more than a narrow one
+    """
 
-    # create an ordered list of movie IDs and a series of [id, score] pairs from the query matches
-    query_match_movies = [match.node_id for match in source_nodes]
-    query_movie_scores = pd.Series(data=[match.score for match in source_nodes], index=query_match_movies)
+    query_movie_scores = query_movie_scores.sort_index()
 
-    # get list of movies and a series of scores based on the query matches sorting the result by [tmdb_id]
-    query_movies = get_movies(tmdb_ids=query_match_movies)
+    # use the same model snapshot throughout even if a new version is swapped in part way through the request
+    snapshot = model_registry.get()
+    movies_collab_embeddings = snapshot.collab_embeddings
 
     if user_id:
 
         # get the user's current set of liked movies
-        with engine.begin() as cnx:
-            statement = select(database.ratings).where(database.ratings.c.user_id == user_id)
-            user_ratings = pd.DataFrame(cnx.execute(statement).all())
-            user_ratings = user_ratings[user_ratings["tmdb_id"].isin(movies_collab_embeddings.index)]
-            liked_movies = user_ratings[user_ratings["rating"] >= LIKED_MOVIE_SCORE]["tmdb_id"].to_list()
+        liked_movies = await get_liked_movies(user_id=user_id, movies_collab_embeddings=movies_collab_embeddings)
 
         # if the user has no liked movies than don't reweight the query similarity scores
         if len(liked_movies) == 0:
             user_movie_scores = query_movie_scores
-
-        # calculate the average cosine similarity of each query match movie wrt the user's liked movies
-        pairwise_similarities = cosine_similarity(movies_collab_embeddings.loc[liked_movies], movies_collab_embeddings.loc[query_match_movies])
-        user_movie_scores = pd.Series(pairwise_similarities.mean(axis=0), index=movies_collab_embeddings.loc[query_match_movies].index)
-        print(user_movie_scores)
+        else:
+            # calculate the average cosine similarity of each candidate movie wrt the user's liked movies
+            # NOTE: candidates without collab embeddings (e.g. movies added since the snapshot) keep their query scores
+            with stage("cosine_scoring"):
+                candidates = query_movie_scores.index[query_movie_scores.index.isin(movies_collab_embeddings.index)]
+                pairwise_similarities = cosine_similarity(movies_collab_embeddings.loc[liked_movies], movies_collab_embeddings.loc[candidates])
+                user_movie_scores = pd.Series(pairwise_similarities.mean(axis=0), index=candidates).reindex(query_movie_scores.index).fillna(query_movie_scores)
 
     else:
 
-        # calculate user-movie scores for the query match movies based on movie popularity scaled onto [0, 1]
-        # FIXME: normalize the popularity scores wrt the entire database of movies not just the topK matches
-        user_movie_scores = pd.Series(data=[movie.popularity for movie in query_movies], index=[movie.tmdb_id for movie in query_movies])
-        user_movie_scores = (user_movie_scores - user_movie_scores.min()) / (user_movie_scores.max() - user_movie_scores.min())
+        # calculate user-movie scores for the candidate movies based on movie popularity scaled onto [0, 1]
+        # NOTE: popularity comes from the in-memory catalog so no movie rows need to be loaded to score the candidates
+        catalog = movie_catalog.get()
+        popularity = pd.Series(catalog.get_popularity(query_movie_scores.index.to_list()), index=query_movie_scores.index)
+        popularity_min = snapshot.catalog_stats.get("popularity_min", float(catalog.popularity.min()) if catalog.size else 0.0)
+        popularity_max = snapshot.catalog_stats.get("popularity_max", float(catalog.popularity.max()) if catalog.size else 1.0)
+        user_movie_scores = ((popularity - popularity_min) / ((popularity_max - popularity_min) or 1.0)).fillna(query_movie_scores)
+
+    # re-rank the movie scores using a weighed average of the [query_movie] and [user_movie] scores keeping the top-k
+    combined_movie_scores = QUERY_SCORE_WEIGHT * query_movie_scores + (1 - QUERY_SCORE_WEIGHT) * user_movie_scores
+    top_movie_scores = combined_movie_scores.sort_values(ascending=False, kind="stable")[:k]
+
+    # load only the final top-k movies and convert the [movie, score] pairs into recommendation objects sorted by score descending
+    movies = await get_movies(tmdb_ids=top_movie_scores.index.to_list())
+    recommendations = [Recommendation(movie=movie, score=top_movie_scores[movie.tmdb_id]) for movie in movies]
+    return sorted(recommendations, key=lambda x: x.score, reverse=True)
+
 
-    # re-rank the movie scores using a weighed average of the [query_movie] and [user_movie] scores sorting the result by [tmdb_id]
-    combined_movie_scores = (QUERY_SCORE_WEIGHT * query_movie_scores + (1 - QUERY_SCORE_WEIGHT) * user_movie_scores).sort_index()
+def condense_question(message: str, chat_history: List[ChatMessage]) -> str:
+    """rewrite the user's latest message into a standalone search query given the previous chat history"""
+
+    if not chat_history:
+        return message
+
+    with stage("condense_llm"):
+        standalone_query = llm.predict(CONDENSE_QUESTION_PROMPT, question=message, chat_history=messages_to_history_str(chat_history))
+        return standalone_query
+
+
+def condense_session_query(message: str, previous_query: Optional[str], recent_messages: List[ChatMessage]) -> str:
+    """rewrite the user's latest message into a standalone search query given the session's previous standalone query
+
+    only as many of the most recent messages as fit in the token budget are included so the prompt stays bounded
+    however long the conversation gets
+    """
 
-    # convert the [movie, score] pairs into recommendation objects and sort by score descending
-    recommendations = [Recommendation(movie=movie, score=score) for movie, score in zip(query_movies, combined_movie_scores)]
-    recommendations = sorted(recommendations, key=lambda x: x.score, reverse=True)
+    if not previous_query and not recent_messages:
+        return message
+
+    previous_query = truncate_text(previous_query, budget=CONDENSE_TOKEN_BUDGET // 4)
+    chat_history = fit_messages(recent_messages, budget=CONDENSE_TOKEN_BUDGET - count_tokens(previous_query or ""))
+
+    with stage("condense_llm"):
+        standalone_query = llm.predict(
+            CONDENSE_SESSION_PROMPT,
+            question=message,
+            previous_query=previous_query or "",
+            chat_history=messages_to_history_str(chat_history)
+        )
+        return standalone_query
+
+
+def get_nodes(matches: List[Tuple[str, Dict, float]]) -> List[NodeWithScore]:
+    """build nodes from [document, metadata, cosine similarity] matches the same way as ChromaVectorStore (similarity = exp(-cosine distance))"""
+
+    source_nodes = []
+    for document, metadata, similarity in matches:
+        node = metadata_dict_to_node(metadata)
+        node.set_content(document)
+        source_nodes.append(NodeWithScore(node=node, score=math.exp(similarity - 1)))
+    return source_nodes
+
+
+def retrieve_candidates(
+    query: str,
+    tmdb_ids: Optional[List[str]] = None,
+    k: int = SIMILARITY_TOP_K,
+    n_candidates: int = RERANK_CANDIDATES,
+    content_index: Optional[ContentIndex] = None
+) -> Tuple[List[NodeWithScore], pd.Series]:
+    """retrieve the best content matches for a query optionally restricted to a pre-filtered set of candidate movies
+
+    returns the top-k matches as nodes (the LLM context) along with the scores of a wider pool of [n_candidates] matches
+    indexed by [tmdb_id] for re-ranking. documents are only loaded for the top-k
+    """
+
+    query_embedding = np.array(embed_query(query))
+    n_candidates = max(k, n_candidates)
+
+    if content_index is not None:
+        # the in-process index scans the candidate rows directly regardless of how many there are
+        rows = content_index.get_rows(tmdb_ids) if tmdb_ids is not None else None
+        rows, similarities = content_index.search(query_embedding, k=n_candidates, rows=rows)
+        candidate_scores = pd.Series(np.exp(similarities.astype(float) - 1), index=content_index.ids[rows].astype(str))
+        return content_index.get_nodes(rows[:k], similarities[:k]), candidate_scores
+
+    if tmdb_ids is not None and len(tmdb_ids) <= FILTER_BRUTE_FORCE_MAX:
+        # score every candidate exactly: cheaper than an ANN search over the whole collection for selective filters
+        return score_candidates(query_embedding, tmdb_ids, k=k, n_candidates=n_candidates)
+
+    # ANN search over the whole collection (oversampled and filtered if restricted to a set of candidates) fetching only distances
+    n_results = min(n_candidates * FILTER_OVERSAMPLE if tmdb_ids is not None else n_candidates, movies_content_collection.count())
+    if n_results == 0:
+        return [], pd.Series(dtype=float)
+    results = movies_content_collection.query(query_embeddings=[query_embedding.tolist()], n_results=n_results, include=["distances"])
+    allowed = set(tmdb_ids) if tmdb_ids is not None else None
+    matches = [
+        (tmdb_id, 1 - distance)
+        for tmdb_id, distance in zip(results["ids"][0], results["distances"][0])
+        if allowed is None or tmdb_id in allowed
+    ][:n_candidates]
+    if allowed is not None and len(matches) < min(k, len(allowed)):
+        # the oversampled neighbors held too few of the candidates so score all of them exactly rather than return fewer than k
+        return score_candidates(query_embedding, tmdb_ids, k=k, n_candidates=n_candidates)
+    candidate_scores = pd.Series([math.exp(similarity - 1) for _, similarity in matches], index=[tmdb_id for tmdb_id, _ in matches], dtype=float)
+
+    # then load the documents of only the top-k matches for the LLM context
+    top_ids = [tmdb_id for tmdb_id, _ in matches[:k]]
+    records = movies_content_collection.get(ids=top_ids, include=["documents", "metadatas"]) if top_ids else {"ids": [], "documents": [], "metadatas": []}
+    records = {tmdb_id: (document, metadata) for tmdb_id, document, metadata in zip(records["ids"], records["documents"], records["metadatas"])}
+    return get_nodes([(*records[tmdb_id], similarity) for tmdb_id, similarity in matches[:k] if tmdb_id in records]), candidate_scores
+
+
+def score_candidates(query_embedding: np.ndarray, tmdb_ids: List[str], k: int, n_candidates: int) -> Tuple[List[NodeWithScore], pd.Series]:
+    """exactly score a set of candidate movies returning the top-k as nodes and the top [n_candidates] scores by [tmdb_id]"""
+
+    candidates = movies_content_collection.get(ids=tmdb_ids, include=["embeddings", "documents", "metadatas"])
+    embeddings = np.array(candidates["embeddings"]).reshape(-1, len(query_embedding))
+    similarities = embeddings @ query_embedding / (np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query_embedding))
+    top = np.argsort(-similarities, kind="stable")[:n_candidates]
+    candidate_scores = pd.Series(np.exp(similarities[top] - 1), index=[candidates["ids"][i] for i in top], dtype=float)
+    return get_nodes([(candidates["documents"][i], candidates["metadatas"][i], similarities[i]) for i in top[:k]]), candidate_scores
+
+
+def retrieve_matches(query: str, filters: Optional[SearchFilters] = None) -> Tuple[List[NodeWithScore], pd.Series, Optional[SearchFilters]]:
+    """retrieve the best content matches for a standalone search query sorted by [tmdb_id], a wider pool of candidate
+    scores for re-ranking, and the filters applied
+
+    explicit filters are always applied while filters parsed from the query are only applied if enough movies match them
+    """
+
+    # serve content search from the snapshot's in-process index when it has one and from Chroma otherwise
+    content_index = model_registry.get().content_index
+
+    with stage("retrieval"):
+
+        # narrow the candidate set with the in-memory catalog before any vector scoring
+        with stage("catalog_filter"):
+            catalog = movie_catalog.get()
+            explicit = filters is not None
+            filters = filters if explicit else catalog.parse_filters(query)
+            rows = catalog.filter(filters)
+
+        if rows is not None and (explicit or len(rows) >= SIMILARITY_TOP_K):
+            if len(rows):
+                source_nodes, candidate_scores = retrieve_candidates(query, tmdb_ids=catalog.tmdb_ids[rows].tolist(), content_index=content_index)
+            else:
+                source_nodes, candidate_scores = [], pd.Series(dtype=float)
+        else:
+            filters = None
+            source_nodes, candidate_scores = retrieve_candidates(query, content_index=content_index)
+
+        return sorted(source_nodes, key=lambda x: x.node_id), candidate_scores, filters
+
+
+def answer_query(query: str, source_nodes: List[NodeWithScore], context_tokens: Optional[int] = None) -> str:
+    """generate the assistant's response message for a search query and its retrieved matches
+
+    the matches are rendered as a compact context of the fields the suggestions draw on within a token budget
+    (QA_CONTEXT_TOKEN_BUDGET unless the request sets its own, capped by QA_CONTEXT_TOKEN_MAX)
+    """
+
+    budget = QA_CONTEXT_TOKEN_BUDGET if context_tokens is None else min(max(context_tokens, 0), QA_CONTEXT_TOKEN_MAX)
+    with stage("qa_context"):
+        context = fit_context(
+            source_nodes,
+            budget=budget,
+            fields=QA_CONTEXT_FIELDS,
+            max_movies=QA_CONTEXT_MAX_MOVIES,
+            overview_tokens=QA_CONTEXT_OVERVIEW_TOKENS
+        )
+    qa_context_tokens.observe(count_tokens(context))
+    with stage("qa_llm"):
+        response = llm.predict(TEXT_QA_PROMPT, query_str=query, context_str=context)
+        return response
+
+
+async def search_standalone_query(
+    standalone_query: str,
+    message: str,
+    user_id: Optional[str] = None,
+    k: int = SIMILARITY_TOP_K,
+    filters: Optional[SearchFilters] = None,
+    context_tokens: Optional[int] = None,
+    chat_history_length: int = 0,
+    deadline: Optional[Deadline] = None,
+    degraded: bool = False
+) -> SearchResponse:
+    """find, answer, and re-rank the best matches for an already condensed standalone search query
+
+    the QA response falls back to a templated message if it isn't ready before the deadline (less a reserve for the
+    response itself) so the re-ranked results are always returned on time
+    """
+
+    deadline = deadline or Deadline.from_ms()
+    k = k or SIMILARITY_TOP_K
+
+    # NOTE: the OpenAI/Chroma clients are blocking so these stages run on worker threads to keep the event loop free
+    source_nodes, candidate_scores, filters = await to_thread(retrieve_matches, query=standalone_query, filters=filters)
+
+    # re-rank the wider candidate pool for the user while the QA response generates from the top content matches
+    (response, qa_degraded), recommendations = await asyncio.gather(
+        run_with_deadline(
+            "qa",
+            deadline.reserve(RESPONSE_DEADLINE_RESERVE),
+            lambda: FALLBACK_ANSWER_TEMPLATE.format(query=standalone_query),
+            answer_query,
+            query=standalone_query,
+            source_nodes=source_nodes,
+            context_tokens=context_tokens
+        ),
+        rerank_matches(query_movie_scores=candidate_scores, user_id=user_id, k=k)
+    )
+    degraded = degraded or qa_degraded
+
+    logger.info(
+        "search completed",
+        extra={
+            "user_id": user_id,
+            "user_message": message,
+            "chat_history_length": chat_history_length,
+            "standalone_query": standalone_query,
+            "assistant_message": response,
+            "degraded": degraded
+        }
+    )
 
     # return the text response message as well as the formatted list of recommendations
-    search_response = SearchResponse(message=chat_response.response, recommendations=recommendations)
+    search_response = SearchResponse(message=response, recommendations=recommendations, filters=filters, standalone_query=standalone_query, degraded=degraded)
+    return search_response
+
+
+async def run_search(
+    chat_messages: List[ChatMessage],
+    user_id: Optional[str] = None,
+    k: int = 10,
+    filters: Optional[SearchFilters] = None,
+    context_tokens: Optional[int] = None,
+    deadline: Optional[Deadline] = None
+) -> SearchResponse:
+    """get a list of movie recommendations based on a user's search query embedding
+
+    if the condense LLM call misses its share of the deadline the search falls back to the user's raw latest message
+    """
+
+    deadline = deadline or Deadline.from_ms()
+
+    # separate the user's most recent message from the previous chat history
+    message = chat_messages[-1].content
+    chat_history = chat_messages[:-1]
+
+    # condense the conversation into a standalone query then find the best matches and generate the assistant's response
+    standalone_query, degraded = await run_with_deadline(
+        "condense",
+        deadline.share(CONDENSE_DEADLINE_SHARE),
+        lambda: message,
+        condense_question,
+        message=message,
+        chat_history=chat_history
+    )
+    search_response = await search_standalone_query(
+        standalone_query,
+        message=message,
+        user_id=user_id,
+        k=k,
+        filters=filters,
+        context_tokens=context_tokens,
+        chat_history_length=len(chat_history),
+        deadline=deadline,
+        degraded=degraded
+    )
+    return search_response
+
+
+async def run_session_search(
+    message: str,
+    previous_query: Optional[str],
+    recent_messages: List[ChatMessage],
+    user_id: Optional[str] = None,
+    k: int = SIMILARITY_TOP_K,
+    filters: Optional[SearchFilters] = None,
+    context_tokens: Optional[int] = None,
+    deadline: Optional[Deadline] = None
+) -> SearchResponse:
+    """get a list of movie recommendations for the latest message of a server-side conversation session"""
+
+    deadline = deadline or Deadline.from_ms()
+    standalone_query, degraded = await run_with_deadline(
+        "condense",
+        deadline.share(CONDENSE_DEADLINE_SHARE),
+        lambda: message,
+        condense_session_query,
+        message=message,
+        previous_query=previous_query,
+        recent_messages=recent_messages
+    )
+    search_response = await search_standalone_query(
+        standalone_query,
+        message=message,
+        user_id=user_id,
+        k=k,
+        filters=filters,
+        context_tokens=context_tokens,
+        chat_history_length=len(recent_messages),
+        deadline=deadline,
+        degraded=degraded
+    )
     return search_response
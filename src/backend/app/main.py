@@ -1,18 +1,92 @@
 import os
+import time
+import logging
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from backend.app.api.users import router as users_router
 from backend.app.api.movies import router as movies_router
 from backend.app.api.search import router as search_router
+from backend.app.api.sessions import router as sessions_router
 from backend.app.api.login import router as login_router
+from backend.app.api.admin import router as admin_router
+from backend.app.admission import AdmissionRejected, get_client_key, get_limiter
+from backend.app.constants import collab_scorer, engine, model_registry
+from backend.app.lib import score_user_recs
+from backend.app.memory import memory_tracker
+from backend.app.profiling import PROFILE_HEADER, profiler
+from backend.app.recommendations import RecommendationsRefresher
+from backend.app.security import password_pool
+from backend.app.telemetry import configure_logging, request_seconds, request_timings, server_timing_header
 
 
+RECS_REFRESH_ENABLED = bool(int(os.environ.get("RECS_REFRESH_ENABLED", "1")))
+
+
+configure_logging()
+logger = logging.getLogger(__name__)
+recommendations_refresher = RecommendationsRefresher(engine, score_fn=score_user_recs, model_created_at=lambda: model_registry.get().created_at)
+memory_tracker.register("request_profiles", lambda: profiler.profiles)
+
 app = FastAPI()
 app.include_router(users_router, tags=["Users"])
 app.include_router(movies_router, tags=["Movies"])
 app.include_router(search_router, tags=["Search"])
+app.include_router(sessions_router, tags=["Sessions"])
 app.include_router(login_router, tags=["Login"])
+app.include_router(admin_router, tags=["Admin"])
+
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next) -> Response:
+    """limit concurrent requests per budget (LLM-backed vs. LLM-free) shedding load with a 429/503 once the queue is full"""
+
+    limiter = get_limiter(request.url.path)
+    if limiter is None:
+        return await call_next(request)
+
+    try:
+        async with limiter.admit(get_client_key(request)):
+            return await call_next(request)
+    except AdmissionRejected as err:
+        return JSONResponse(status_code=err.status_code, content={"detail": err.detail}, headers={"Retry-After": str(err.retry_after)})
+
+
+@app.middleware("http")
+async def record_timings(request: Request, call_next) -> Response:
+    """collect per-stage timings for each request and report them via the Server-Timing header and request histogram"""
+
+    timings = []
+    token = request_timings.set(timings)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        request_timings.reset(token)
+    elapsed = time.perf_counter() - start
+
+    route = request.scope.get("route")
+    route_path = route.path if route else "unmatched"
+    request_seconds.labels(request.method, route_path, response.status_code).observe(elapsed)
+
+    response.headers["Server-Timing"] = server_timing_header(timings + [("total", elapsed)])
+    return response
+
+
+@app.middleware("http")
+async def profile_requests(request: Request, call_next) -> Response:
+    """sample requests that carry the profiling header or run past the profiling threshold"""
+
+    active_request = profiler.begin(request.method, request.url.path, forced=request.headers.get(PROFILE_HEADER) == "1")
+    try:
+        response = await call_next(request)
+    finally:
+        profile = profiler.end(active_request)
+    if profile is not None:
+        response.headers["X-Profile-Id"] = profile.profile_id
+    return response
 
 
 @app.get("/")
@@ -23,6 +97,43 @@ def root():
     return response
 
 
+@app.get("/metrics")
+def metrics():
+    """expose application metrics in the Prometheus text exposition format"""
+
+    response = Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    return response
+
+
+@app.on_event("startup")
+def startup():
+    """start background workers on application startup"""
+
+    # load the model snapshot before serving traffic and watch the registry for new versions
+    model_registry.start()
+    if RECS_REFRESH_ENABLED:
+        recommendations_refresher.start()
+
+    # log the baseline memory footprint of each component once the model snapshot is resident
+    memory_tracker.start()
+    snapshot = memory_tracker.snapshot()
+    logger.info("memory usage at startup", extra={
+        "rss_mb": round(snapshot.rss_bytes / 2**20, 1),
+        "components_mb": {component: round(size / 2**20, 1) for component, size in snapshot.components.items()},
+        "seconds": snapshot.measure_seconds
+    })
+
+
+@app.on_event("shutdown")
+def shutdown():
+    """stop background workers and worker processes on application shutdown"""
+
+    recommendations_refresher.stop()
+    model_registry.stop()
+    password_pool.shutdown()
+    collab_scorer.shutdown()
+
+
 if __name__ == "__main__":
     host = str(os.environ.get("HOST", "0.0.0.0"))
     port = int(os.environ.get("PORT", "8080"))
@@ -0,0 +1,210 @@
+import os
+import sys
+import time
+import types
+import logging
+import resource
+import threading
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from prometheus_client import Gauge
+
+MEMORY_TRACEMALLOC_FRAMES = int(os.environ.get("MEMORY_TRACEMALLOC_FRAMES", "0"))
+MEMORY_TOP_ALLOCATIONS = int(os.environ.get("MEMORY_TOP_ALLOCATIONS", "20"))
+HNSW_DEFAULT_M = 16
+
+
+logger = logging.getLogger(__name__)
+
+memory_component_bytes = Gauge(
+    "memory_component_bytes",
+    "estimated resident size of each major in-memory structure as of the last memory snapshot",
+    ["component"]
+)
+
+# objects which are shared by everything (or not owned by any component) and never followed when sizing
+SKIPPED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType, types.CodeType, types.FrameType, logging.Logger)
+LEAF_TYPES = (str, bytes, bytearray, int, float, complex, bool, type(None))
+
+
+@dataclass
+class MemoryAllocation:
+    """growth of the allocations made at a single source line between two snapshots (tracemalloc only)"""
+
+    location: str
+    size_bytes: int
+    growth_bytes: int
+    count: int
+
+
+@dataclass
+class MemorySnapshot:
+    """point-in-time memory accounting for the process and each registered component"""
+
+    taken_at: datetime
+    rss_bytes: int
+    components: Dict[str, int]
+    measure_seconds: float
+    rss_growth_bytes: Optional[int] = None
+    component_growth_bytes: Dict[str, int] = field(default_factory=dict)
+    allocations: List[MemoryAllocation] = field(default_factory=list)
+
+    @property
+    def attributed_bytes(self) -> int:
+        return sum(self.components.values())
+
+
+def deep_sizeof(obj: Any, seen: Optional[Set[int]] = None) -> int:
+    """approximate the memory held by an object and everything reachable from it that hasn't already been [seen]
+
+    numpy arrays and pandas objects are measured by their buffers, memory-mapped arrays count only their headers (their
+    pages belong to the page cache) and modules, classes and functions are never followed. opaque extension objects
+    (e.g. native index handles) only count their Python header so their native memory must be estimated separately
+    """
+
+    seen = set() if seen is None else seen
+    size, stack = 0, [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, SKIPPED_TYPES):
+            continue
+        seen.add(id(obj))
+
+        if isinstance(obj, LEAF_TYPES):
+            size += sys.getsizeof(obj)
+        elif isinstance(obj, np.ndarray):
+            size += sys.getsizeof(obj) if obj.base is None and not isinstance(obj, np.memmap) else object.__sizeof__(obj)
+            if obj.base is not None:
+                stack.append(obj.base)
+        elif isinstance(obj, pd.DataFrame):
+            size += int(obj.memory_usage(deep=True, index=True).sum())
+        elif isinstance(obj, (pd.Series, pd.Index)):
+            size += int(obj.memory_usage(deep=True))
+        elif isinstance(obj, dict):
+            size += sys.getsizeof(obj)
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+            size += sys.getsizeof(obj)
+            stack.extend(obj)
+        else:
+            size += sys.getsizeof(obj, 0)
+            if hasattr(obj, "__dict__"):
+                stack.append(vars(obj))
+            for slot in getattr(type(obj), "__slots__", ()):
+                if isinstance(slot, str) and hasattr(obj, slot):
+                    stack.append(getattr(obj, slot))
+    return size
+
+
+def sizeof_nbytes(obj: Any, seen: Set[int]) -> int:
+    """size a structure which accounts for its own memory via an [nbytes] attribute (0 if it hasn't been loaded yet)"""
+
+    if obj is None:
+        return 0
+    seen.add(id(obj))
+    return int(obj.nbytes)
+
+
+def estimate_hnsw_bytes(collection: Any) -> int:
+    """estimate the native memory of a Chroma collection's HNSW index once it is loaded from the hnswlib element layout
+    ([dim] float32 values + 2M level-0 links + link count + label per element, ignoring the sparse upper levels)
+    """
+
+    count = collection.count()
+    if count == 0:
+        return 0
+    embeddings = collection.peek(limit=1)["embeddings"]
+    dim = len(embeddings[0]) if embeddings is not None and len(embeddings) else 0
+    m = int((collection.metadata or {}).get("hnsw:M", HNSW_DEFAULT_M))
+    return count * (4 * dim + 4 * 2 * m + 4 + 8)
+
+
+def get_rss_bytes() -> int:
+    """current resident set size of the process (peak RSS where /proc isn't available)"""
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class MemoryTracker:
+    """registry of the process's major in-memory structures which takes memory snapshots on demand reporting the size of
+    each component and its growth since the previous snapshot
+
+    components are sized in registration order sharing one set of seen objects so anything referenced by several
+    components is only counted once (against the first). with MEMORY_TRACEMALLOC_FRAMES > 0 allocations are also traced
+    and each snapshot reports the source lines whose allocations grew the most
+    """
+
+    def __init__(self, tracemalloc_frames: int = MEMORY_TRACEMALLOC_FRAMES, top_allocations: int = MEMORY_TOP_ALLOCATIONS) -> None:
+        self.tracemalloc_frames = tracemalloc_frames
+        self.top_allocations = top_allocations
+        self.last: Optional[MemorySnapshot] = None
+        self._components: List[Tuple[str, Callable[[], Any], Callable[[Any, Set[int]], int]]] = []
+        self._traced: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    def register(self, component: str, getter: Callable[[], Any], sizer: Callable[[Any, Set[int]], int] = deep_sizeof) -> None:
+        """register a component by a function returning its current object(s) and how to size them (deep_sizeof by default)"""
+
+        self._components.append((component, getter, sizer))
+
+    def start(self) -> None:
+        """start tracing allocations if enabled"""
+
+        if self.tracemalloc_frames > 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+
+    def snapshot(self) -> MemorySnapshot:
+        """measure every component and the process RSS and diff them against the previous snapshot"""
+
+        with self._lock:
+            start = time.perf_counter()
+            seen: Set[int] = set()
+            components = {}
+            for component, getter, sizer in self._components:
+                try:
+                    components[component] = sizer(getter(), seen)
+                except Exception:
+                    logger.exception("failed to measure memory component", extra={"component": component})
+                    components[component] = 0
+                memory_component_bytes.labels(component).set(components[component])
+
+            snapshot = MemorySnapshot(taken_at=datetime.now(), rss_bytes=get_rss_bytes(), components=components, measure_seconds=time.perf_counter() - start)
+            if self.last is not None:
+                snapshot.rss_growth_bytes = snapshot.rss_bytes - self.last.rss_bytes
+                snapshot.component_growth_bytes = {component: size - self.last.components.get(component, 0) for component, size in components.items()}
+            snapshot.allocations = self._trace_allocations()
+
+            self.last = snapshot
+            return snapshot
+
+    def _trace_allocations(self) -> List[MemoryAllocation]:
+        if not tracemalloc.is_tracing():
+            return []
+
+        traced = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        previous, self._traced = self._traced, traced
+        if previous is None:
+            statistics = [(stat.traceback, stat.size, stat.size, stat.count) for stat in traced.statistics("lineno")]
+        else:
+            statistics = [(stat.traceback, stat.size, stat.size_diff, stat.count) for stat in traced.compare_to(previous, "lineno")]
+
+        allocations = [
+            MemoryAllocation(location=f"{traceback[0].filename}:{traceback[0].lineno}", size_bytes=size, growth_bytes=growth, count=count)
+            for traceback, size, growth, count in statistics
+        ]
+        return sorted(allocations, key=lambda x: x.growth_bytes, reverse=True)[:self.top_allocations]
+
+
+memory_tracker = MemoryTracker()
@@ -0,0 +1,182 @@
+import logging
+
+from argparse import ArgumentParser
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Optional
+from sqlalchemy import MetaData, Table, Column, Connection, Engine, func, insert, literal, select, text
+from sqlalchemy.types import DateTime, Integer, Text
+
+from backend.app import database
+
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_LOCK_ID = 5_318_008
+
+migrations_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migrations_metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", Text),
+    Column("applied_at", DateTime)
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    """a single versioned schema change; [online] migrations run outside of a transaction so they don't block writes"""
+
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+    online: bool = False
+
+
+def create_index(cnx: Connection, name: str, table: str, columns: List[str], unique: bool = False, include: Optional[List[str]] = None) -> None:
+    """create an index if it doesn't exist yet, without locking out writes on Postgres (CREATE INDEX CONCURRENTLY)"""
+
+    unique_clause = "UNIQUE " if unique else ""
+    if cnx.dialect.name == "postgresql":
+
+        # a failed CONCURRENTLY build leaves behind an INVALID index which IF NOT EXISTS would otherwise silently skip
+        invalid = cnx.execute(
+            text("SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name AND NOT i.indisvalid"),
+            {"name": name}
+        ).first()
+        if invalid:
+            cnx.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+        include_clause = f" INCLUDE ({', '.join(include)})" if include else ""
+        cnx.execute(text(f"CREATE {unique_clause}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({', '.join(columns)}){include_clause}"))
+    else:
+        cnx.execute(text(f"CREATE {unique_clause}INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+
+
+def create_tables(cnx: Connection) -> None:
+    """create the original application tables"""
+
+    database.metadata.create_all(cnx, tables=[database.users, database.movies, database.ratings])
+
+
+def create_users_email_index(cnx: Connection) -> None:
+    """unique index for the [users.email] lookups in login_user() and create_user()"""
+
+    create_index(cnx, name="ix_users_email", table="users", columns=["email"], unique=True)
+
+
+def create_ratings_user_index(cnx: Connection) -> None:
+    """covering index so get_user_ratings() can read a user's [tmdb_id, rating] pairs for the join from the index alone"""
+
+    create_index(cnx, name="ix_ratings_user_id", table="ratings", columns=["user_id", "tmdb_id"], include=["rating"])
+
+
+def create_user_recommendations_table(cnx: Connection) -> None:
+    """materialized top-N recommendations per user refreshed by [backend.app.recommendations]"""
+
+    database.metadata.create_all(cnx, tables=[database.user_recommendations])
+
+
+def create_ratings_updated_at_index(cnx: Connection) -> None:
+    """index for the recommendations refresher to find the users whose ratings changed since its last pass"""
+
+    create_index(cnx, name="ix_ratings_updated_at", table="ratings", columns=["updated_at"])
+
+
+def create_conversation_tables(cnx: Connection) -> None:
+    """server-side conversation sessions for [backend.app.sessions] so /search clients only send the new message"""
+
+    database.metadata.create_all(cnx, tables=[database.conversations, database.conversation_messages])
+
+
+def create_ratings_versions_table(cnx: Connection) -> None:
+    """per-user ratings version counters for the ratings/recommendations ETags backfilled for every user with ratings"""
+
+    database.metadata.create_all(cnx, tables=[database.ratings_versions])
+    ratings = database.ratings
+    statement = insert(database.ratings_versions).from_select(
+        ["user_id", "version", "updated_at"],
+        select(ratings.c.user_id, literal(1), func.max(ratings.c.updated_at)).group_by(ratings.c.user_id)
+    )
+    cnx.execute(statement)
+
+
+MIGRATIONS = [
+    Migration(version=1, name="create_tables", upgrade=create_tables),
+    Migration(version=2, name="create_users_email_index", upgrade=create_users_email_index, online=True),
+    Migration(version=3, name="create_ratings_user_index", upgrade=create_ratings_user_index, online=True),
+    Migration(version=4, name="create_user_recommendations_table", upgrade=create_user_recommendations_table),
+    Migration(version=5, name="create_ratings_updated_at_index", upgrade=create_ratings_updated_at_index, online=True),
+    Migration(version=6, name="create_conversation_tables", upgrade=create_conversation_tables),
+    Migration(version=7, name="create_ratings_versions_table", upgrade=create_ratings_versions_table),
+]
+
+
+def get_applied_versions(engine: Engine) -> List[int]:
+    """get the versions of all migrations already applied to the database"""
+
+    migrations_metadata.create_all(engine)
+    with engine.begin() as cnx:
+        versions = cnx.execute(select(schema_migrations.c.version).order_by(schema_migrations.c.version)).scalars().all()
+        return versions
+
+
+def apply_migration(engine: Engine, migration: Migration) -> None:
+    """apply a single migration and record it in the [schema_migrations] table"""
+
+    logger.info("applying migration", extra={"version": migration.version, "migration": migration.name})
+    if migration.online and engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as cnx:
+            migration.upgrade(cnx)
+    else:
+        with engine.begin() as cnx:
+            migration.upgrade(cnx)
+
+    with engine.begin() as cnx:
+        cnx.execute(insert(schema_migrations).values(version=migration.version, name=migration.name, applied_at=datetime.now()))
+
+
+def migrate(engine: Engine, target: Optional[int] = None) -> List[int]:
+    """apply all pending migrations (up to and including [target]) in version order returning the versions applied"""
+
+    lock = None
+    if engine.dialect.name == "postgresql":
+        # serialize concurrent migration runs (e.g. several instances starting at once) with a session-level advisory lock
+        lock = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        lock.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATIONS_LOCK_ID})
+
+    try:
+        applied = set(get_applied_versions(engine))
+        pending = [migration for migration in MIGRATIONS if migration.version not in applied and (target is None or migration.version <= target)]
+        for migration in pending:
+            apply_migration(engine, migration)
+        return [migration.version for migration in pending]
+    finally:
+        if lock is not None:
+            lock.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATIONS_LOCK_ID})
+            lock.close()
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(description="apply pending schema migrations to the application database")
+    parser.add_argument("--test", action="store_true", help="migrate the local test DuckDB database instead of CloudSQL")
+    parser.add_argument("--echo", action="store_true", help="echo the generated SQL")
+    parser.add_argument("--target", type=int, help="only apply migrations up to and including this version")
+    parser.add_argument("--status", action="store_true", help="list applied and pending migrations without applying anything")
+    args = parser.parse_args()
+
+    if args.test:
+        engine = database.get_test_engine(echo=args.echo)
+    else:
+        engine = database.get_engine(echo=args.echo)
+
+    if args.status:
+        applied = set(get_applied_versions(engine))
+        for migration in MIGRATIONS:
+            print(f"{migration.version:04d} {migration.name:<40} {'applied' if migration.version in applied else 'pending'}")
+    else:
+        versions = migrate(engine, target=args.target)
+        print(f"applied migrations: {versions}" if versions else "database schema is up to date")
@@ -0,0 +1,226 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import functools
+import threading
+
+from collections import Counter, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Deque, Dict, List, Optional, Set
+from uuid import uuid4
+from fastapi.routing import APIRoute
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_THRESHOLD_MS = float(os.environ.get("PROFILE_THRESHOLD_MS", "2000"))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_BUFFER_SIZE = int(os.environ.get("PROFILE_BUFFER_SIZE", "50"))
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ActiveRequest:
+    """an in-flight request which may be sampled if it is forced or runs past the threshold"""
+
+    method: str
+    path: str
+    forced: bool
+    start: float = field(default_factory=time.perf_counter)
+    started_at: datetime = field(default_factory=datetime.now)
+    thread_ids: Set[int] = field(default_factory=set)
+    stacks: Counter = field(default_factory=Counter)
+    samples: int = 0
+
+
+@dataclass
+class RequestProfile:
+    """a completed sampling profile for a single request"""
+
+    profile_id: str
+    method: str
+    path: str
+    trigger: str
+    started_at: datetime
+    duration_ms: float
+    samples: int
+    stacks: Counter
+
+    def folded(self) -> str:
+        """render the samples in the folded-stack format used by flamegraph.pl, speedscope and inferno"""
+
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+# the in-flight request being handled in the current context (None outside of a request)
+current_request: ContextVar[Optional[ActiveRequest]] = ContextVar("current_request", default=None)
+
+
+def fold_stack(frame) -> str:
+    """fold a thread's stack into a single root-to-leaf semicolon-delimited string"""
+
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+
+class Profiler:
+    """on-demand sampling profiler which only samples the threads of forced or slow in-flight requests"""
+
+    def __init__(self, threshold_ms: float = PROFILE_THRESHOLD_MS, interval_ms: float = PROFILE_INTERVAL_MS, buffer_size: int = PROFILE_BUFFER_SIZE) -> None:
+        self.threshold = threshold_ms / 1000 if threshold_ms > 0 else None
+        self.interval = interval_ms / 1000
+        self.profiles: Deque[RequestProfile] = deque(maxlen=buffer_size)
+        self._active: Dict[int, ActiveRequest] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def begin(self, method: str, path: str, forced: bool = False) -> ActiveRequest:
+        """register a new in-flight request and make it the current request for this context"""
+
+        request = ActiveRequest(method=method, path=path, forced=forced)
+        with self._lock:
+            self._active[id(request)] = request
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        current_request.set(request)
+        if forced:
+            self._wakeup.set()
+        return request
+
+    def end(self, request: ActiveRequest) -> Optional[RequestProfile]:
+        """unregister a completed request storing its profile in the ring buffer if it was sampled"""
+
+        with self._lock:
+            self._active.pop(id(request), None)
+            if not request.samples:
+                return None
+            profile = RequestProfile(
+                profile_id=str(uuid4()),
+                method=request.method,
+                path=request.path,
+                trigger="header" if request.forced else "threshold",
+                started_at=request.started_at,
+                duration_ms=(time.perf_counter() - request.start) * 1000,
+                samples=request.samples,
+                stacks=request.stacks
+            )
+            self.profiles.append(profile)
+            return profile
+
+    def get_profile(self, profile_id: str) -> Optional[RequestProfile]:
+        """look up a stored profile by ID"""
+
+        return next((profile for profile in self.profiles if profile.profile_id == profile_id), None)
+
+    def _targets(self) -> List[ActiveRequest]:
+        """find the in-flight requests that should currently be sampled"""
+
+        now = time.perf_counter()
+        with self._lock:
+            return [
+                request for request in self._active.values()
+                if request.forced or (self.threshold is not None and now - request.start >= self.threshold)
+            ]
+
+    def _run(self) -> None:
+        """sampling loop which idles (polling at a fraction of the threshold) until there is a request to sample"""
+
+        idle_interval = min(self.threshold / 4, 0.25) if self.threshold else 0.25
+        while True:
+            targets = self._targets()
+            if not targets:
+                self._wakeup.wait(idle_interval)
+                self._wakeup.clear()
+                continue
+
+            try:
+                self._sample(targets)
+            except Exception:
+                # never let a bad sample kill the sampler thread (it's only started once)
+                logger.exception("request profiler failed to sample")
+            time.sleep(self.interval)
+
+    def _sample(self, targets: List[ActiveRequest]) -> None:
+        """add one sample of the stacks of each target request's attached threads"""
+
+        frames = sys._current_frames()
+        try:
+            with self._lock:
+                for request in targets:
+                    # NOTE: [attach_thread] and [to_thread] mutate the set from request threads without the lock so iterate a copy
+                    for thread_id in tuple(request.thread_ids):
+                        frame = frames.get(thread_id)
+                        if frame is not None:
+                            request.stacks[fold_stack(frame)] += 1
+                            request.samples += 1
+        finally:
+            del frames
+
+
+def attach_thread(request: Optional[ActiveRequest] = None) -> None:
+    """mark the calling thread as doing work for the current request so that it is included when sampling"""
+
+    request = request or current_request.get()
+    if request is not None:
+        request.thread_ids.add(threading.get_ident())
+
+
+async def to_thread(fn: Callable, *args, **kwargs):
+    """[asyncio.to_thread] which attaches the worker thread to the current request while it runs [fn]"""
+
+    def run():
+        request = current_request.get()
+        attach_thread(request)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if request is not None:
+                request.thread_ids.discard(threading.get_ident())
+
+    return await asyncio.to_thread(run)
+
+
+def profiled(endpoint: Callable) -> Callable:
+    """wrap a route endpoint so the (worker) thread that ends up executing it is attached to the current request
+
+    NOTE: async endpoints run on (and so attach) the event loop thread which interleaves every in-flight async request
+    so their profiles also include the frames of other requests running on the loop while they were sampled. work they
+    offload with [to_thread] is attributed to the request alone
+    """
+
+    if getattr(endpoint, "__profiled__", False):
+        return endpoint
+
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            attach_thread()
+            return await endpoint(*args, **kwargs)
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            attach_thread()
+            return endpoint(*args, **kwargs)
+
+    wrapper.__profiled__ = True
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose endpoint attaches its executing thread to the current request for the profiler"""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs) -> None:
+        super().__init__(path, profiled(endpoint), **kwargs)
+
+
+profiler = Profiler()
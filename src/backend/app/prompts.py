@@ -17,6 +17,26 @@ CURRENT_MESSAGE:
 STANDALONE_QUERY:
 """)
 
+CONDENSE_SESSION_PROMPT = PromptTemplate("""
+Your goal is to interactively help the user find relevant movies based on a sequence of search queries in the form of chat messages.
+Given the PREVIOUS_QUERY (the standalone query for the conversation so far), the most RECENT_MESSAGES, and the CURRENT_MESSAGE below, \
+rewrite the CURRENT_MESSAGE into a STANDALONE_QUERY that captures all relevant information from the user's messages.
+The STANDALONE_QUERY should only include search/query terms from the PREVIOUS_QUERY and the user's messages - do not add extra search terms.
+Remove search/query terms from the PREVIOUS_QUERY that have been contradicted by the CURRENT_MESSAGE so the STANDALONE_QUERY is coherent.
+Your response should be optimized for submission to a semantic search query engine.
+
+PREVIOUS_QUERY:
+{previous_query}
+
+RECENT_MESSAGES:
+{chat_history}
+
+CURRENT_MESSAGE:
+{question}
+
+STANDALONE_QUERY:
+""")
+
 TEXT_QA_PROMPT = PromptTemplate("""
 Your goal is to help the user interact with a semantic search engine to find relevant movies.
 The search engine matches the user's query against the following movie attributes: genres, keywords, director, actors, plot overview
@@ -52,3 +72,8 @@ RECOMMENDED_MOVIES:
 
 Response:
 """)
+
+# NOTE: used in place of the TEXT_QA_PROMPT response when the QA LLM call misses the search deadline
+FALLBACK_ANSWER_TEMPLATE = """Here are the top results for "{query}".
+
+Add more details about the plot, tone, or cast you're looking for to further refine your search."""
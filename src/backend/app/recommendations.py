@@ -0,0 +1,295 @@
+import os
+import time
+import logging
+import threading
+import pandas as pd
+
+from argparse import ArgumentParser
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+from prometheus_client import Counter, Gauge
+from sqlalchemy import Connection, Engine, Row, Select, delete, func, insert, or_, select, text
+
+from backend.app import database
+
+RECS_TOP_N = int(os.environ.get("RECS_TOP_N", "50"))
+RECS_REFRESH_INTERVAL = float(os.environ.get("RECS_REFRESH_INTERVAL", "30"))
+RECS_REFRESH_BATCH_SIZE = int(os.environ.get("RECS_REFRESH_BATCH_SIZE", "200"))
+RECS_MAX_AGE_SECONDS = float(os.environ.get("RECS_MAX_AGE_SECONDS", str(24 * 60 * 60)))
+RECS_WATERMARK_OVERLAP = timedelta(seconds=float(os.environ.get("RECS_WATERMARK_OVERLAP", "60")))
+RECS_REFRESH_LOCK_ID = 5_318_009
+
+
+logger = logging.getLogger(__name__)
+
+recs_refreshed_total = Counter("recs_refreshed_total", "users whose materialized recommendations were recomputed")
+recs_served_total = Counter("recs_served_total", "recommendation requests by the source they were served from", ["source"])
+recs_refresh_lag_seconds = Gauge("recs_refresh_lag_seconds", "age of the oldest rating change not yet reflected in the materialized recommendations")
+
+
+@dataclass
+class MaterializedRecs:
+    """a user's stored top-N recommendations along with the state of their ratings when they were computed"""
+
+    user_id: str
+    scores: pd.Series
+    ratings_updated_at: Optional[datetime]
+    computed_at: datetime
+    latest_rating_at: Optional[datetime]
+
+    @property
+    def age_seconds(self) -> float:
+        """seconds since the recommendations were computed"""
+
+        return (datetime.now() - self.computed_at).total_seconds()
+
+    @property
+    def stale(self) -> bool:
+        """whether the user rated movies after the recommendations were computed or they're older than the max age"""
+
+        changed = self.latest_rating_at is not None and (self.ratings_updated_at is None or self.latest_rating_at > self.ratings_updated_at)
+        return changed or self.age_seconds > RECS_MAX_AGE_SECONDS
+
+    def predates(self, model_created_at: Optional[datetime]) -> bool:
+        """whether the recommendations were computed before the given model snapshot version was published"""
+
+        return model_created_at is not None and self.computed_at < model_created_at
+
+
+def materialized_recs_statement(user_id: str) -> Select:
+    """select a user's materialized recommendations and the time of their latest rating in a single round trip"""
+
+    latest_rating_at = select(func.max(database.ratings.c.updated_at)).where(database.ratings.c.user_id == user_id).scalar_subquery()
+    statement = select(database.user_recommendations, latest_rating_at.label("latest_rating_at")).where(database.user_recommendations.c.user_id == user_id)
+    return statement
+
+
+def to_materialized_recs(row: Optional[Row]) -> Optional[MaterializedRecs]:
+    """convert a [materialized_recs_statement] result row into a MaterializedRecs"""
+
+    if row is None:
+        return None
+
+    materialized = MaterializedRecs(
+        user_id=row.user_id,
+        scores=pd.Series(data=list(row.scores or []), index=list(row.tmdb_ids or []), dtype=float),
+        ratings_updated_at=row.ratings_updated_at,
+        computed_at=row.computed_at,
+        latest_rating_at=row.latest_rating_at
+    )
+    return materialized
+
+
+def get_materialized_recs(cnx: Connection, user_id: str) -> Optional[MaterializedRecs]:
+    """get a user's materialized recommendations along with the time of their latest rating"""
+
+    return to_materialized_recs(cnx.execute(materialized_recs_statement(user_id)).first())
+
+
+async def aget_materialized_recs(cnx: Any, user_id: str) -> Optional[MaterializedRecs]:
+    """async equivalent of [get_materialized_recs] for an AsyncConnection (or ThreadedAsyncConnection)"""
+
+    result = await cnx.execute(materialized_recs_statement(user_id))
+    return to_materialized_recs(result.first())
+
+
+def save_materialized_recs(cnx: Connection, user_id: str, scores: pd.Series, ratings_updated_at: Optional[datetime]) -> None:
+    """replace a user's materialized recommendations with a new set of scores indexed by [tmdb_id]"""
+
+    scores = scores.sort_values(ascending=False)
+    cnx.execute(delete(database.user_recommendations).where(database.user_recommendations.c.user_id == user_id))
+    cnx.execute(insert(database.user_recommendations).values(
+        user_id=user_id,
+        tmdb_ids=scores.index.tolist(),
+        scores=scores.values.tolist(),
+        ratings_updated_at=ratings_updated_at,
+        computed_at=datetime.now()
+    ))
+
+
+def get_stale_users(cnx: Connection, since: Optional[datetime], limit: int, computed_before: Optional[datetime] = None) -> List[Tuple[str, datetime]]:
+    """find users whose materialized recommendations don't reflect their latest rating or were computed before [computed_before]
+
+    only users with ratings changed after [since] are checked for new ratings while [computed_before] catches users whose
+    recommendations aged out (or predate the active model version) regardless of when they last rated a movie
+    """
+
+    ratings, recs = database.ratings, database.user_recommendations
+
+    changed_users = select(ratings.c.user_id).distinct()
+    if since is not None:
+        changed_users = changed_users.where(ratings.c.updated_at > since)
+    candidates = ratings.c.user_id.in_(changed_users)
+    stale = or_(recs.c.user_id.is_(None), recs.c.ratings_updated_at.is_(None))
+    if computed_before is not None:
+        candidates = or_(candidates, ratings.c.user_id.in_(select(recs.c.user_id).where(recs.c.computed_at < computed_before)))
+        stale = or_(stale, recs.c.computed_at < computed_before)
+
+    latest = select(
+        ratings.c.user_id,
+        func.max(ratings.c.updated_at).label("ratings_updated_at")
+    ).where(
+        candidates
+    ).group_by(
+        ratings.c.user_id
+    ).subquery()
+
+    statement = select(
+        latest.c.user_id,
+        latest.c.ratings_updated_at
+    ).select_from(
+        latest.outerjoin(recs, recs.c.user_id == latest.c.user_id)
+    ).where(
+        or_(stale, recs.c.ratings_updated_at < latest.c.ratings_updated_at)
+    ).order_by(
+        latest.c.ratings_updated_at
+    ).limit(limit)
+
+    return [(row.user_id, row.ratings_updated_at) for row in cnx.execute(statement).all()]
+
+
+@contextmanager
+def refresh_lock(engine: Engine) -> Iterator[bool]:
+    """try to take the refresh lock yielding whether this instance holds it so only one instance refreshes at a time
+
+    uses a session-level Postgres advisory lock (like the migrations) which is released if the instance dies. other
+    databases are local to a single process so the lock is always held
+    """
+
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock:
+        acquired = bool(lock.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": RECS_REFRESH_LOCK_ID}).scalar())
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": RECS_REFRESH_LOCK_ID})
+
+
+class RecommendationsRefresher:
+    """background worker which recomputes the materialized recommendations of users whose ratings changed
+
+    changes are found by scanning [ratings.updated_at] past a watermark which trails the newest change processed by a
+    small overlap so that ratings committed slightly out of timestamp order are still picked up on the next pass. users
+    whose recommendations are older than [max_age] seconds or than the active model version ([model_created_at]) are
+    recomputed too. every instance runs a refresher but only the one holding the refresh lock runs each pass
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        score_fn: Callable[[str, int], pd.Series],
+        model_created_at: Callable[[], Optional[datetime]] = lambda: None,
+        top_n: int = RECS_TOP_N,
+        interval: float = RECS_REFRESH_INTERVAL,
+        batch_size: int = RECS_REFRESH_BATCH_SIZE,
+        max_age: float = RECS_MAX_AGE_SECONDS
+    ) -> None:
+        self.engine = engine
+        self.score_fn = score_fn
+        self.model_created_at = model_created_at
+        self.top_n = top_n
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self.watermark: Optional[datetime] = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self) -> int:
+        """run a single refresh pass returning the number of users refreshed (0 if another instance holds the refresh lock)"""
+
+        with refresh_lock(self.engine) as acquired:
+            if not acquired:
+                # the instance holding the lock advances past this one's watermark so resume from the table once it's released
+                self.watermark = None
+                return 0
+            return self._refresh()
+
+    def _refresh(self) -> int:
+        refreshed = 0
+        if self.watermark is None:
+            # resume from the newest change already materialized (e.g. by another instance) rather than rescanning every user
+            with self.engine.begin() as cnx:
+                self.watermark = cnx.execute(select(func.max(database.user_recommendations.c.ratings_updated_at))).scalar()
+
+        while True:
+            with self.engine.begin() as cnx:
+                since = self.watermark - RECS_WATERMARK_OVERLAP if self.watermark else None
+                computed_before = max(filter(None, [datetime.now() - timedelta(seconds=self.max_age), self.model_created_at()]))
+                stale_users = get_stale_users(cnx, since=since, limit=self.batch_size, computed_before=computed_before)
+            if not stale_users:
+                break
+
+            recs_refresh_lag_seconds.set((datetime.now() - stale_users[0][1]).total_seconds())
+            failed = 0
+            for user_id, ratings_updated_at in stale_users:
+                try:
+                    scores = self.score_fn(user_id, self.top_n)
+                    with self.engine.begin() as cnx:
+                        save_materialized_recs(cnx, user_id=user_id, scores=scores, ratings_updated_at=ratings_updated_at)
+                except Exception:
+                    logger.exception("failed to refresh materialized recommendations", extra={"user_id": user_id})
+                    failed += 1
+                    continue
+                if not failed:
+                    self.watermark = max(self.watermark or ratings_updated_at, ratings_updated_at)
+                recs_refreshed_total.inc()
+                refreshed += 1
+
+            # failed users stay stale so stop after this batch rather than retrying them in a tight loop
+            if failed or len(stale_users) < self.batch_size or self._stop.is_set():
+                break
+
+        recs_refresh_lag_seconds.set(0)
+        return refreshed
+
+    def start(self) -> None:
+        """start refreshing in a daemon thread every [interval] seconds"""
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="recommendations-refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """signal the refresh thread to stop after its current pass"""
+
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                start = time.perf_counter()
+                refreshed = self.refresh()
+                if refreshed:
+                    logger.info("materialized recommendations refreshed", extra={"users": refreshed, "seconds": time.perf_counter() - start})
+            except Exception:
+                logger.exception("materialized recommendations refresh failed")
+            self._stop.wait(self.interval)
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(description="refresh the materialized [user_recommendations] table for users whose ratings changed")
+    parser.add_argument("--loop", action="store_true", help="keep refreshing every RECS_REFRESH_INTERVAL seconds instead of running a single pass")
+    args = parser.parse_args()
+
+    # NOTE: imported here so the module can be used (and tested) without the OpenAI/Chroma clients configured in [constants]
+    from backend.app.constants import engine, model_registry
+    from backend.app.lib import score_user_recs
+
+    model_registry.start()
+    refresher = RecommendationsRefresher(
+        engine,
+        score_fn=lambda user_id, k: score_user_recs(user_id=user_id, k=k),
+        model_created_at=lambda: model_registry.get().created_at
+    )
+    if args.loop:
+        refresher._run()
+    else:
+        print(f"refreshed recommendations for {refresher.refresh()} users")
@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+import numpy as np
+import pandas as pd
+
+from argparse import ArgumentParser
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Optional
+from prometheus_client import Counter, Gauge
+
+from backend.app.vectors import ContentIndex
+
+MODEL_REGISTRY_POLL_INTERVAL = float(os.environ.get("MODEL_REGISTRY_POLL_INTERVAL", "60"))
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+
+
+logger = logging.getLogger(__name__)
+
+model_swaps_total = Counter("model_swaps_total", "model snapshots swapped in by the registry watcher")
+model_load_failures_total = Counter("model_load_failures_total", "model snapshots which failed to load")
+model_load_seconds = Gauge("model_load_seconds", "time taken to load the active model snapshot")
+
+
+@dataclass
+class ModelSnapshot:
+    """an immutable version of the collaborative filtering factors, content index, and catalog statistics used for ranking"""
+
+    version: str
+    collab_embeddings: pd.DataFrame
+    content_index: Optional[ContentIndex] = None
+    catalog_stats: Dict = field(default_factory=dict)
+    created_at: Optional[datetime] = None
+    loaded_at: Optional[datetime] = None
+    load_seconds: float = 0.0
+
+
+def publish_snapshot(
+    path: str,
+    version: str,
+    collab_embeddings: pd.DataFrame,
+    content_index_path: Optional[str] = None,
+    catalog_stats: Optional[Dict] = None
+) -> str:
+    """write a new snapshot version to the registry at [path] and make it the current version
+
+    the version directory is written completely before the CURRENT pointer is atomically replaced so watchers never
+    see a partially written snapshot
+    """
+
+    version_path = os.path.join(path, version)
+    if os.path.exists(version_path):
+        raise ValueError(f"model snapshot version={version} already exists")
+
+    staging_path = os.path.join(path, f".{version}.tmp")
+    shutil.rmtree(staging_path, ignore_errors=True)
+    os.makedirs(staging_path)
+
+    np.save(os.path.join(staging_path, "collab_ids.npy"), np.asarray(collab_embeddings.index, dtype=str))
+    np.save(os.path.join(staging_path, "collab_embeddings.npy"), np.asarray(collab_embeddings.values, dtype=np.float32))
+    if content_index_path:
+        shutil.copytree(content_index_path, os.path.join(staging_path, "content-index"))
+
+    manifest = {
+        "version": version,
+        "created_at": datetime.now().isoformat(),
+        "collab_movies": len(collab_embeddings),
+        "content_index": bool(content_index_path),
+        "catalog_stats": catalog_stats or {}
+    }
+    with open(os.path.join(staging_path, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f)
+
+    os.rename(staging_path, version_path)
+    with open(os.path.join(path, f".{CURRENT_FILE}.tmp"), "w") as f:
+        f.write(version)
+    os.replace(os.path.join(path, f".{CURRENT_FILE}.tmp"), os.path.join(path, CURRENT_FILE))
+    return version_path
+
+
+def get_current_version(path: str) -> Optional[str]:
+    """read the current version pointer of the registry at [path] or None if nothing has been published yet"""
+
+    try:
+        with open(os.path.join(path, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def load_snapshot(path: str, version: str) -> ModelSnapshot:
+    """load a snapshot version from the registry at [path]"""
+
+    start = time.perf_counter()
+    version_path = os.path.join(path, version)
+    with open(os.path.join(version_path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+
+    ids = np.load(os.path.join(version_path, "collab_ids.npy"))
+    embeddings = np.load(os.path.join(version_path, "collab_embeddings.npy"))
+    content_index = ContentIndex(os.path.join(version_path, "content-index")) if manifest["content_index"] else None
+
+    snapshot = ModelSnapshot(
+        version=version,
+        collab_embeddings=pd.DataFrame(data=embeddings, index=ids.tolist()),
+        content_index=content_index,
+        catalog_stats=manifest["catalog_stats"],
+        created_at=datetime.fromisoformat(manifest["created_at"]),
+        loaded_at=datetime.now(),
+        load_seconds=time.perf_counter() - start
+    )
+    return snapshot
+
+
+class ModelRegistry:
+    """holds the active model snapshot and swaps in new versions published to the registry directory without a restart
+
+    requests should call [get()] once and use that snapshot throughout so in-flight requests finish on the version they
+    started with while new requests pick up the new one. the old version is freed once the last request using it finishes
+    """
+
+    def __init__(self, path: Optional[str], fallback: Callable[[], ModelSnapshot], poll_interval: float = MODEL_REGISTRY_POLL_INTERVAL) -> None:
+        self.path = path
+        self.fallback = fallback
+        self.poll_interval = poll_interval
+        self.snapshot: Optional[ModelSnapshot] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def get(self) -> ModelSnapshot:
+        """get the active snapshot loading it synchronously the first time it is needed"""
+
+        snapshot = self.snapshot
+        if snapshot is None:
+            with self._lock:
+                if self.snapshot is None:
+                    self._swap(self._load(self.path and get_current_version(self.path)))
+                snapshot = self.snapshot
+        return snapshot
+
+    def check(self) -> bool:
+        """load and swap in the registry's current version if it differs from the active one returning whether it swapped"""
+
+        version = self.path and get_current_version(self.path)
+        if version is None or (self.snapshot is not None and self.snapshot.version == version):
+            return False
+
+        # NOTE: the new version is fully loaded before the swap so requests never wait on it
+        snapshot = self._load(version)
+        with self._lock:
+            self._swap(snapshot)
+        model_swaps_total.inc()
+        return True
+
+    def start(self) -> None:
+        """load the active snapshot and watch the registry for new versions every [poll_interval] seconds in a daemon thread"""
+
+        self.get()
+        if self.path and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="model-registry", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """signal the watcher thread to stop"""
+
+        self._stop.set()
+
+    def _load(self, version: Optional[str]) -> ModelSnapshot:
+        if version is None:
+            start = time.perf_counter()
+            snapshot = self.fallback()
+            snapshot.loaded_at, snapshot.load_seconds = datetime.now(), time.perf_counter() - start
+        else:
+            snapshot = load_snapshot(self.path, version)
+        return snapshot
+
+    def _swap(self, snapshot: ModelSnapshot) -> None:
+        previous = self.snapshot.version if self.snapshot is not None else None
+        self.snapshot = snapshot
+        model_load_seconds.set(snapshot.load_seconds)
+        logger.info("model snapshot activated", extra={"version": snapshot.version, "previous_version": previous, "seconds": snapshot.load_seconds})
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check()
+            except Exception:
+                model_load_failures_total.inc()
+                logger.exception("failed to load the current model snapshot", extra={"path": self.path})
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(description="publish a new model snapshot version to the registry directory watched by the backend")
+    parser.add_argument("--registry-path", type=str, required=True, help="registry directory (MODEL_REGISTRY_PATH)")
+    parser.add_argument("--version", type=str, default=datetime.now().strftime("%Y%m%d%H%M%S"), help="name of the new version")
+    parser.add_argument("--chroma-path", type=str, default="./chroma", help="Chroma store to export the [movies-collab] embeddings from")
+    parser.add_argument("--content-index-path", type=str, default=None, help="content index to include (python -m backend.app.vectors build)")
+    parser.add_argument("--catalog-stats", action="store_true", help="include catalog statistics computed from the DATABASE_URL database")
+    args = parser.parse_args()
+
+    import chromadb
+    from sqlalchemy import func, select
+    from backend.app import database
+
+    collection = chromadb.PersistentClient(path=args.chroma_path).get_collection(name="movies-collab")
+    collab = collection.get(include=["embeddings"])
+    collab_embeddings = pd.DataFrame(data=collab["embeddings"], index=collab["ids"])
+
+    catalog_stats = {}
+    if args.catalog_stats:
+        with database.get_engine().begin() as cnx:
+            statement = select(func.count(), func.min(database.movies.c.popularity), func.max(database.movies.c.popularity))
+            movies, popularity_min, popularity_max = cnx.execute(statement).one()
+            catalog_stats = {"movies": movies, "popularity_min": popularity_min, "popularity_max": popularity_max}
+
+    version_path = publish_snapshot(
+        args.registry_path,
+        args.version,
+        collab_embeddings,
+        content_index_path=args.content_index_path,
+        catalog_stats=catalog_stats
+    )
+    print(f"published model snapshot version={args.version} to {version_path}")
@@ -0,0 +1,69 @@
+import os
+import time
+import threading
+
+from collections import OrderedDict
+from typing import Any, Optional
+from prometheus_client import Counter
+
+READ_YOUR_WRITES_SECONDS = float(os.environ.get("READ_YOUR_WRITES_SECONDS", "10"))
+READ_YOUR_WRITES_MAX_USERS = int(os.environ.get("READ_YOUR_WRITES_MAX_USERS", "100000"))
+
+
+db_reads_total = Counter("db_reads_total", "routed read-only transactions by the database they were sent to", ["target"])
+
+
+class EngineRouter:
+    """route read-only transactions to a read replica and everything else to the primary
+
+    a user's reads go to the primary for [window] seconds after they write so they always see their own changes despite
+    replication lag. NOTE: recent writes are tracked in-process so the guarantee only holds for reads served by the
+    instance which handled the write (i.e. assuming the lag is shorter than the time it takes to hop instances)
+    """
+
+    def __init__(
+        self,
+        primary: Any,
+        replica: Optional[Any] = None,
+        window: float = READ_YOUR_WRITES_SECONDS,
+        max_users: int = READ_YOUR_WRITES_MAX_USERS
+    ) -> None:
+        self.primary = primary
+        self.replica = replica
+        self.window = window
+        self.max_users = max_users
+        self._writes: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def writer(self, user_id: Optional[str] = None) -> Any:
+        """get the engine for a read-write transaction recording the write against the user's read-your-writes window"""
+
+        if user_id is not None and self.replica is not None:
+            now = time.monotonic()
+            with self._lock:
+                self._writes[user_id] = now
+                self._writes.move_to_end(user_id)
+                # writes are appended in time order so expired (or excess) entries are always at the front
+                while self._writes and (len(self._writes) > self.max_users or next(iter(self._writes.values())) < now - self.window):
+                    self._writes.popitem(last=False)
+        return self.primary
+
+    def reader(self, user_id: Optional[str] = None) -> Any:
+        """get the engine for a read-only transaction which is the replica unless the user wrote within the window"""
+
+        if self.replica is None:
+            return self.primary
+
+        if user_id is not None:
+            written_at = self._writes.get(user_id)
+            if written_at is not None and time.monotonic() - written_at < self.window:
+                db_reads_total.labels("primary").inc()
+                return self.primary
+
+        db_reads_total.labels("replica").inc()
+        return self.replica
+
+    async def dispose(self) -> None:
+        await self.primary.dispose()
+        if self.replica is not None:
+            await self.replica.dispose()
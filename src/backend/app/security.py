@@ -0,0 +1,128 @@
+import os
+import time
+import asyncio
+import multiprocessing
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from threading import Lock
+from passlib.context import CryptContext
+from prometheus_client import Counter, Gauge, Histogram
+
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.environ.get("PASSWORD_WORKERS", "2"))
+PASSWORD_MAX_PENDING = int(os.environ.get("PASSWORD_MAX_PENDING", "16"))
+
+
+password_pending = Gauge("password_pending", "password hash/verify tasks submitted to the pool and not yet completed")
+password_rejected = Counter("password_rejected_total", "password hash/verify tasks rejected because the pool queue was full", ["operation"])
+password_seconds = Histogram("password_seconds", "password hash/verify latency including time spent queued for a worker", ["operation"])
+
+
+class PasswordPoolFull(Exception):
+    """raised when the password pool already has the maximum number of pending tasks"""
+
+
+@lru_cache(maxsize=None)
+def get_password_context(rounds: int) -> CryptContext:
+    """get a (per-process) cached bcrypt password context with the given cost factor"""
+
+    return CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+
+
+def _hash_password(password: str, rounds: int) -> str:
+    """hash a password inside a pool worker process"""
+
+    return get_password_context(rounds).hash(password)
+
+
+def _verify_password(password: str, hashed_password: str) -> bool:
+    """verify a password against its stored hash inside a pool worker process"""
+
+    # NOTE: verification always uses the cost factor encoded in the stored hash
+    return get_password_context(BCRYPT_ROUNDS).verify(password, hashed_password)
+
+
+class PasswordPool:
+    """bounded process pool which keeps CPU-bound bcrypt work off the request thread pool and the GIL"""
+
+    def __init__(self, workers: int = PASSWORD_WORKERS, max_pending: int = PASSWORD_MAX_PENDING, rounds: int = BCRYPT_ROUNDS) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.pending = 0
+        self._lock = Lock()
+        self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """lazily start the worker processes using spawn to avoid forking a process with live client threads"""
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _release(self, operation: str, start: float) -> None:
+        """release a pending slot and record the task latency"""
+
+        with self._lock:
+            self.pending -= 1
+        password_pending.dec()
+        password_seconds.labels(operation).observe(time.perf_counter() - start)
+
+    def submit(self, operation: str, fn, *args) -> Future:
+        """submit a task to the pool failing fast if the queue of pending tasks is full"""
+
+        with self._lock:
+            if self.pending >= self.max_pending:
+                password_rejected.labels(operation).inc()
+                raise PasswordPoolFull(f"password pool has {self.pending} pending tasks (max={self.max_pending})")
+            self.pending += 1
+            password_pending.inc()
+            start = time.perf_counter()
+            try:
+                try:
+                    future = self._get_executor().submit(fn, *args)
+                except BrokenProcessPool:
+                    # a worker died (e.g. OOM kill) so shut down the broken pool, replace it and retry the submission once
+                    self._executor.shutdown(wait=False)
+                    self._executor = None
+                    future = self._get_executor().submit(fn, *args)
+            except Exception:
+                self.pending -= 1
+                password_pending.dec()
+                raise
+
+        future.add_done_callback(lambda _: self._release(operation, start))
+        return future
+
+    def hash(self, password: str) -> str:
+        """hash a password for storage using the configured cost factor"""
+
+        return self.submit("hash", _hash_password, password, self.rounds).result()
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        """verify a password against its stored hash"""
+
+        return self.submit("verify", _verify_password, password, hashed_password).result()
+
+    async def ahash(self, password: str) -> str:
+        """hash a password awaiting the pool worker without blocking the event loop"""
+
+        return await asyncio.wrap_future(self.submit("hash", _hash_password, password, self.rounds))
+
+    async def averify(self, password: str, hashed_password: str) -> bool:
+        """verify a password awaiting the pool worker without blocking the event loop"""
+
+        return await asyncio.wrap_future(self.submit("verify", _verify_password, password, hashed_password))
+
+    def shutdown(self) -> None:
+        """stop the worker processes"""
+
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+password_pool = PasswordPool()
@@ -0,0 +1,112 @@
+import os
+
+from datetime import datetime
+from typing import Any, List, Optional
+from uuid import uuid4
+from sqlalchemy import delete, insert, select, update
+from llama_index.llms import ChatMessage, MessageRole
+
+from backend.app import database
+from shared.models import ConversationSession
+
+SESSION_HISTORY_MESSAGES = int(os.environ.get("SESSION_HISTORY_MESSAGES", "20"))
+
+
+class SessionConflict(Exception):
+    """raised when another request appended a turn to the same session first"""
+
+
+async def create_session(cnx: Any, user_id: Optional[str] = None) -> ConversationSession:
+    """create a new empty conversation session"""
+
+    created_at = datetime.now()
+    session = ConversationSession(session_id=str(uuid4()), user_id=user_id, turns=0, created_at=created_at, updated_at=created_at)
+    statement = insert(database.conversations).values(
+        session_id=session.session_id,
+        user_id=session.user_id,
+        standalone_query=None,
+        turns=0,
+        created_at=created_at,
+        updated_at=created_at
+    )
+    await cnx.execute(statement)
+    return session
+
+
+async def get_recent_messages(cnx: Any, session_id: str, limit: int = SESSION_HISTORY_MESSAGES) -> List[ChatMessage]:
+    """get the session's most recent [limit] messages in conversation order"""
+
+    messages = database.conversation_messages
+    statement = select(
+        messages.c.role,
+        messages.c.content
+    ).where(
+        messages.c.session_id == session_id
+    ).order_by(
+        messages.c.position.desc()
+    )
+    if limit is not None:
+        statement = statement.limit(limit)
+
+    rows = (await cnx.execute(statement)).all()
+    return [ChatMessage(role=MessageRole(row.role), content=row.content) for row in reversed(rows)]
+
+
+async def get_session(cnx: Any, session_id: str, include_messages: bool = False) -> Optional[ConversationSession]:
+    """get a conversation session by ID optionally including its full message history"""
+
+    statement = select(database.conversations).where(database.conversations.c.session_id == session_id)
+    row = (await cnx.execute(statement)).first()
+    if row is None:
+        return None
+
+    session = ConversationSession(**row._asdict())
+    if include_messages:
+        session.chat_messages = await get_recent_messages(cnx, session_id=session_id, limit=None)
+    return session
+
+
+async def get_message_count(cnx: Any, session_id: str) -> int:
+    """count the messages stored for a session"""
+
+    messages = database.conversation_messages
+    statement = select(messages.c.position).where(messages.c.session_id == session_id).order_by(messages.c.position.desc()).limit(1)
+    position = (await cnx.execute(statement)).scalar()
+    return 0 if position is None else position + 1
+
+
+async def append_turn(cnx: Any, session: ConversationSession, messages: List[ChatMessage], standalone_query: str) -> None:
+    """append a [user, assistant] turn to the session and store its new standalone query
+
+    the turn counter is compared-and-swapped so concurrent turns on the same session can't interleave their messages
+    """
+
+    updated_at = datetime.now()
+    statement = update(
+        database.conversations
+    ).where(
+        database.conversations.c.session_id == session.session_id,
+        database.conversations.c.turns == session.turns
+    ).values(
+        standalone_query=standalone_query,
+        turns=session.turns + 1,
+        updated_at=updated_at
+    ).returning(
+        database.conversations.c.turns
+    )
+    if (await cnx.execute(statement)).first() is None:
+        raise SessionConflict(session.session_id)
+
+    # message positions continue from the number of messages already stored for the session
+    start = await get_message_count(cnx, session_id=session.session_id)
+    await cnx.execute(insert(database.conversation_messages), [
+        {"session_id": session.session_id, "position": start + i, "role": message.role.value, "content": message.content, "created_at": updated_at}
+        for i, message in enumerate(messages)
+    ])
+
+
+async def delete_session(cnx: Any, session_id: str) -> None:
+    """delete a conversation session and its messages"""
+
+    await cnx.execute(delete(database.conversation_messages).where(database.conversation_messages.c.session_id == session_id))
+    await cnx.execute(delete(database.conversations).where(database.conversations.c.session_id == session_id))
@@ -0,0 +1,227 @@
+import os
+import shutil
+import logging
+import tempfile
+import itertools
+import threading
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+from prometheus_client import Counter
+from sklearn.metrics.pairwise import cosine_similarity
+
+COLLAB_SHARDS = int(os.environ.get("COLLAB_SHARDS", str(os.cpu_count() or 1)))
+COLLAB_SHARD_MIN_MOVIES = int(os.environ.get("COLLAB_SHARD_MIN_MOVIES", "250000"))
+COLLAB_BLOCK_ROWS = int(os.environ.get("COLLAB_BLOCK_ROWS", "16384"))
+SHARED_MEMORY_PATH = "/dev/shm"
+
+
+logger = logging.getLogger(__name__)
+
+collab_scoring_total = Counter("collab_scoring_total", "collaborative filtering scoring runs by execution mode", ["mode"])
+
+# per-worker-process cache of memory-mapped collab matrices by path (the current and previous snapshot versions)
+_matrices: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+
+def score_blocks(liked: np.ndarray, catalog: np.ndarray, start: int, stop: int, block_rows: int = COLLAB_BLOCK_ROWS) -> np.ndarray:
+    """average cosine similarity of catalog rows [start, stop) wrt to the liked movies computed [block_rows] rows at a time
+
+    BLAS kernels (and so the rounding of each score) depend on the shape and memory layout of the matrices being multiplied
+    so every path scores the same C-ordered blocks on the same block grid to produce bit-identical scores
+    """
+
+    return np.concatenate([
+        cosine_similarity(liked, catalog[block_start:min(block_start + block_rows, stop)]).mean(axis=0)
+        for block_start in range(start, stop, block_rows)
+    ])
+
+
+def rank_movies(
+    movies_collab_embeddings: pd.DataFrame,
+    liked_movies: List[str],
+    unrated_movies: pd.Index,
+    k: int = 10,
+    block_rows: int = COLLAB_BLOCK_ROWS
+) -> pd.Series:
+    """score the top-k unrated movies by their average cosine similarity to the liked movies in a single process
+
+    ties are broken by [tmdb_id] so the result is deterministic. returns a series of scores indexed by [tmdb_id] sorted by [tmdb_id]
+    """
+
+    liked = np.ascontiguousarray(movies_collab_embeddings.loc[liked_movies].values)
+    catalog = np.ascontiguousarray(movies_collab_embeddings.values)
+
+    # calculate the average cosine similarity of each candidate movie wrt to the user's liked movies
+    movie_scores = pd.Series(score_blocks(liked, catalog, 0, len(catalog), block_rows=block_rows), index=movies_collab_embeddings.index)
+
+    # select the top-k movies in terms of average cosine similarity that the user has not yet rated
+    recommended_movies = movie_scores.loc[unrated_movies.sort_values()].sort_values(ascending=False, kind="stable")[:k].sort_index()
+    return recommended_movies
+
+
+def _attach(path: str) -> np.ndarray:
+    """memory-map a published collab matrix inside a worker process (shared with every other worker via the page cache)"""
+
+    if path not in _matrices:
+        _matrices[path] = np.load(path, mmap_mode="r")
+        while len(_matrices) > 2:
+            _matrices.popitem(last=False)
+    return _matrices[path]
+
+
+def _score_shard(path: str, start: int, stop: int, liked: np.ndarray, rated_rows: np.ndarray, k: int, block_rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    """score rows [start, stop) of the collab matrix inside a pool worker process returning the shard's local top-k
+
+    every row tied with the k-th best score is kept so the merged result breaks ties exactly like the single-process path
+    """
+
+    scores = score_blocks(liked, _attach(path), start, stop, block_rows=block_rows)
+
+    # drop the rows of movies the user has already rated
+    rows = np.setdiff1d(np.arange(start, stop), rated_rows, assume_unique=True)
+    scores = scores[rows - start]
+    if len(rows) > k:
+        kth_score = np.partition(scores, len(scores) - k)[len(scores) - k]
+        rows, scores = rows[scores >= kth_score], scores[scores >= kth_score]
+    return rows, scores
+
+
+class ShardedScorer:
+    """scatter-gather collab scoring over a process pool for catalogs too large to score within the latency SLO on one core
+
+    each snapshot's collab matrix is written once to shared memory (tmpfs) and memory-mapped by the workers so it isn't
+    copied per task. every shard computes its local top-k and the main process merges them with the same tie-breaking
+    as [rank_movies] so the results match the single-process path exactly
+    """
+
+    def __init__(
+        self,
+        shards: int = COLLAB_SHARDS,
+        min_movies: int = COLLAB_SHARD_MIN_MOVIES,
+        block_rows: int = COLLAB_BLOCK_ROWS,
+        path: Optional[str] = None
+    ) -> None:
+        self.shards = shards
+        self.min_movies = min_movies
+        self.block_rows = block_rows
+        self.path = path
+        self._owns_path = path is None
+        self._lock = threading.Lock()
+        self._executor_lock = threading.Lock()
+        self._executor = None
+        self._published: "OrderedDict[int, Tuple[pd.DataFrame, str]]" = OrderedDict()
+        self._versions = itertools.count()
+
+    @property
+    def nbytes(self) -> int:
+        """memory held by the collab matrices published to shared memory (tmpfs counts against the instance's memory)"""
+
+        with self._lock:
+            return sum(os.path.getsize(matrix_path) for _, matrix_path in self._published.values() if os.path.exists(matrix_path))
+
+    def enabled(self, movies_collab_embeddings: pd.DataFrame) -> bool:
+        """whether the catalog is large enough to be worth sharding"""
+
+        return self.shards > 1 and len(movies_collab_embeddings) >= self.min_movies
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """lazily start the worker processes using spawn to avoid forking a process with live client threads"""
+
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.shards, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def _replace_executor(self, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        """shut down a broken pool and start a new one (unless a concurrent request already replaced it)"""
+
+        with self._executor_lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False)
+        return self._get_executor()
+
+    def _publish(self, movies_collab_embeddings: pd.DataFrame) -> str:
+        """write the collab matrix to shared memory once per snapshot keeping the previous version for in-flight requests"""
+
+        with self._lock:
+            key = id(movies_collab_embeddings)
+            if key in self._published and self._published[key][0] is movies_collab_embeddings:
+                return self._published[key][1]
+
+            if self.path is None:
+                self.path = tempfile.mkdtemp(prefix="collab-", dir=SHARED_MEMORY_PATH if os.path.isdir(SHARED_MEMORY_PATH) else None)
+            # NOTE: workers cache memory-maps by path so a path must never be reused for a different snapshot (and object
+            # IDs are reused once a snapshot is freed) hence every published version gets the next number of a counter
+            matrix_path = os.path.join(self.path, f"{next(self._versions)}.npy")
+            np.save(matrix_path, np.ascontiguousarray(movies_collab_embeddings.values))
+
+            # NOTE: removing a file doesn't unmap it from workers already using it so only versions older than that are removed
+            self._published[key] = (movies_collab_embeddings, matrix_path)
+            while len(self._published) > 2:
+                _, (_, stale_path) = self._published.popitem(last=False)
+                os.remove(stale_path)
+            return matrix_path
+
+    def rank(self, movies_collab_embeddings: pd.DataFrame, liked_movies: List[str], unrated_movies: pd.Index, k: int = 10) -> pd.Series:
+        """sharded equivalent of [rank_movies]"""
+
+        matrix_path = self._publish(movies_collab_embeddings)
+        index = movies_collab_embeddings.index
+        liked = np.ascontiguousarray(movies_collab_embeddings.loc[liked_movies].values)
+        rated_rows = np.sort(np.flatnonzero(~index.isin(unrated_movies)))
+
+        # scatter contiguous ranges of whole blocks across the workers then gather their local top-k candidates
+        blocks = -(-len(index) // self.block_rows)
+        bounds = np.minimum(np.linspace(0, blocks, self.shards + 1).astype(int) * self.block_rows, len(index))
+        tasks = [(matrix_path, start, stop, liked, rated_rows, k, self.block_rows) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+        executor = self._get_executor()
+        try:
+            futures = [executor.submit(_score_shard, *task) for task in tasks]
+        except BrokenProcessPool:
+            # a worker died (e.g. OOM kill) so replace the pool and retry the submission once
+            executor = self._replace_executor(executor)
+            futures = [executor.submit(_score_shard, *task) for task in tasks]
+        results = [future.result() for future in futures]
+
+        # merge the candidates with the same ordering as the single-process path: score descending then [tmdb_id]
+        rows = np.concatenate([rows for rows, _ in results])
+        scores = np.concatenate([scores for _, scores in results])
+        movie_scores = pd.Series(scores, index=index[rows]).sort_index()
+        return movie_scores.sort_values(ascending=False, kind="stable")[:k].sort_index()
+
+    def score(self, movies_collab_embeddings: pd.DataFrame, liked_movies: List[str], unrated_movies: pd.Index, k: int = 10) -> pd.Series:
+        """rank with the process pool for large catalogs falling back to the single-process path for small ones or on failure"""
+
+        if self.enabled(movies_collab_embeddings):
+            try:
+                recommended_movies = self.rank(movies_collab_embeddings, liked_movies, unrated_movies, k=k)
+                collab_scoring_total.labels("sharded").inc()
+                return recommended_movies
+            except Exception:
+                logger.exception("sharded collab scoring failed, falling back to a single process", extra={"shards": self.shards})
+
+        collab_scoring_total.labels("single").inc()
+        return rank_movies(movies_collab_embeddings, liked_movies, unrated_movies, k=k, block_rows=self.block_rows)
+
+    def shutdown(self) -> None:
+        """stop the worker processes and free the shared memory"""
+
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        with self._lock:
+            for _, matrix_path in self._published.values():
+                if os.path.exists(matrix_path):
+                    os.remove(matrix_path)
+            self._published.clear()
+            if self._owns_path and self.path is not None:
+                shutil.rmtree(self.path, ignore_errors=True)
+                self.path = None
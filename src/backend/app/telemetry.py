@@ -0,0 +1,97 @@
+import os
+import json
+import time
+import logging
+
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Iterator, List, Optional, Tuple
+from prometheus_client import Histogram
+from sqlalchemy import Connection, Engine
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0)
+TOKEN_BUCKETS = (50, 100, 200, 400, 600, 800, 1200, 1600, 2400, 3200, 4800)
+
+
+stage_seconds = Histogram("stage_seconds", "latency of instrumented hot-path stages", ["stage"], buckets=LATENCY_BUCKETS)
+request_seconds = Histogram("request_seconds", "end-to-end request latency by route template", ["method", "route", "status"], buckets=LATENCY_BUCKETS)
+qa_context_tokens = Histogram("qa_context_tokens", "tokens of retrieved movie context sent with each QA prompt", buckets=TOKEN_BUCKETS)
+
+# list of [stage, seconds] timings collected for the current request (None outside of a request)
+request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """time a block of code recording it in the [stage_seconds] histogram and the current request's timings"""
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.labels(name).observe(elapsed)
+        timings = request_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+@contextmanager
+def timed_begin(engine: Engine) -> Iterator[Connection]:
+    """equivalent to [engine.begin()] but records the time spent waiting to check out a pooled connection"""
+
+    with stage("db_pool_wait"):
+        cnx = engine.connect()
+    with cnx:
+        with cnx.begin():
+            yield cnx
+
+
+@asynccontextmanager
+async def timed_abegin(async_engine: Any) -> AsyncIterator[Any]:
+    """async equivalent of [timed_begin] for an AsyncEngine (or ThreadedAsyncEngine)"""
+
+    async with AsyncExitStack() as stack:
+        with stage("db_pool_wait"):
+            cnx = await stack.enter_async_context(async_engine.connect())
+        await stack.enter_async_context(cnx.begin())
+        yield cnx
+
+
+def server_timing_header(timings: List[Tuple[str, float]]) -> str:
+    """format [stage, seconds] timings as a Server-Timing header value summing repeated stages"""
+
+    durations = {}
+    for name, elapsed in timings:
+        durations[name] = durations.get(name, 0.0) + elapsed
+    return ", ".join(f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in durations.items())
+
+
+class JsonFormatter(logging.Formatter):
+    """format log records as single-line JSON objects including any [extra] fields"""
+
+    reserved = set(logging.LogRecord("", 0, "", 0, "", None, None).__dict__.keys()) | {"message", "asctime"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "timestamp": self.formatTime(record),
+            "severity": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        payload.update({key: val for key, val in record.__dict__.items() if key not in self.reserved})
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def configure_logging(level: str = LOG_LEVEL) -> None:
+    """send application logs to stdout as structured JSON (picked up by Cloud Logging)"""
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter())
+    logger = logging.getLogger("backend")
+    logger.handlers = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
@@ -0,0 +1,120 @@
+import os
+import math
+import logging
+
+from functools import lru_cache
+from typing import Callable, List, Optional
+from llama_index.llms import ChatMessage
+from llama_index.schema import MetadataMode, NodeWithScore
+
+TOKEN_ENCODING = os.environ.get("TOKEN_ENCODING", "cl100k_base")
+CHARS_PER_TOKEN = 4
+CONTEXT_SEPARATOR = "\n\n"
+
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    """get the tiktoken encoding used by the chat models or None if it can't be loaded (e.g. offline without a cached copy)"""
+
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception as err:
+        logger.warning("failed to load the tiktoken encoding, falling back to estimating token counts", extra={"encoding": TOKEN_ENCODING, "error": str(err)})
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """count the tokens in a string (estimated from its length if the encoding isn't available)"""
+
+    encoding = get_encoding()
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(message: ChatMessage, count: Callable[[str], int] = count_tokens) -> int:
+    """count the tokens a message takes up once formatted as a [role: content] line of the chat history"""
+
+    return count(f"{message.role.value}: {message.content or ''}")
+
+
+def fit_messages(messages: List[ChatMessage], budget: int, count: Callable[[str], int] = count_tokens) -> List[ChatMessage]:
+    """keep the most recent messages whose combined token count fits within the budget (in their original order)"""
+
+    fitted, used = [], 0
+    for message in reversed(messages):
+        tokens = count_message_tokens(message, count=count)
+        if used + tokens > budget:
+            break
+        fitted.append(message)
+        used += tokens
+    return fitted[::-1]
+
+
+def truncate_text(text: Optional[str], budget: int) -> Optional[str]:
+    """truncate a string to at most [budget] tokens"""
+
+    if not text:
+        return text
+
+    encoding = get_encoding()
+    if encoding is None:
+        return text[:budget * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= budget else encoding.decode(tokens[:budget])
+
+
+def format_movie_context(node: NodeWithScore, fields: List[str], overview_tokens: int, max_field_items: int) -> str:
+    """render a retrieved movie as [field: value] lines keeping only the given metadata fields (at most [max_field_items]
+    items of list fields like actors/keywords) followed by its plot overview truncated to [overview_tokens] tokens
+    """
+
+    lines = []
+    for field in fields:
+        value = node.node.metadata.get(field)
+        if value is None or value == "":
+            continue
+        if isinstance(value, str) and ", " in value:
+            value = ", ".join(value.split(", ")[:max_field_items])
+        lines.append(f"{field}: {value}")
+
+    if overview_tokens > 0:
+        overview = truncate_text(node.node.get_content(metadata_mode=MetadataMode.NONE).strip(), budget=overview_tokens)
+        if overview:
+            lines.append(f"plot overview: {overview}")
+    return "\n".join(lines)
+
+
+def fit_context(
+    nodes: List[NodeWithScore],
+    budget: int,
+    fields: List[str],
+    max_movies: int,
+    overview_tokens: int,
+    max_field_items: int = 5,
+    count: Callable[[str], int] = count_tokens
+) -> str:
+    """build a compact LLM context from the best-scoring [max_movies] nodes within a token budget
+
+    movies are added best-first and a movie whose overview doesn't fit is added without it. stops at the first movie
+    that doesn't fit at all so the context never exceeds the budget
+    """
+
+    blocks, used = [], 0
+    separator_tokens = count(CONTEXT_SEPARATOR)
+    for node in sorted(nodes, key=lambda x: x.score or 0.0, reverse=True)[:max_movies]:
+        overhead = separator_tokens if blocks else 0
+        block = format_movie_context(node, fields=fields, overview_tokens=overview_tokens, max_field_items=max_field_items)
+        tokens = count(block)
+        if used + overhead + tokens > budget:
+            block = format_movie_context(node, fields=fields, overview_tokens=0, max_field_items=max_field_items)
+            tokens = count(block)
+            if used + overhead + tokens > budget:
+                break
+        blocks.append(block)
+        used += overhead + tokens
+    return CONTEXT_SEPARATOR.join(blocks)
@@ -0,0 +1,248 @@
+import os
+import json
+import math
+import time
+import resource
+import numpy as np
+
+from argparse import ArgumentParser
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from llama_index.schema import NodeWithScore
+from llama_index.vector_stores.utils import metadata_dict_to_node
+
+CONTENT_INDEX_BLOCK_SIZE = int(os.environ.get("CONTENT_INDEX_BLOCK_SIZE", "65536"))
+CONTENT_INDEX_RERANK_FACTOR = int(os.environ.get("CONTENT_INDEX_RERANK_FACTOR", "10"))
+
+
+def normalize(embeddings: np.ndarray) -> np.ndarray:
+    """scale each row to unit length so dot products are cosine similarities"""
+
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return embeddings / np.where(norms == 0, 1, norms)
+
+
+def quantize(embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """symmetric per-row int8 quantization returning the [codes, scales] such that embeddings ~= codes * scales"""
+
+    scales = np.abs(embeddings).max(axis=1) / 127
+    scales = np.where(scales == 0, 1, scales).astype(np.float32)
+    codes = np.clip(np.rint(embeddings / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def fit_pca(embeddings: np.ndarray, dim: int, sample_size: int = 50_000, seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """fit a PCA projection on a sample of the embeddings returning the [mean, components] arrays"""
+
+    rng = np.random.default_rng(seed)
+    sample = embeddings[rng.choice(len(embeddings), size=min(sample_size, len(embeddings)), replace=False)]
+    mean = sample.mean(axis=0)
+    _, _, vt = np.linalg.svd(sample - mean, full_matrices=False)
+    return mean.astype(np.float32), vt[:dim].astype(np.float32)
+
+
+def build_index(path: str, ids: List[str], embeddings: np.ndarray, documents: List[str], metadatas: List[Dict], dim: Optional[int] = None) -> None:
+    """write a quantized content index to [path] sorting the rows by ID
+
+    the int8 codes (optionally PCA-reduced to [dim]) are the only vectors held in memory at query time. the normalized
+    float32 vectors used to exactly re-rank the shortlist and the node records are memory-mapped from disk instead
+    """
+
+    os.makedirs(path, exist_ok=True)
+    order = np.argsort(np.asarray(ids))
+    ids = np.asarray(ids)[order]
+    embeddings = normalize(np.asarray(embeddings, dtype=np.float32)[order])
+
+    # project onto the top principal components: rankings only depend on (x - mean) . q since mean . q is constant per query
+    if dim and dim < embeddings.shape[1]:
+        mean, components = fit_pca(embeddings, dim=dim)
+        np.savez(os.path.join(path, "pca.npz"), mean=mean, components=components)
+        reduced = np.vstack([(block - mean) @ components.T for block in np.array_split(embeddings, max(1, len(embeddings) // CONTENT_INDEX_BLOCK_SIZE))])
+    else:
+        reduced = embeddings
+
+    codes, scales = quantize(reduced)
+    np.save(os.path.join(path, "ids.npy"), ids)
+    np.save(os.path.join(path, "codes.npy"), codes)
+    np.save(os.path.join(path, "scales.npy"), scales)
+
+    vectors = np.lib.format.open_memmap(os.path.join(path, "vectors.npy"), mode="w+", dtype=np.float32, shape=embeddings.shape)
+    vectors[:] = embeddings
+    vectors.flush()
+
+    # store the node records as JSON lines addressed by byte offset so they can be read without loading the whole file
+    offsets = [0]
+    with open(os.path.join(path, "records.jsonl"), "wb") as f:
+        for i in order:
+            line = (json.dumps({"document": documents[i], "metadata": metadatas[i]}) + "\n").encode()
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    np.save(os.path.join(path, "offsets.npy"), np.array(offsets, dtype=np.int64))
+
+    with open(os.path.join(path, "index.json"), "w") as f:
+        json.dump({"count": len(ids), "dim": embeddings.shape[1], "reduced_dim": codes.shape[1], "built_at": datetime.now().isoformat()}, f)
+
+
+class ContentIndex:
+    """in-process int8 vector index over the [movies-content] embeddings with exact float32 re-ranking of a shortlist"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(os.path.join(path, "index.json")) as f:
+            self.info = json.load(f)
+
+        self.ids = np.load(os.path.join(path, "ids.npy"))
+        self.codes = np.load(os.path.join(path, "codes.npy"))
+        self.scales = np.load(os.path.join(path, "scales.npy"))
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.records = np.memmap(os.path.join(path, "records.jsonl"), dtype=np.uint8, mode="r")
+
+        self.mean, self.components = None, None
+        if os.path.exists(os.path.join(path, "pca.npz")):
+            pca = np.load(os.path.join(path, "pca.npz"))
+            self.mean, self.components = pca["mean"], pca["components"]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """memory held in-process by the index (excluding the memory-mapped vectors and records)"""
+
+        arrays = [self.ids, self.codes, self.scales, self.offsets] + ([self.mean, self.components] if self.components is not None else [])
+        return sum(array.nbytes for array in arrays)
+
+    def get_rows(self, ids: List[str]) -> np.ndarray:
+        """look up the row numbers of the given IDs ignoring any IDs that aren't in the index"""
+
+        ids = np.asarray(ids, dtype=self.ids.dtype)
+        rows = np.clip(np.searchsorted(self.ids, ids), 0, len(self.ids) - 1)
+        return np.unique(rows[self.ids[rows] == ids])
+
+    def search(
+        self,
+        query_embedding: List[float],
+        k: int = 10,
+        rows: Optional[np.ndarray] = None,
+        rerank_factor: int = CONTENT_INDEX_RERANK_FACTOR
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """find the [rows, cosine similarities] of the top-k matches optionally restricted to a subset of rows"""
+
+        query = normalize(np.asarray(query_embedding, dtype=np.float32))
+        reduced_query = query @ self.components.T if self.components is not None else query
+        rows = np.arange(len(self.ids)) if rows is None else np.asarray(rows)
+        if len(rows) == 0:
+            return rows, np.array([], dtype=np.float32)
+
+        # approximate scores from the int8 codes a block at a time to bound the size of the float32 temporaries
+        approx = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), CONTENT_INDEX_BLOCK_SIZE):
+            block = rows[start:start + CONTENT_INDEX_BLOCK_SIZE]
+            approx[start:start + len(block)] = (self.codes[block].astype(np.float32) @ reduced_query) * self.scales[block]
+
+        # keep a shortlist of the best approximate matches and re-rank it exactly with the full-precision vectors
+        shortlist_size = min(len(rows), k * rerank_factor)
+        shortlist = rows[np.argpartition(-approx, shortlist_size - 1)[:shortlist_size]] if shortlist_size < len(rows) else rows
+        shortlist = np.sort(shortlist)
+        similarities = self.vectors[shortlist] @ query
+        top = np.argsort(-similarities, kind="stable")[:k]
+        return shortlist[top], similarities[top]
+
+    def get_records(self, rows: np.ndarray) -> List[Dict]:
+        """read the [document, metadata] records of the given rows"""
+
+        return [json.loads(self.records[self.offsets[row]:self.offsets[row + 1]].tobytes()) for row in rows]
+
+    def get_nodes(self, rows: np.ndarray, similarities: np.ndarray) -> List[NodeWithScore]:
+        """build scored nodes the same way as ChromaVectorStore (similarity = exp(-cosine distance)) so scores stay comparable"""
+
+        source_nodes = []
+        for record, similarity in zip(self.get_records(rows), similarities):
+            node = metadata_dict_to_node(record["metadata"])
+            node.set_content(record["document"])
+            source_nodes.append(NodeWithScore(node=node, score=math.exp(float(similarity) - 1)))
+        return source_nodes
+
+
+def build_from_chroma(chroma_path: str, output: str, dim: Optional[int] = None, page_size: int = 10_000) -> None:
+    """export the [movies-content] collection from Chroma into a quantized content index"""
+
+    import chromadb
+
+    collection = chromadb.PersistentClient(path=chroma_path).get_collection(name="movies-content")
+    ids, embeddings, documents, metadatas = [], [], [], []
+    for offset in range(0, collection.count(), page_size):
+        page = collection.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+        ids += page["ids"]
+        embeddings += page["embeddings"]
+        documents += page["documents"]
+        metadatas += page["metadatas"]
+
+    build_index(output, ids=ids, embeddings=np.array(embeddings, dtype=np.float32), documents=documents, metadatas=metadatas, dim=dim)
+
+
+def evaluate(chroma_path: str, index_path: str, n_queries: int = 200, k: int = 10, seed: int = 42) -> Dict:
+    """measure the memory footprint, latency and recall@k of the content index against Chroma and exact search
+
+    queries are the normalized midpoints of random pairs of stored movie embeddings (a stand-in for real query embeddings)
+    """
+
+    import chromadb
+
+    index = ContentIndex(index_path)
+    collection = chromadb.PersistentClient(path=chroma_path).get_collection(name="movies-content")
+
+    rng = np.random.default_rng(seed)
+    pairs = rng.choice(len(index), size=(n_queries, 2))
+    queries = normalize(index.vectors[pairs[:, 0]] + index.vectors[pairs[:, 1]])
+
+    index_recall, chroma_recall, index_ms, chroma_ms = [], [], [], []
+    for query in queries:
+
+        exact = set(index.ids[np.argsort(-(index.vectors @ query))[:k]])
+
+        start = time.perf_counter()
+        rows, _ = index.search(query, k=k)
+        index_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        chroma_ids = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])["ids"][0]
+        chroma_ms.append((time.perf_counter() - start) * 1000)
+
+        index_ids = set(index.ids[rows])
+        index_recall.append(len(index_ids & exact) / k)
+        chroma_recall.append(len(index_ids & set(chroma_ids)) / k)
+
+    report = {
+        "count": len(index),
+        "dim": index.info["dim"],
+        "reduced_dim": index.info["reduced_dim"],
+        "index_mb": index.nbytes / 2**20,
+        "float32_mb": len(index) * index.info["dim"] * 4 / 2**20,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10,
+        "recall_vs_exact": float(np.mean(index_recall)),
+        "recall_vs_chroma": float(np.mean(chroma_recall)),
+        "index_median_ms": float(np.median(index_ms)),
+        "chroma_median_ms": float(np.median(chroma_ms))
+    }
+    return report
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(description="build or evaluate the quantized in-process movie content index")
+    parser.add_argument("command", choices=["build", "evaluate"])
+    parser.add_argument("--chroma-path", type=str, default=os.environ.get("CHROMA_PATH", "./chroma"), help="path to the persistent Chroma database")
+    parser.add_argument("--index-path", type=str, default=os.environ.get("CONTENT_INDEX_PATH", "./content-index"), help="directory of the content index")
+    parser.add_argument("--dim", type=int, help="reduce the embeddings to this many principal components before quantizing")
+    parser.add_argument("--queries", type=int, default=200, help="number of evaluation queries")
+    parser.add_argument("--k", type=int, default=10, help="number of matches per evaluation query")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_from_chroma(args.chroma_path, args.index_path, dim=args.dim)
+        print(json.dumps(ContentIndex(args.index_path).info, indent=2))
+    else:
+        print(json.dumps(evaluate(args.chroma_path, args.index_path, n_queries=args.queries, k=args.k), indent=2))
@@ -3,45 +3,103 @@ import re
 import sys
 import json
 import requests
+import threading
 
 import numpy as np
 import pandas as pd
 import streamlit as st
 
-from typing import List, Dict
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Dict, Optional, Union
 from dotenv import load_dotenv
 from requests import HTTPError
 from pandas import DataFrame
 from uuid import uuid4
 from llama_index.llms import ChatMessage, MessageRole
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 
 sys.path.append(os.path.abspath("."))
-from shared.models import Movie, Recommendation, SearchRequest, SearchResponse
+from shared.models import ConversationSession, CreateSessionRequest, Movie, Recommendation, SearchResponse, SessionSearchRequest  # noqa: E402
+from frontend.app.tokens import IdTokenCache  # noqa: E402
 # NOTE: hack to fix relative imports for "streamlit run frontend/app/main.py"
 
 
 load_dotenv()
 
+ETAG_CACHE_SIZE = int(os.environ.get("ETAG_CACHE_SIZE", "256"))
+
 
 # define helper functions
 # -----------------------
 
+@st.cache_resource
+def get_token_cache(backend_url: str) -> Optional[IdTokenCache]:
+    """get the process-wide backend ID token cache shared by all sessions (None when the backend doesn't require auth)"""
+
+    if backend_url.endswith("run.app"):
+        return IdTokenCache(audience=backend_url)
+    else:
+        return None
+
+
 def create_backend_headers() -> dict:
     """create authorization headers for backend API requests"""
 
-    backend_url = os.environ.get("BACKEND_URL", "http://127.0.0.1:8080")
-    if backend_url.endswith("run.app"):
-        import google.auth.transport.requests
-        import google.oauth2.id_token
-        auth_req = google.auth.transport.requests.Request()
-        id_token = google.oauth2.id_token.fetch_id_token(auth_req, backend_url)
-        headers = {"Authorization": f"Bearer {id_token}"}
+    token_cache = get_token_cache(st.session_state["backend_url"])
+    if token_cache is not None:
+        headers = {"Authorization": f"Bearer {token_cache.get()}"}
     else:
         headers = {}
+
+    # identify the user (or the anonymous browser session) so the backend's admission control can share capacity fairly between users
+    headers["X-Client-Id"] = st.session_state["client_id"]
+    if st.session_state.get("user_id"):
+        headers["X-User-Id"] = st.session_state["user_id"]
     return headers
 
 
+def backend_request(method: str, endpoint: str, headers: Optional[dict] = None, **kwargs) -> requests.Response:
+    """send a backend API request retrying once with a new ID token if the backend rejects the current one"""
+
+    session = st.session_state["http_session"]
+    backend_headers = create_backend_headers()
+    response = session.request(method, endpoint, headers={**backend_headers, **(headers or {})}, **kwargs)
+
+    token_cache = get_token_cache(st.session_state["backend_url"])
+    if response.status_code == 401 and token_cache is not None:
+        token_cache.invalidate(backend_headers["Authorization"].removeprefix("Bearer "))
+        response = session.request(method, endpoint, headers={**create_backend_headers(), **(headers or {})}, **kwargs)
+    return response
+
+
+def backend_get_json(endpoint: str) -> Union[Dict, List]:
+    """GET a backend resource revalidating the session's cached copy with its ETag so unchanged resources aren't re-sent"""
+
+    # NOTE: the cache is shared with the prefetch threads and keeps only the [ETAG_CACHE_SIZE] most recently used resources
+    etag_cache, etag_lock = st.session_state["etag_cache"], st.session_state["etag_lock"]
+    with etag_lock:
+        cached = etag_cache.get(endpoint)
+        if cached:
+            etag_cache.move_to_end(endpoint)
+    headers = {"If-None-Match": cached[0]} if cached else {}
+
+    response = backend_request("GET", endpoint, headers=headers)
+    if response.status_code == 304 and cached:
+        return cached[1]
+
+    response.raise_for_status()
+    payload = response.json()
+    if response.headers.get("ETag"):
+        with etag_lock:
+            etag_cache[endpoint] = (response.headers["ETag"], payload)
+            etag_cache.move_to_end(endpoint)
+            while len(etag_cache) > ETAG_CACHE_SIZE:
+                etag_cache.popitem(last=False)
+    return payload
+
+
 def create_tmdb_headers() -> dict:
     """create authorization headers for TMDB API requests"""
 
@@ -52,14 +110,9 @@ def create_tmdb_headers() -> dict:
 def get_movie(tmdb_id: str) -> Movie:
     """get movie details by ID from the application database"""
 
-    session = st.session_state["http_session"]
     endpoint = f"{st.session_state['backend_url']}/movies/{tmdb_id}/"
-    headers = st.session_state["backend_headers"]
-
-    response = session.get(endpoint, headers=headers)
-    response.raise_for_status()
 
-    movie = Movie(**response.json())
+    movie = Movie(**backend_get_json(endpoint))
     return movie
 
 
@@ -112,9 +165,8 @@ def add_movie(tmdb_id: str) -> None:
 
     movie = Movie(**movie_details, **movie_credits, **movie_keywords)
     endpoint = f"{st.session_state['backend_url']}/movies/"
-    headers = st.session_state["backend_headers"]
 
-    response = session.post(endpoint, json=json.loads(movie.json()), headers=headers)
+    response = backend_request("POST", endpoint, json=json.loads(movie.json()))
     response.raise_for_status()
 
 
@@ -137,6 +189,9 @@ def get_or_create_tmdb_session() -> str:
 
     if "tmdb_session_id" in st.session_state:
         return st.session_state["tmdb_session_id"]
+    elif "request_token" not in st.session_state:
+        st.error("You must authenticate your TMDB account before importing movie ratings")
+        raise ValueError("no TMDB request token has been generated for this session")
     else:
         session = st.session_state["http_session"]
         endpoint = "https://api.themoviedb.org/3/authentication/session/new"
@@ -201,29 +256,22 @@ def validate_ratings(ratings: List[Dict]) -> None:
                 raise ValueError(error_message)
 
 
-@st.cache_data
+@st.cache_data(show_spinner=False)
 def get_user_ratings(user_id: str) -> DataFrame:
     """get the user's current set of ratings"""
 
-    session = st.session_state["http_session"]
     endpoint = f"{st.session_state['backend_url']}/users/{user_id}/ratings/"
-    headers = st.session_state["backend_headers"]
 
-    response = session.get(endpoint, headers=headers)
-    response.raise_for_status()
-
-    user_ratings = pd.DataFrame(response.json())
+    user_ratings = pd.DataFrame(backend_get_json(endpoint))
     return user_ratings
 
 
 def add_user_ratings(user_id: str, ratings: List[dict]) -> None:
     """persist= a set of user ratings to the database"""
 
-    session = st.session_state["http_session"]
     endpoint = f"{st.session_state['backend_url']}/users/{user_id}/ratings/"
-    headers = st.session_state["backend_headers"]
 
-    response = session.post(endpoint, json=ratings, headers=headers)
+    response = backend_request("POST", endpoint, json=ratings)
     response.raise_for_status()
 
 
@@ -236,17 +284,13 @@ def format_recommendations(recommendations: List[Recommendation]) -> DataFrame:
     return recs_df[st.session_state["recommendation_columns"]]
 
 
-@st.cache_data
+@st.cache_data(show_spinner=False)
 def get_user_recommendations(user_id: str) -> DataFrame:
     """get the user's current set of unconditional recommendations"""
 
-    session = st.session_state["http_session"]
     endpoint = f"{st.session_state['backend_url']}/users/{user_id}/recommendations/"
-    headers = st.session_state["backend_headers"]
 
-    recommendations_response = session.get(endpoint, headers=headers)
-    recommendations_response.raise_for_status()
-    recommendations_payload = recommendations_response.json()
+    recommendations_payload = backend_get_json(endpoint)
 
     if recommendations_payload:
         recommendations = format_recommendations([Recommendation(**item) for item in recommendations_payload])
@@ -255,6 +299,26 @@ def get_user_recommendations(user_id: str) -> DataFrame:
         return DataFrame()
 
 
+def prefetch_user_data(user_id: str) -> None:
+    """concurrently warm the cached ratings and recommendations so the tabs don't wait on each backend call in turn"""
+
+    # worker threads need the current script run context to read the session state and use the streamlit caches
+    ctx = get_script_run_ctx()
+
+    def run_with_ctx(fn, *args):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args)
+
+    executor = st.session_state["prefetch_executor"]
+    futures = [executor.submit(run_with_ctx, get_user_ratings, user_id), executor.submit(run_with_ctx, get_user_recommendations, user_id)]
+    wait(futures)
+
+    # failures aren't cached so the tabs will retry (and report) them when they render
+    for future in futures:
+        if future.exception() is not None:
+            print(future.exception())
+
+
 def render_chat_history(messages: List[ChatMessage]) -> None:
     """render the chat history as a series of streamlit st.chat_message() elements"""
 
@@ -276,13 +340,11 @@ def render_chat_history(messages: List[ChatMessage]) -> None:
 def submit_signup(fname: str, lname: str, email: str, password: str) -> None:
     """process a signup form submission"""
 
-    session = st.session_state["http_session"]
     endpoint = f"{st.session_state['backend_url']}/users/"
     payload = {"fname": fname, "lname": lname, "email": email, "password": password}
-    headers = st.session_state["backend_headers"]
 
     try:
-        response = session.post(endpoint, json=payload, headers=headers)
+        response = backend_request("POST", endpoint, json=payload)
         response.raise_for_status()
         st.session_state["user_login"] = True
         st.session_state["user_id"] = response.json()
@@ -295,13 +357,11 @@ def submit_signup(fname: str, lname: str, email: str, password: str) -> None:
 def submit_login(email: str, password: str) -> None:
     """process a login form submission"""
 
-    session = st.session_state["http_session"]
     endpoint = f"{st.session_state['backend_url']}/login/"
     payload = {"email": email, "password": password}
-    headers = st.session_state["backend_headers"]
 
     try:
-        response = session.post(endpoint, json=payload, headers=headers)
+        response = backend_request("POST", endpoint, json=payload)
         response.raise_for_status()
         st.session_state["user_login"] = True
         st.session_state["user_id"] = response.json()
@@ -341,23 +401,37 @@ def submit_import_ratings() -> None:
         print(err)
 
 
+def create_search_session() -> str:
+    """create a new server-side conversation session for search returning its session_id"""
+
+    endpoint = f"{st.session_state['backend_url']}/sessions/"
+    payload = CreateSessionRequest(user_id=st.session_state.get("user_id"))
+    response = backend_request("POST", endpoint, json=payload.dict())
+    response.raise_for_status()
+    session = ConversationSession(**response.json())
+    return session.session_id
+
+
 def callback_search() -> None:
     """execute a search query and update the session state dataframe of search results"""
 
     search_message = ChatMessage(role=MessageRole.USER, content=st.session_state["search_message"].strip())
     st.session_state["chat_messages"].append(search_message)
-    user_id = st.session_state.get("user_id")
 
-    session = st.session_state["http_session"]
-    endpoint = f"{st.session_state['backend_url']}/search/"
-    headers = st.session_state["backend_headers"]
+    # the backend keeps the conversation history so only the new message is sent with each search
+    if "search_session_id" not in st.session_state:
+        st.session_state["search_session_id"] = create_search_session()
 
-    if user_id:
-        payload = SearchRequest(chat_messages=st.session_state["chat_messages"], user_id=user_id)
-    else:
-        payload = SearchRequest(chat_messages=st.session_state["chat_messages"])
+    payload = SessionSearchRequest(message=search_message.content, user_id=st.session_state.get("user_id"))
+    endpoint = f"{st.session_state['backend_url']}/sessions/{st.session_state['search_session_id']}/search/"
+    search_response = backend_request("POST", endpoint, json=payload.dict())
+
+    # start a new conversation if the backend no longer has this one
+    if search_response.status_code == 404:
+        st.session_state["search_session_id"] = create_search_session()
+        endpoint = f"{st.session_state['backend_url']}/sessions/{st.session_state['search_session_id']}/search/"
+        search_response = backend_request("POST", endpoint, json=payload.dict())
 
-    search_response = session.post(endpoint, json=payload.dict(), headers=headers)
     search_response.raise_for_status()
     search_response = SearchResponse(**search_response.json())
 
@@ -368,12 +442,30 @@ def callback_search() -> None:
     st.session_state["search_recommendations"] = search_recommendations
 
 
+def callback_request_token() -> None:
+    """generate a TMDB request token the first time the user asks to authenticate their TMDB account"""
+
+    try:
+        st.session_state["request_token"] = get_request_token()
+    except HTTPError as err:
+        st.error("Error Connecting to TMDB!", icon="🚨")
+        print(err)
+
+
 def callback_clear_search() -> None:
     """clear the conversation history to reset search"""
 
     st.session_state["chat_messages"] = [ChatMessage(role=MessageRole.SYSTEM, content="You are a helpful movie recommendation assistant")]
     st.session_state["search_recommendations"] = pd.DataFrame(columns=st.session_state["recommendation_columns"])
 
+    # drop the server-side conversation so the next search starts a new one
+    session_id = st.session_state.pop("search_session_id", None)
+    if session_id is not None:
+        try:
+            backend_request("DELETE", f"{st.session_state['backend_url']}/sessions/{session_id}/").raise_for_status()
+        except requests.RequestException as err:
+            print(err)
+
 
 # define dynamic layout rendering functions
 # -----------------------------------------
@@ -493,9 +585,18 @@ if "http_session" not in st.session_state:
     http_session = requests.Session()
     http_session.headers.update(common_headers)
     st.session_state["http_session"] = http_session
-    st.session_state["backend_headers"] = create_backend_headers()
     st.session_state["tmdb_headers"] = create_tmdb_headers()
 
+# bounded LRU cache of backend resources by URL revalidated with their ETags and the threads prefetching them
+if "etag_cache" not in st.session_state:
+    st.session_state["etag_cache"] = OrderedDict()
+    st.session_state["etag_lock"] = threading.Lock()
+    st.session_state["prefetch_executor"] = ThreadPoolExecutor(max_workers=2)
+
+# anonymous ID of this browser session sent to the backend so searches from users who aren't logged in are told apart
+if "client_id" not in st.session_state:
+    st.session_state["client_id"] = str(uuid4())
+
 # indicator for whether or not a user is currently logged in
 if "user_login" not in st.session_state:
     st.session_state["user_login"] = False
@@ -510,10 +611,6 @@ if "search_recommendations" not in st.session_state:
     st.session_state["recommendation_columns"] = recommendation_columns
     st.session_state["search_recommendations"] = pd.DataFrame(columns=recommendation_columns)
 
-# request token to generate TMDB user sessions
-if "request_token" not in st.session_state:
-    st.session_state["request_token"] = get_request_token()
-
 # render a static left sidebar
 # ----------------------------
 
@@ -544,10 +641,13 @@ with st.sidebar:
             if submit:
                 submit_login(email, password)
 
-    # link button: authenticate your TMDB account
-    tmdb_auth_url = f"https://www.themoviedb.org/authenticate/{st.session_state['request_token']}"
+    # link button: authenticate your TMDB account (the request token is only generated once the user asks for it)
     tmdb_auth_help = "authenticate with TMDB to import movie ratings"
-    st.link_button("Authenticate Your TMDB Account", url=tmdb_auth_url, help=tmdb_auth_help, use_container_width=True)
+    if "request_token" in st.session_state:
+        tmdb_auth_url = f"https://www.themoviedb.org/authenticate/{st.session_state['request_token']}"
+        st.link_button("Authenticate Your TMDB Account", url=tmdb_auth_url, help=tmdb_auth_help, use_container_width=True)
+    else:
+        st.button(label="Connect Your TMDB Account", on_click=callback_request_token, help=tmdb_auth_help, use_container_width=True)
 
     # clear search history button: clear the search conversation history
     st.button(label="Clear Search History", on_click=callback_clear_search, use_container_width=True)
@@ -556,6 +656,9 @@ with st.sidebar:
 # render a dynamic tabset for the main content area
 # -------------------------------------------------
 
+if st.session_state["user_login"]:
+    prefetch_user_data(user_id=st.session_state["user_id"])
+
 active_tabs = render_active_tabs()
 
 if "search" in active_tabs:
@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import base64
+import threading
+
+from typing import Callable, Optional
+
+TOKEN_REFRESH_MARGIN = float(os.environ.get("TOKEN_REFRESH_MARGIN", "300"))
+TOKEN_MIN_VALIDITY = float(os.environ.get("TOKEN_MIN_VALIDITY", "30"))
+TOKEN_DEFAULT_LIFETIME = 3600
+TOKEN_RETRY_INTERVAL = 10
+
+
+def get_token_expiry(token: str) -> float:
+    """read the [exp] claim (epoch seconds) of a JWT without verifying it, assuming the default lifetime if it can't be read"""
+
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return time.time() + TOKEN_DEFAULT_LIFETIME
+
+
+def fetch_google_id_token(audience: str) -> str:
+    """fetch a Google-signed ID token for the audience from the metadata server (or local application default credentials)"""
+
+    import google.auth.transport.requests
+    import google.oauth2.id_token
+    auth_req = google.auth.transport.requests.Request()
+    id_token = google.oauth2.id_token.fetch_id_token(auth_req, audience)
+    return id_token
+
+
+class IdTokenCache:
+    """process-wide ID token shared by every session which is refreshed in the background before it expires"""
+
+    def __init__(self, audience: str, fetch: Callable[[str], str] = fetch_google_id_token, margin: float = TOKEN_REFRESH_MARGIN) -> None:
+        self.audience = audience
+        self.fetch = fetch
+        self.margin = margin
+        self.token: Optional[str] = None
+        self.expires_at = 0.0
+        self.refresh_at = 0.0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def get(self) -> str:
+        """get the current token fetching a new one only if there isn't a usable one yet"""
+
+        token = self.token
+        if token is None or time.time() >= self.expires_at - TOKEN_MIN_VALIDITY:
+            token = self.refresh(stale_token=token)
+
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="id-token-refresh", daemon=True)
+                    self._thread.start()
+        return token
+
+    def refresh(self, stale_token: Optional[str] = None) -> str:
+        """fetch a new token unless another caller already replaced [stale_token] while this one waited for the lock"""
+
+        with self._lock:
+            if self.token is not None and self.token != stale_token and time.time() < self.expires_at - TOKEN_MIN_VALIDITY:
+                return self.token
+            token = self.fetch(self.audience)
+            self.token, self.expires_at = token, get_token_expiry(token)
+            # refresh [margin] seconds ahead of expiry or half-way through the lifetime of unusually short-lived tokens
+            self.refresh_at = self.expires_at - min(self.margin, (self.expires_at - time.time()) / 2)
+            self._wakeup.set()
+            return token
+
+    def invalidate(self, token: str) -> str:
+        """replace a token the backend rejected (e.g. with a 401) returning the new token"""
+
+        return self.refresh(stale_token=token)
+
+    def _run(self) -> None:
+        """refresh the token [margin] seconds before it expires so requests never wait on the metadata server"""
+
+        while True:
+            self._wakeup.clear()
+            delay = self.refresh_at - time.time()
+            if delay > 0:
+                self._wakeup.wait(delay)
+                continue
+            try:
+                self.refresh(stale_token=self.token)
+            except Exception as err:
+                print(f"failed to refresh the backend ID token: {err}")
+                self._wakeup.wait(TOKEN_RETRY_INTERVAL)
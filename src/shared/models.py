@@ -11,11 +11,13 @@ class AddUserRequest(BaseModel):
     email: str
     password: str
 
+
 class UpdateUserRequest(BaseModel):
     email: str
     fname: str
     lname: str
 
+
 class User(BaseModel):
     user_id: str
     email: str
@@ -54,6 +56,7 @@ class Rating(BaseModel):
     tmdb_id: str
     rating: float
 
+
 class DisplayRating(BaseModel):
     tmdb_id: str
     tmdb_homepage: str
@@ -61,10 +64,12 @@ class DisplayRating(BaseModel):
     release_date: date
     rating: float
 
+
 class AddRatingRequest(BaseModel):
     tmdb_id: str
     rating: float
 
+
 class AddRatingsResponse(BaseModel):
     cnt_added: int
     cnt_updated: int
@@ -74,11 +79,93 @@ class Recommendation(BaseModel):
     movie: Movie
     score: float
 
+
+class SearchFilters(BaseModel):
+    genres: Optional[List[str]] = None
+    languages: Optional[List[str]] = None
+    decades: Optional[List[int]] = None
+    actors: Optional[List[str]] = None
+    directors: Optional[List[str]] = None
+
+
 class SearchRequest(BaseModel):
     chat_messages: List[ChatMessage]
     user_id: Optional[str] = None
     k: Optional[int] = 10
+    filters: Optional[SearchFilters] = None
+    context_tokens: Optional[int] = None
+    deadline_ms: Optional[int] = None
+
 
 class SearchResponse(BaseModel):
     message: str
     recommendations: List[Recommendation]
+    filters: Optional[SearchFilters] = None
+    standalone_query: Optional[str] = None
+    degraded: bool = False
+
+
+class CreateSessionRequest(BaseModel):
+    user_id: Optional[str] = None
+
+
+class ConversationSession(BaseModel):
+    session_id: str
+    user_id: Optional[str] = None
+    standalone_query: Optional[str] = None
+    turns: int = 0
+    chat_messages: List[ChatMessage] = []
+    created_at: datetime
+    updated_at: datetime
+
+
+class SessionSearchRequest(BaseModel):
+    message: str
+    user_id: Optional[str] = None
+    k: Optional[int] = 10
+    filters: Optional[SearchFilters] = None
+    context_tokens: Optional[int] = None
+    deadline_ms: Optional[int] = None
+
+
+class ProfileSummary(BaseModel):
+    profile_id: str
+    method: str
+    path: str
+    trigger: str
+    started_at: datetime
+    duration_ms: float
+    samples: int
+
+
+class ModelVersion(BaseModel):
+    version: str
+    created_at: Optional[datetime] = None
+    loaded_at: Optional[datetime] = None
+    load_seconds: float
+    collab_movies: int
+    content_index_movies: Optional[int] = None
+    catalog_stats: dict = {}
+
+
+class MemoryComponent(BaseModel):
+    component: str
+    bytes: int
+    growth_bytes: Optional[int] = None
+
+
+class MemoryAllocation(BaseModel):
+    location: str
+    size_bytes: int
+    growth_bytes: int
+    count: int
+
+
+class MemoryReport(BaseModel):
+    taken_at: datetime
+    rss_bytes: int
+    rss_growth_bytes: Optional[int] = None
+    attributed_bytes: int
+    measure_seconds: float
+    components: List[MemoryComponent]
+    allocations: List[MemoryAllocation] = []
@@ -4,14 +4,14 @@ import pytest
 from sqlalchemy import select
 from datetime import datetime
 
-from src.shared.models import Movie
+from shared.models import Movie
 
 
 @pytest.fixture(autouse=True)
-def patch_constant(monkeypatch, test_engine):
+def patch_constant(monkeypatch, test_engine_router):
     """mock the CloudSQL SQLAlchemy Engine with a local DuckDB Engine for testing"""
 
-    monkeypatch.setattr("app.api.movies.engine", test_engine)
+    monkeypatch.setattr("backend.app.api.movies.engine_router", test_engine_router)
 
 
 @pytest.fixture(scope="module")
@@ -55,6 +55,19 @@ def test_get_movie(client, movie):
     assert Movie(**response.json()) == movie
 
 
+def test_get_movie_not_modified(client, movie):
+    """unit test: get_movie() with If-None-Match"""
+
+    etag = client.get(f"/movies/{movie.tmdb_id}/").headers["ETag"]
+    response = client.get(f"/movies/{movie.tmdb_id}/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = client.get(f"/movies/{movie.tmdb_id}/", headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == etag
+
+
 # FIXME: updates to columns part of an index are handled as deletions/insertions which causes unexpected constraint violations
 # FIXME: https://duckdb.org/docs/sql/indexes.html#over-eager-unique-constraint-checking
 # def test_update_movie(client, movie):
@@ -1,16 +1,16 @@
 import pytest
-from sqlalchemy import select
+from sqlalchemy import false, select
 from uuid import UUID
 
-from src.backend.app import database
-from src.shared.models import AddUserRequest, UpdateUserRequest
+from backend.app import database
+from shared.models import AddRatingRequest, AddUserRequest, UpdateUserRequest
 
 
 @pytest.fixture(autouse=True)
-def patch_constant(monkeypatch, test_engine):
+def patch_constant(monkeypatch, test_engine_router):
     """mock the CloudSQL SQLAlchemy Engine with a local DuckDB Engine for testing"""
 
-    monkeypatch.setattr("app.api.users.engine", test_engine)
+    monkeypatch.setattr("backend.app.api.users.engine_router", test_engine_router)
 
 
 def test_create_user(client):
@@ -29,6 +29,18 @@ def test_create_user(client):
     assert uuid_response
 
 
+def test_create_user_duplicate(client, monkeypatch):
+    """unit test: create_user() rejects a duplicate email which gets past the existence check (concurrent signups)"""
+
+    user_request = AddUserRequest(email="race@test.com", password="testpassword", fname="test", lname="test")
+    assert client.post("/users/", json=user_request.model_dump()).status_code == 200
+
+    monkeypatch.setattr("backend.app.api.users.select", lambda *args: select(*args).where(false()))
+    response = client.post("/users/", json=user_request.model_dump())
+    assert response.status_code == 400
+    assert "already exists" in response.json()["detail"]
+
+
 def test_get_user(client, test_engine):
     """unit test: get_user()"""
 
@@ -56,6 +68,25 @@ def test_update_user(client, test_engine):
     assert response.status_code == 200
 
 
+def test_add_user_ratings(client, test_engine):
+    """unit test: add_user_ratings()"""
+
+    with test_engine.begin() as cnx:
+        statement = select(database.users).limit(1)
+        user_id = cnx.execute(statement).one()._asdict()['user_id']
+
+    for rating in [3.0, 4.5]:
+        rating_requests = [AddRatingRequest(tmdb_id="100", rating=rating).model_dump()]
+        response = client.post(f"/users/{user_id}/ratings/", json=rating_requests)
+        assert response.status_code == 200
+
+    with test_engine.begin() as cnx:
+        ratings = cnx.execute(select(database.ratings.c.rating).where(database.ratings.c.user_id == user_id)).scalars().all()
+        version = cnx.execute(select(database.ratings_versions.c.version).where(database.ratings_versions.c.user_id == user_id)).scalar()
+    assert ratings == [4.5]
+    assert version == 2
+
+
 def test_delete_user(client, test_engine):
     """unit test: delete_user()"""
 
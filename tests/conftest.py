@@ -1,10 +1,17 @@
 import os
+import sys
 import pytest
 
 from fastapi.testclient import TestClient
 
-from src.backend.app.main import app
-from src.backend.app.database import metadata, get_test_engine
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+# NOTE: the app imports its modules as [backend.app.*] so the tests must too: importing them again as [src.backend.app.*]
+# would re-register every prometheus metric in the default registry and fail with a duplicated timeseries error
+
+from backend.app.main import app  # noqa: E402
+from backend.app.database import ThreadedAsyncEngine, get_test_engine  # noqa: E402
+from backend.app.routing import EngineRouter  # noqa: E402
+from backend.app.migrations import migrate  # noqa: E402
 
 
 @pytest.fixture(scope="session")
@@ -20,10 +27,35 @@ def test_engine():
     """fixture to create a SQLAlchemy engine backed by a local DuckDB database"""
 
     test_engine = get_test_engine(echo=True)
-    metadata.create_all(test_engine)
+    migrate(test_engine)
     return test_engine
 
 
+@pytest.fixture()
+def duckdb_engine(tmp_path):
+    """fixture to create an empty DuckDB database in the test's temporary directory"""
+
+    duckdb_engine = get_test_engine(path=str(tmp_path / "database.duckdb"))
+    yield duckdb_engine
+    duckdb_engine.dispose()
+
+
+@pytest.fixture()
+def migrated_engine(duckdb_engine):
+    """fixture to create a migrated DuckDB database in the test's temporary directory"""
+
+    migrate(duckdb_engine)
+    return duckdb_engine
+
+
+@pytest.fixture(scope="session")
+def test_engine_router(test_engine):
+    """fixture to route every async route and query to the local DuckDB engine"""
+
+    test_engine_router = EngineRouter(primary=ThreadedAsyncEngine(test_engine))
+    return test_engine_router
+
+
 def pytest_sessionfinish(session, exitstatus):
     """run clean-up code at the end of the test session"""
 
@@ -0,0 +1,112 @@
+import asyncio
+import pytest
+
+from starlette.requests import Request
+
+from backend.app.admission import AdmissionLimiter, AdmissionRejected, get_client_key, get_limiter, llm_limiter, standard_limiter
+
+
+def test_get_limiter():
+    """unit test: get_limiter()"""
+
+    assert get_limiter("/search/") is llm_limiter
+    assert get_limiter("/sessions/abc/search/") is llm_limiter
+    assert get_limiter("/users/abc/ratings/") is standard_limiter
+    assert get_limiter("/metrics") is None
+    assert get_limiter("/admin/models/") is None
+
+
+def test_get_client_key():
+    """unit test: get_client_key()"""
+
+    def make_request(headers: dict) -> Request:
+        scope = {"type": "http", "headers": [(key.lower().encode(), val.encode()) for key, val in headers.items()], "client": ("10.0.0.1", 1234)}
+        return Request(scope)
+
+    assert get_client_key(make_request({"X-User-Id": "user-1", "X-Client-Id": "browser-1"})) == "user:user-1"
+    assert get_client_key(make_request({"X-Client-Id": "browser-1"})) == "client:browser-1"
+    assert get_client_key(make_request({"X-Forwarded-For": "1.2.3.4, 10.0.0.2"})) == "ip:1.2.3.4"
+    assert get_client_key(make_request({})) == "ip:10.0.0.1"
+
+
+def test_admit_queue_full():
+    """unit test: AdmissionLimiter.acquire() queues up to [max_queue] requests and sheds the rest with a 503"""
+
+    limiter = AdmissionLimiter("test", concurrency=1, max_queue=1, per_user=10, queue_timeout=5)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def request(client):
+            async with limiter.admit(client):
+                await release.wait()
+                return client
+
+        first = asyncio.create_task(request("a"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(request("b"))
+        await asyncio.sleep(0)
+        assert (limiter.active, limiter.queued) == (1, 1)
+
+        with pytest.raises(AdmissionRejected) as err:
+            await request("c")
+        assert err.value.status_code == 503
+        assert err.value.retry_after >= 1
+
+        release.set()
+        return await asyncio.gather(first, second)
+
+    assert asyncio.run(main()) == ["a", "b"]
+    assert (limiter.active, limiter.queued, limiter._clients) == (0, 0, {})
+
+
+def test_admit_per_user():
+    """unit test: AdmissionLimiter.acquire() rejects a client over its own limit with a 429"""
+
+    limiter = AdmissionLimiter("test", concurrency=10, max_queue=10, per_user=1)
+
+    async def main():
+        async with limiter.admit("a"):
+            with pytest.raises(AdmissionRejected) as err:
+                await limiter.acquire("a")
+            assert err.value.status_code == 429
+            async with limiter.admit("b"):
+                pass
+
+    asyncio.run(main())
+    assert limiter._clients == {}
+
+
+def test_admit_round_robin():
+    """unit test: AdmissionLimiter.release() hands freed slots to waiting clients in turn"""
+
+    limiter = AdmissionLimiter("test", concurrency=1, max_queue=10, per_user=10)
+    order = []
+
+    async def main():
+        async def request(client):
+            async with limiter.admit(client):
+                order.append(client)
+                await asyncio.sleep(0.01)
+
+        tasks = [asyncio.create_task(request(client)) for client in ["a", "a", "a", "b", "b", "c"]]
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["a", "a", "b", "c", "a", "b"]
+
+
+def test_admit_timeout():
+    """unit test: AdmissionLimiter.acquire() sheds requests which wait longer than the queue timeout"""
+
+    limiter = AdmissionLimiter("test", concurrency=1, max_queue=10, per_user=10, queue_timeout=0.05)
+
+    async def main():
+        async with limiter.admit("a"):
+            with pytest.raises(AdmissionRejected) as err:
+                await limiter.acquire("b")
+            assert err.value.status_code == 503
+        assert limiter.queued == 0
+
+    asyncio.run(main())
+    assert limiter._clients == {}
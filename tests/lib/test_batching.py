@@ -0,0 +1,87 @@
+import time
+import threading
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from types import SimpleNamespace
+
+from backend.app.batching import EmbeddingBatcher, openai_embed_batch
+
+
+class FakeEmbedder:
+    """records the batches it's called with and embeds each text as [len(text), position in batch]"""
+
+    def __init__(self) -> None:
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self.lock:
+            self.batches.append(list(texts))
+        return [[float(len(text)), float(i)] for i, text in enumerate(texts)]
+
+
+def test_embed_batches_concurrent_requests():
+    """unit test: EmbeddingBatcher.embed() sends concurrent requests together and returns each caller its own vector"""
+
+    embedder = FakeEmbedder()
+    batcher = EmbeddingBatcher(embed_batch=embedder, window_ms=50, max_batch_size=8)
+    texts = ["x" * n for n in range(1, 17)]
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        embeddings = list(executor.map(batcher.embed, texts))
+
+    assert [embedding[0] for embedding in embeddings] == [float(len(text)) for text in texts]
+    assert sorted(text for batch in embedder.batches for text in batch) == sorted(texts)
+    assert len(embedder.batches) < len(texts)
+    assert max(len(batch) for batch in embedder.batches) <= 8
+
+
+def test_embed_unbatched():
+    """unit test: EmbeddingBatcher.embed() calls the API directly when the window is 0"""
+
+    embedder = FakeEmbedder()
+    batcher = EmbeddingBatcher(embed_batch=embedder, window_ms=0)
+
+    assert batcher.embed("abc") == [3.0, 0.0]
+    assert embedder.batches == [["abc"]]
+    assert batcher._thread is None
+
+
+def test_embed_error():
+    """unit test: EmbeddingBatcher.embed() raises the batch's API error in every caller"""
+
+    def embed_batch(texts):
+        raise RuntimeError("rate limited")
+
+    batcher = EmbeddingBatcher(embed_batch=embed_batch, window_ms=1)
+    with pytest.raises(RuntimeError, match="rate limited"):
+        batcher.embed("abc")
+
+
+def test_embed_size_mismatch():
+    """unit test: EmbeddingBatcher.embed() fails the batch when the API returns the wrong number of vectors"""
+
+    batcher = EmbeddingBatcher(embed_batch=lambda texts: [[1.0]] * (len(texts) - 1), window_ms=1)
+    with pytest.raises(ValueError, match="expected 1 embeddings but got 0"):
+        batcher.embed("abc")
+
+
+def test_embed_timeout():
+    """unit test: EmbeddingBatcher.embed() gives up when the batch doesn't return within the timeout"""
+
+    def embed_batch(texts):
+        time.sleep(0.5)
+        return [[1.0] for _ in texts]
+
+    batcher = EmbeddingBatcher(embed_batch=embed_batch, window_ms=1, timeout=0.05)
+    with pytest.raises(TimeoutError):
+        batcher.embed("abc")
+
+
+def test_openai_embed_batch():
+    """unit test: openai_embed_batch() returns the embeddings in input order"""
+
+    data = [SimpleNamespace(index=1, embedding=[1.0]), SimpleNamespace(index=0, embedding=[0.0])]
+    client = SimpleNamespace(embeddings=SimpleNamespace(create=lambda input, model: SimpleNamespace(data=data)))
+    assert openai_embed_batch(client)(["a", "b"]) == [[0.0], [1.0]]
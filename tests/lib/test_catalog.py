@@ -0,0 +1,152 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from backend.app.catalog import MovieCatalog, CatalogCache
+from shared.models import SearchFilters
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    """small in-memory catalog with known attributes"""
+
+    movies = pd.DataFrame([
+        {
+            "tmdb_id": "103", "language": "fr", "release_date": "1995-06-01", "director": "Luc Besson",
+            "actors": ["Jean Reno", "Natalie Portman"], "genres": ["Action", "Crime"], "popularity": 30.0
+        },
+        {
+            "tmdb_id": "101", "language": "en", "release_date": "1972-03-14", "director": "Francis Ford Coppola",
+            "actors": ["Al Pacino", "Marlon Brando"], "genres": ["Crime", "Drama"], "popularity": 90.0
+        },
+        {
+            "tmdb_id": "102", "language": "en", "release_date": "1983-12-09", "director": "Brian De Palma",
+            "actors": ["Al Pacino"], "genres": ["Crime", "Drama"], "popularity": 60.0
+        },
+        {
+            "tmdb_id": "104", "language": "fr", "release_date": "1998-04-15", "director": "Francis Veber",
+            "actors": ["Jacques Villeret"], "genres": ["Comedy", "Family"], "popularity": 10.0
+        },
+        {
+            "tmdb_id": "105", "language": "en", "release_date": "1997-05-30", "director": "Luc Besson",
+            "actors": ["Bruce Willis"], "genres": ["Science Fiction", "Action", "War"], "popularity": 50.0
+        },
+    ])
+    return MovieCatalog(movies)
+
+
+def test_filter_bitmaps(catalog):
+    """unit test: MovieCatalog.filter() on genre/language/decade bitmaps"""
+
+    assert catalog.tmdb_ids.tolist() == ["101", "102", "103", "104", "105"]
+    assert catalog.filter(SearchFilters()) is None
+
+    rows = catalog.filter(SearchFilters(genres=["crime"], languages=["fr"]))
+    assert catalog.tmdb_ids[rows].tolist() == ["103"]
+
+    rows = catalog.filter(SearchFilters(decades=[1990]))
+    assert catalog.tmdb_ids[rows].tolist() == ["103", "104", "105"]
+
+    rows = catalog.filter(SearchFilters(decades=[1970, 1980], genres=["Drama"]))
+    assert catalog.tmdb_ids[rows].tolist() == ["101", "102"]
+
+    rows = catalog.filter(SearchFilters(genres=["western"]))
+    assert len(rows) == 0
+
+
+def test_filter_postings(catalog):
+    """unit test: MovieCatalog.filter() on actor/director posting lists combined with bitmaps"""
+
+    rows = catalog.filter(SearchFilters(actors=["Al Pacino"]))
+    assert catalog.tmdb_ids[rows].tolist() == ["101", "102"]
+
+    rows = catalog.filter(SearchFilters(actors=["al pacino", "marlon brando"]))
+    assert catalog.tmdb_ids[rows].tolist() == ["101"]
+
+    rows = catalog.filter(SearchFilters(directors=["Luc Besson", "Francis Veber"], genres=["Action"]))
+    assert catalog.tmdb_ids[rows].tolist() == ["103", "105"]
+
+    rows = catalog.filter(SearchFilters(actors=["Al Pacino"], decades=[1980]))
+    assert catalog.tmdb_ids[rows].tolist() == ["102"]
+
+    rows = catalog.filter(SearchFilters(actors=["Nobody"], genres=["Crime"]))
+    assert len(rows) == 0
+
+
+def test_filter_matches_brute_force():
+    """unit test: MovieCatalog.filter() agrees with a brute-force scan on random data"""
+
+    rng = np.random.default_rng(0)
+    genres, actors = ["Action", "Comedy", "Drama", "Horror"], [f"Actor {i}" for i in range(50)]
+    movies = pd.DataFrame({
+        "tmdb_id": [str(i) for i in range(2000)],
+        "language": rng.choice(["en", "fr", "es"], size=2000),
+        "release_date": [f"{year}-01-01" for year in rng.integers(1950, 2020, size=2000)],
+        "director": rng.choice(["A", "B", "C", "D"], size=2000),
+        "actors": [list(rng.choice(actors, size=3, replace=False)) for _ in range(2000)],
+        "genres": [list(rng.choice(genres, size=2, replace=False)) for _ in range(2000)],
+        "popularity": rng.uniform(0, 100, size=2000),
+    })
+    catalog = MovieCatalog(movies)
+
+    rows = catalog.filter(SearchFilters(genres=["Comedy"], languages=["fr", "es"], decades=[1990], actors=["Actor 7"]))
+    expected = movies[
+        movies["genres"].apply(lambda x: "Comedy" in x)
+        & movies["language"].isin(["fr", "es"])
+        & movies["release_date"].str[:3].eq("199")
+        & movies["actors"].apply(lambda x: "Actor 7" in x)
+    ]["tmdb_id"]
+    assert sorted(catalog.tmdb_ids[rows].tolist()) == sorted(expected.tolist())
+
+
+def test_get_popularity(catalog):
+    """unit test: MovieCatalog.get_popularity()"""
+
+    popularity = catalog.get_popularity(["105", "101", "999", "100"])
+    assert popularity[:2].tolist() == [50.0, 90.0]
+    assert np.isnan(popularity[2:]).all()
+    assert len(catalog.get_popularity([])) == 0
+
+
+def test_parse_filters(catalog):
+    """unit test: MovieCatalog.parse_filters()"""
+
+    filters = catalog.parse_filters("90s french comedies")
+    assert filters.decades == [1990]
+    assert filters.languages == ["fr"]
+    assert filters.genres == ["comedy"]
+    assert filters.actors is None
+
+    filters = catalog.parse_filters("crime movies starring al pacino and marlon brando from the 1970s")
+    assert filters.actors == ["al pacino", "marlon brando"]
+    assert filters.genres == ["crime"]
+    assert filters.decades == [1970]
+
+    filters = catalog.parse_filters("sci-fi directed by luc besson")
+    assert filters.directors == ["luc besson"]
+    assert filters.genres == ["science fiction"]
+
+    filters = catalog.parse_filters("something to watch with my kids")
+    assert filters == SearchFilters()
+
+    # genre words and ages used in their ordinary sense aren't filters
+    assert catalog.parse_filters("star wars") == SearchFilters()
+    assert catalog.parse_filters("star wars movies") == SearchFilters()
+    assert catalog.parse_filters("a family night comedy") == SearchFilters(genres=["comedy"])
+    assert catalog.parse_filters("a detective in his 40s") == SearchFilters()
+    assert catalog.parse_filters("a woman in her late 30s in the 1980s") == SearchFilters(decades=[1980])
+
+    filters = catalog.parse_filters("80s war movies and family films")
+    assert filters.genres == ["family", "war"]
+    assert filters.decades == [1980]
+
+
+def test_catalog_cache(catalog):
+    """unit test: CatalogCache.get()"""
+
+    loads = []
+    cache = CatalogCache(loader=lambda: loads.append(1) or catalog, ttl=60)
+
+    assert cache.get() is catalog
+    assert cache.get() is catalog
+    assert len(loads) == 1
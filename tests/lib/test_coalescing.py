@@ -0,0 +1,129 @@
+import time
+import asyncio
+import threading
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+from pydantic import BaseModel
+
+from backend.app.coalescing import SingleFlight, coalesced_requests_total, request_key
+
+
+class Query(BaseModel):
+    text: str
+    k: int = 10
+
+
+def get_coalesced(operation: str) -> float:
+    """current value of the coalesced requests counter for an operation"""
+
+    return coalesced_requests_total.labels(operation)._value.get()
+
+
+def test_request_key():
+    """unit test: request_key()"""
+
+    assert request_key(Query(text="heist movies")) == request_key(Query(text="heist movies", k=10))
+    assert request_key(Query(text="heist movies")) != request_key(Query(text="heist movies", k=5))
+    assert request_key("user", 10) != request_key("user", 5)
+    assert request_key({"b": 1, "a": 2}) == request_key({"a": 2, "b": 1})
+
+
+def test_do_coalesces():
+    """unit test: SingleFlight.do() shares one computation across concurrent identical calls"""
+
+    flight = SingleFlight("test-sync")
+    calls = []
+    started = threading.Event()
+
+    def compute(value):
+        calls.append(value)
+        started.set()
+        time.sleep(0.2)
+        return [value]
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        leader = executor.submit(flight.do, "key", compute, 1)
+        started.wait()
+        followers = [executor.submit(flight.do, "key", compute, 1) for _ in range(4)]
+        results = [leader.result()] + [follower.result() for follower in followers]
+
+    assert calls == [1]
+    assert all(result is results[0] for result in results)
+    assert get_coalesced("test-sync") == 4
+
+    # nothing is cached once the in-flight call completes
+    assert flight.do("key", compute, 2) == [2]
+    assert calls == [1, 2]
+
+
+def test_do_propagates_errors():
+    """unit test: SingleFlight.do() re-raises the leader's exception for every waiting caller"""
+
+    flight = SingleFlight("test-sync-error")
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(flight.do, "key", fail)
+        started.wait()
+        follower = executor.submit(flight.do, "key", fail)
+        for future in [leader, follower]:
+            with pytest.raises(ValueError):
+                future.result()
+
+    assert flight._calls == {}
+
+
+def test_ado_coalesces():
+    """unit test: SingleFlight.ado() shares one computation across concurrent identical coroutines"""
+
+    flight = SingleFlight("test-async")
+    calls = []
+
+    async def compute(value):
+        calls.append(value)
+        await asyncio.sleep(0.1)
+        return [value]
+
+    async def main():
+        return await asyncio.gather(*[flight.ado("key", compute, 1) for _ in range(5)], flight.ado("other", compute, 2))
+
+    results = asyncio.run(main())
+    assert calls == [1, 2]
+    assert all(result is results[0] for result in results[:5])
+    assert results[5] == [2]
+    assert get_coalesced("test-async") == 4
+    assert flight._tasks == {}
+
+
+def test_ado_leader_cancelled():
+    """unit test: SingleFlight.ado() keeps the shared computation running for the followers when the first caller is cancelled"""
+
+    flight = SingleFlight("test-async-cancel")
+    calls = []
+
+    async def compute(value):
+        calls.append(value)
+        await asyncio.sleep(0.1)
+        return [value]
+
+    async def main():
+        leader = asyncio.ensure_future(flight.ado("key", compute, 1))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.ensure_future(flight.ado("key", compute, 1)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return results
+
+    results = asyncio.run(main())
+    assert results == [[1], [1]]
+    assert calls == [1]
+    assert flight._tasks == {}
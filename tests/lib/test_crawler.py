@@ -0,0 +1,123 @@
+import json
+import time
+import asyncio
+import httpx
+
+from backend.app.crawler import RateLimiter, crawl, load_completed
+from shared.models import Movie
+
+
+def make_handler(requests: list, not_found: set = frozenset(), rate_limited: set = frozenset()):
+    """mock TMDB API which records request paths, 404s the [not_found] IDs and 429s the first request for each [rate_limited] path"""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path.removeprefix("/3")
+        requests.append(path)
+        tmdb_id = path.split("/")[2]
+
+        assert request.headers["Authorization"] == "Bearer token"
+        if tmdb_id in not_found:
+            return httpx.Response(404, json={"status_code": 34})
+        if path in rate_limited and requests.count(path) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0.05"})
+
+        if path.endswith("/credits"):
+            return httpx.Response(200, json={
+                "cast": [{"name": f"actor {i}", "order": 6 - i} for i in range(7)],
+                "crew": [{"name": "writer", "job": "Screenplay"}, {"name": f"director {tmdb_id}", "job": "Director"}]
+            })
+        if path.endswith("/keywords"):
+            return httpx.Response(200, json={"id": int(tmdb_id), "keywords": [{"id": 1, "name": "heist"}]})
+        return httpx.Response(200, json={
+            "id": int(tmdb_id),
+            "title": f"movie {tmdb_id}",
+            "original_language": "en",
+            "release_date": "" if tmdb_id == "13" else "1995-12-15",
+            "runtime": 170,
+            "overview": "a crew of thieves plans one last job",
+            "genres": [{"id": 80, "name": "Crime"}],
+            "budget": 60000000,
+            "revenue": 187436818,
+            "popularity": 42.5,
+            "vote_average": 7.9,
+            "vote_count": 6000
+        })
+
+    return handler
+
+
+def run_crawl(tmp_path, tmdb_ids, handler, **kwargs) -> dict:
+    return asyncio.run(crawl(
+        tmdb_ids,
+        output_path=str(tmp_path / "movies.jsonl"),
+        access_token="token",
+        max_rps=1000,
+        concurrency=4,
+        backoff=0.01,
+        base_url="https://tmdb.test/3",
+        transport=httpx.MockTransport(handler),
+        **kwargs
+    ))
+
+
+def test_crawl(tmp_path):
+    """unit test: crawl()"""
+
+    requests = []
+    handler = make_handler(requests, not_found={"12"}, rate_limited={"/movie/11/credits"})
+    summary = run_crawl(tmp_path, ["10", "11", "12", "13", "10"], handler)
+    counts = {key: summary[key] for key in ["skipped", "ok", "not_found", "invalid", "failed"]}
+    assert counts == {"skipped": 0, "ok": 2, "not_found": 1, "invalid": 1, "failed": 0}
+    assert requests.count("/movie/11/credits") == 2
+
+    with open(tmp_path / "movies.jsonl") as f:
+        movies = sorted([Movie(**json.loads(line)) for line in f], key=lambda x: x.tmdb_id)
+    assert [movie.tmdb_id for movie in movies] == ["10", "11"]
+    assert movies[0].director == "director 10"
+    assert movies[0].actors == ["actor 6", "actor 5", "actor 4", "actor 3", "actor 2"]
+    assert movies[0].keywords == ["heist"] and movies[0].genres == ["Crime"]
+    assert movies[0].tmdb_homepage == "https://www.themoviedb.org/movie/10"
+
+    with open(tmp_path / "movies.jsonl.checkpoint") as f:
+        checkpoint = sorted(json.loads(line)["tmdb_id"] for line in f)
+    assert checkpoint == ["12", "13"]
+
+
+def test_crawl_resume(tmp_path):
+    """unit test: crawl() skips completed IDs and repairs a partially written line"""
+
+    requests = []
+    run_crawl(tmp_path, ["10", "12"], make_handler(requests, not_found={"12"}))
+    with open(tmp_path / "movies.jsonl", "a") as f:
+        f.write('{"tmdb_id": "11", "tit')
+
+    requests.clear()
+    summary = run_crawl(tmp_path, ["10", "11", "12", "14"], make_handler(requests, not_found={"12"}))
+    assert summary["skipped"] == 2 and summary["ok"] == 2
+    assert sorted({path.split("/")[2] for path in requests}) == ["11", "14"]
+    assert load_completed(str(tmp_path / "movies.jsonl"), str(tmp_path / "movies.jsonl.checkpoint")) == {"10", "11", "12", "14"}
+
+
+def test_crawl_retries_exhausted(tmp_path):
+    """unit test: crawl() doesn't checkpoint movies which keep failing so the next run retries them"""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(503)
+
+    summary = run_crawl(tmp_path, ["10"], handler, max_retries=2)
+    assert summary["failed"] == 1
+    assert load_completed(str(tmp_path / "movies.jsonl"), str(tmp_path / "movies.jsonl.checkpoint")) == set()
+
+
+def test_rate_limiter():
+    """unit test: RateLimiter.acquire() / RateLimiter.pause()"""
+
+    async def acquire_all(n: int, pause: float = 0.0) -> float:
+        limiter = RateLimiter(rate=100)
+        limiter.pause(pause)
+        start = time.perf_counter()
+        await asyncio.gather(*[limiter.acquire() for _ in range(n)])
+        return time.perf_counter() - start
+
+    assert 0.18 <= asyncio.run(acquire_all(20)) < 0.5
+    assert asyncio.run(acquire_all(1, pause=0.1)) >= 0.1
@@ -0,0 +1,44 @@
+import time
+import asyncio
+
+from backend.app.deadlines import SEARCH_DEADLINE_MAX_MS, SEARCH_DEADLINE_MS, Deadline, run_with_deadline
+
+
+def test_deadline_from_ms():
+    """unit test: Deadline.from_ms()"""
+
+    assert Deadline.from_ms().seconds == SEARCH_DEADLINE_MS / 1000
+    assert Deadline.from_ms(500).seconds == 0.5
+    assert Deadline.from_ms(SEARCH_DEADLINE_MAX_MS * 2).seconds == SEARCH_DEADLINE_MAX_MS / 1000
+
+
+def test_deadline_share_reserve():
+    """unit test: Deadline.share() / Deadline.reserve()"""
+
+    deadline = Deadline(10)
+    assert 2.9 < deadline.share(0.3) <= 3.0
+    assert 8.9 < deadline.reserve(0.1) <= 9.0
+
+    expired = Deadline(0)
+    assert expired.remaining() == 0.0
+    assert expired.share(0.3) == 0.0
+    assert expired.reserve(0.1) == 0.0
+
+
+def test_run_with_deadline():
+    """unit test: run_with_deadline() returns the result if it's ready in time and the fallback otherwise"""
+
+    def slow(value, seconds):
+        time.sleep(seconds)
+        return value
+
+    async def main():
+        on_time = await run_with_deadline("test", 1.0, lambda: "fallback", slow, "result", seconds=0)
+        late = await run_with_deadline("test", 0.05, lambda: "fallback", slow, "result", seconds=0.5)
+        expired = await run_with_deadline("test", 0.0, lambda: "fallback", slow, "result", seconds=0)
+        return on_time, late, expired
+
+    on_time, late, expired = asyncio.run(main())
+    assert on_time == ("result", False)
+    assert late == ("fallback", True)
+    assert expired == ("fallback", True)
@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+
+from datetime import datetime
+from fastapi import Response
+
+from backend.app.database import ThreadedAsyncEngine
+from backend.app.etags import bump_ratings_version, check_not_modified, etag_matches, get_ratings_version, make_etag, tag_response
+
+
+@pytest.fixture()
+def etags_engine(migrated_engine):
+    """fixture to query a migrated DuckDB database for the ratings version counters from async code"""
+
+    return ThreadedAsyncEngine(migrated_engine)
+
+
+def test_make_etag():
+    """unit test: make_etag()"""
+
+    etag = make_etag("movie", "1", datetime(2024, 1, 1))
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == make_etag("movie", "1", datetime(2024, 1, 1))
+    assert etag != make_etag("movie", "1", datetime(2024, 1, 2))
+
+
+def test_etag_matches():
+    """unit test: etag_matches()"""
+
+    etag = make_etag("ratings", "1", 3)
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches(make_etag("ratings", "1", 2), etag)
+
+
+def test_check_not_modified():
+    """unit test: check_not_modified() / tag_response()"""
+
+    etag = make_etag("ratings", "1", 3)
+    not_modified = check_not_modified("ratings", etag, etag)
+    assert not_modified.status_code == 304
+    assert not_modified.body == b""
+    assert not_modified.headers["ETag"] == etag
+
+    assert check_not_modified("ratings", None, etag) is None
+    assert check_not_modified("ratings", make_etag("ratings", "1", 2), etag) is None
+
+    response = Response()
+    tag_response(response, etag)
+    assert response.headers["ETag"] == etag
+
+
+def test_ratings_version(etags_engine):
+    """unit test: get_ratings_version() / bump_ratings_version()"""
+
+    async def main():
+        versions = []
+        async with etags_engine.begin() as cnx:
+            versions.append(await get_ratings_version(cnx, user_id="1"))
+        for _ in range(2):
+            async with etags_engine.begin() as cnx:
+                await bump_ratings_version(cnx, user_id="1")
+            async with etags_engine.begin() as cnx:
+                versions.append(await get_ratings_version(cnx, user_id="1"))
+        async with etags_engine.begin() as cnx:
+            versions.append(await get_ratings_version(cnx, user_id="2"))
+
+        # a bump rolls back along with the ratings written in its transaction
+        try:
+            async with etags_engine.begin() as cnx:
+                await bump_ratings_version(cnx, user_id="1")
+                raise RuntimeError("ratings write failed")
+        except RuntimeError:
+            pass
+        async with etags_engine.begin() as cnx:
+            versions.append(await get_ratings_version(cnx, user_id="1"))
+        return versions
+
+    assert asyncio.run(main()) == [0, 1, 2, 0, 2]
@@ -0,0 +1,99 @@
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from backend.app.memory import MemoryTracker, deep_sizeof, estimate_hnsw_bytes, sizeof_nbytes
+
+
+class FakeCollection:
+    """minimal stand-in for a Chroma collection"""
+
+    def __init__(self, count: int, dim: int, metadata: dict = None) -> None:
+        self._count = count
+        self.dim = dim
+        self.metadata = metadata
+
+    def count(self) -> int:
+        return self._count
+
+    def peek(self, limit: int = 10) -> dict:
+        return {"embeddings": [[0.0] * self.dim] * min(limit, self._count)}
+
+
+def test_deep_sizeof():
+    """unit test: deep_sizeof()"""
+
+    matrix = np.zeros((1000, 100))
+    assert deep_sizeof(matrix) >= matrix.nbytes
+    assert deep_sizeof(matrix[:10]) >= matrix.nbytes
+    assert deep_sizeof({"a": matrix, "b": [matrix, matrix]}) < 2 * matrix.nbytes
+
+    frame = pd.DataFrame(matrix, index=[str(i) for i in range(1000)])
+    assert deep_sizeof(frame) >= matrix.nbytes
+
+    # objects already seen by an earlier component aren't counted again
+    seen = set()
+    deep_sizeof(matrix, seen)
+    assert deep_sizeof([matrix], seen) < matrix.nbytes
+
+    # functions and modules are never followed
+    assert deep_sizeof(lambda: matrix) == 0
+    assert deep_sizeof([np]) < 1000
+
+
+def test_deep_sizeof_memmap(tmp_path):
+    """unit test: deep_sizeof() doesn't count the pages of memory-mapped arrays"""
+
+    path = str(tmp_path / "matrix.npy")
+    np.save(path, np.zeros((1000, 100)))
+    assert deep_sizeof(np.load(path, mmap_mode="r")) < 10000
+
+
+def test_estimate_hnsw_bytes():
+    """unit test: estimate_hnsw_bytes()"""
+
+    assert estimate_hnsw_bytes(FakeCollection(count=0, dim=8)) == 0
+    assert estimate_hnsw_bytes(FakeCollection(count=100, dim=8)) == 100 * (4 * 8 + 4 * 32 + 12)
+    assert estimate_hnsw_bytes(FakeCollection(count=100, dim=8, metadata={"hnsw:M": 8})) == 100 * (4 * 8 + 4 * 16 + 12)
+
+
+def test_memory_tracker():
+    """unit test: MemoryTracker.snapshot()"""
+
+    components = {"matrix": np.zeros((1000, 100)), "cache": []}
+    tracker = MemoryTracker(tracemalloc_frames=0)
+    tracker.register("matrix", lambda: components["matrix"])
+    tracker.register("shared", lambda: [components["matrix"]])
+    tracker.register("cache", lambda: components["cache"])
+    tracker.register("index", lambda: None, sizer=sizeof_nbytes)
+
+    first = tracker.snapshot()
+    assert first.components["matrix"] >= 800000
+    assert first.components["shared"] < 1000
+    assert first.components["index"] == 0
+    assert first.rss_bytes > 0
+    assert first.rss_growth_bytes is None and first.component_growth_bytes == {}
+
+    components["cache"].extend(np.ones(100) for _ in range(10))
+    second = tracker.snapshot()
+    assert second.component_growth_bytes["cache"] >= 8000
+    assert second.component_growth_bytes["matrix"] == 0
+    assert second.rss_growth_bytes is not None
+    assert second.attributed_bytes == sum(second.components.values())
+
+
+def test_memory_tracker_allocations():
+    """unit test: MemoryTracker.snapshot() reports the fastest-growing allocation sites when tracing"""
+
+    tracker = MemoryTracker(tracemalloc_frames=1, top_allocations=5)
+    tracker.start()
+    try:
+        tracker.snapshot()
+        leak = [bytearray(1000) for _ in range(1000)]
+        snapshot = tracker.snapshot()
+        assert len(snapshot.allocations) <= 5
+        assert "test_memory.py" in snapshot.allocations[0].location
+        assert snapshot.allocations[0].growth_bytes >= 1000 * 1000
+        assert len(leak) == 1000
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,57 @@
+import pytest
+
+from datetime import datetime
+from sqlalchemy import insert, text
+from sqlalchemy.exc import DatabaseError
+
+from backend.app import database
+from backend.app.migrations import MIGRATIONS, get_applied_versions, migrate
+
+
+def test_migrate(duckdb_engine):
+    """unit test: migrate()"""
+
+    assert migrate(duckdb_engine) == [migration.version for migration in MIGRATIONS]
+    assert get_applied_versions(duckdb_engine) == [migration.version for migration in MIGRATIONS]
+    assert migrate(duckdb_engine) == []
+
+    with duckdb_engine.begin() as cnx:
+        indexes = set(cnx.execute(text("SELECT index_name FROM duckdb_indexes()")).scalars().all())
+    assert {"ix_users_email", "ix_ratings_user_id"} <= indexes
+
+
+def test_migrate_target(duckdb_engine):
+    """unit test: migrate(target=...)"""
+
+    assert migrate(duckdb_engine, target=1) == [1]
+    assert migrate(duckdb_engine) == [migration.version for migration in MIGRATIONS if migration.version > 1]
+
+
+def test_users_email_unique(duckdb_engine):
+    """unit test: the [users.email] index rejects duplicate emails"""
+
+    migrate(duckdb_engine)
+    user = {"email": "test@test.com", "hashed_password": "test", "fname": "test", "lname": "test", "updated_at": datetime.now()}
+    with duckdb_engine.begin() as cnx:
+        cnx.execute(insert(database.users).values(user_id="1", **user))
+
+    with pytest.raises(DatabaseError):
+        with duckdb_engine.begin() as cnx:
+            cnx.execute(insert(database.users).values(user_id="2", **user))
+
+
+def test_ratings_versions_backfill(duckdb_engine):
+    """unit test: the [ratings_versions] migration backfills a version for every user with ratings"""
+
+    migrate(duckdb_engine, target=6)
+    with duckdb_engine.begin() as cnx:
+        cnx.execute(insert(database.ratings), [
+            {"user_id": "1", "tmdb_id": "1", "rating": 4.0, "updated_at": datetime(2024, 1, 1)},
+            {"user_id": "1", "tmdb_id": "2", "rating": 3.0, "updated_at": datetime(2024, 1, 2)},
+            {"user_id": "2", "tmdb_id": "1", "rating": 5.0, "updated_at": datetime(2024, 1, 3)}
+        ])
+
+    assert migrate(duckdb_engine) == [7]
+    with duckdb_engine.begin() as cnx:
+        rows = cnx.execute(text("SELECT user_id, version, updated_at FROM ratings_versions ORDER BY user_id")).all()
+    assert [tuple(row) for row in rows] == [("1", 1, datetime(2024, 1, 2)), ("2", 1, datetime(2024, 1, 3))]
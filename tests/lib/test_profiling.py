@@ -0,0 +1,75 @@
+import time
+import threading
+
+from backend.app import profiling
+from backend.app.profiling import Profiler, attach_thread
+
+
+def busy_work(seconds: float) -> None:
+    """spin the CPU for a fixed amount of time"""
+
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def run_request(profiler: Profiler, seconds: float, forced: bool = False):
+    """simulate a request whose work is executed on a separate worker thread"""
+
+    request = profiler.begin("GET", "/test/", forced=forced)
+    worker = threading.Thread(target=lambda: (attach_thread(request), busy_work(seconds)))
+    worker.start()
+    worker.join()
+    return profiler.end(request)
+
+
+def test_forced_profile():
+    """unit test: Profiler.begin(forced=True) / Profiler.end()"""
+
+    profiler = Profiler(threshold_ms=0, interval_ms=1, buffer_size=2)
+    profile = run_request(profiler, seconds=0.2, forced=True)
+
+    assert profile is not None
+    assert profile.trigger == "header"
+    assert profile.samples > 0
+    assert "busy_work" in profile.folded()
+    assert profiler.get_profile(profile.profile_id) is profile
+
+
+def test_threshold_profile():
+    """unit test: Profiler only samples requests that run past the threshold"""
+
+    profiler = Profiler(threshold_ms=100, interval_ms=1, buffer_size=2)
+    assert run_request(profiler, seconds=0.01) is None
+
+    profile = run_request(profiler, seconds=0.5)
+    assert profile is not None
+    assert profile.trigger == "threshold"
+    assert "busy_work" in profile.folded()
+
+
+def test_ring_buffer():
+    """unit test: Profiler keeps only the most recent profiles"""
+
+    profiler = Profiler(threshold_ms=0, interval_ms=1, buffer_size=2)
+    profiles = [run_request(profiler, seconds=0.05, forced=True) for _ in range(3)]
+    assert list(profiler.profiles) == profiles[1:]
+
+
+def test_sampler_survives_errors(monkeypatch):
+    """unit test: Profiler keeps sampling after a failed sample"""
+
+    fold_stack = profiling.fold_stack
+    failures = []
+
+    def flaky_fold_stack(frame) -> str:
+        if not failures:
+            failures.append(frame)
+            raise RuntimeError("boom")
+        return fold_stack(frame)
+
+    monkeypatch.setattr(profiling, "fold_stack", flaky_fold_stack)
+    profiler = Profiler(threshold_ms=0, interval_ms=1, buffer_size=2)
+    profile = run_request(profiler, seconds=0.2, forced=True)
+    assert failures
+    assert profile is not None and "busy_work" in profile.folded()
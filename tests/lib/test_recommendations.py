@@ -0,0 +1,122 @@
+import pytest
+import pandas as pd
+
+from datetime import datetime, timedelta
+from sqlalchemy import insert, update
+
+from backend.app import database
+from backend.app.recommendations import RecommendationsRefresher, get_materialized_recs, get_stale_users
+
+
+@pytest.fixture()
+def recs_engine(migrated_engine):
+    """fixture to create a migrated DuckDB database with a few users' ratings"""
+
+    updated_at = datetime.now() - timedelta(hours=1)
+    with migrated_engine.begin() as cnx:
+        cnx.execute(insert(database.ratings), [
+            {"user_id": "1", "tmdb_id": "100", "rating": 5.0, "updated_at": updated_at},
+            {"user_id": "1", "tmdb_id": "101", "rating": 4.0, "updated_at": updated_at},
+            {"user_id": "2", "tmdb_id": "100", "rating": 2.0, "updated_at": updated_at},
+        ])
+
+    return migrated_engine
+
+
+def score_fn(user_id: str, k: int) -> pd.Series:
+    """deterministic stand-in for the collaborative filtering scores"""
+
+    return pd.Series({f"{user_id}0{i}": 1 / (i + 1) for i in range(k)}).sort_index()
+
+
+def test_refresh(recs_engine):
+    """unit test: RecommendationsRefresher.refresh()"""
+
+    calls = []
+    refresher = RecommendationsRefresher(recs_engine, score_fn=lambda user_id, k: calls.append(user_id) or score_fn(user_id, k), top_n=3, batch_size=1)
+    assert refresher.refresh() == 2
+    assert sorted(calls) == ["1", "2"]
+
+    with recs_engine.begin() as cnx:
+        materialized = get_materialized_recs(cnx, user_id="1")
+        assert materialized.scores.index.tolist() == ["100", "101", "102"]
+        assert materialized.scores.is_monotonic_decreasing
+        assert not materialized.stale
+        assert get_stale_users(cnx, since=None, limit=10) == []
+        assert get_materialized_recs(cnx, user_id="3") is None
+
+    # nothing to do until a user's ratings change
+    assert refresher.refresh() == 0
+
+
+def test_refresh_changed_ratings(recs_engine):
+    """unit test: RecommendationsRefresher.refresh() only recomputes users whose ratings changed"""
+
+    refresher = RecommendationsRefresher(recs_engine, score_fn=score_fn, top_n=3)
+    refresher.refresh()
+
+    with recs_engine.begin() as cnx:
+        cnx.execute(update(database.ratings).where(database.ratings.c.user_id == "2").values(rating=4.5, updated_at=datetime.now()))
+        materialized = get_materialized_recs(cnx, user_id="2")
+        assert materialized.stale
+        assert [user_id for user_id, _ in get_stale_users(cnx, since=refresher.watermark, limit=10)] == ["2"]
+
+    # a fresh refresher resumes from the newest materialized change rather than rescanning every user
+    calls = []
+    refresher = RecommendationsRefresher(recs_engine, score_fn=lambda user_id, k: calls.append(user_id) or score_fn(user_id, k), top_n=3)
+    assert refresher.refresh() == 1
+    assert calls == ["2"]
+
+    with recs_engine.begin() as cnx:
+        assert not get_materialized_recs(cnx, user_id="2").stale
+
+
+def test_refresh_failures(recs_engine):
+    """unit test: RecommendationsRefresher.refresh() leaves users whose scoring failed stale"""
+
+    def failing_score_fn(user_id, k):
+        if user_id == "1":
+            raise ValueError("boom")
+        return score_fn(user_id, k)
+
+    refresher = RecommendationsRefresher(recs_engine, score_fn=failing_score_fn, top_n=3)
+    assert refresher.refresh() == 1
+
+    with recs_engine.begin() as cnx:
+        assert [user_id for user_id, _ in get_stale_users(cnx, since=None, limit=10)] == ["1"]
+
+
+def test_refresh_aged(recs_engine):
+    """unit test: RecommendationsRefresher.refresh() recomputes users whose recommendations aged out or predate the model version"""
+
+    model_created_at = None
+    calls = []
+    refresher = RecommendationsRefresher(
+        recs_engine,
+        score_fn=lambda user_id, k: calls.append(user_id) or score_fn(user_id, k),
+        model_created_at=lambda: model_created_at,
+        top_n=3,
+        max_age=3600
+    )
+    assert refresher.refresh() == 2
+
+    # user 1's recommendations age out without any new ratings
+    with recs_engine.begin() as cnx:
+        recs = database.user_recommendations
+        cnx.execute(update(recs).where(recs.c.user_id == "1").values(computed_at=datetime.now() - timedelta(hours=2)))
+        assert get_materialized_recs(cnx, user_id="1").computed_at < datetime.now() - timedelta(hours=1)
+    calls.clear()
+    assert refresher.refresh() == 1
+    assert calls == ["1"]
+
+    # publishing a new model version makes every user's recommendations stale
+    model_created_at = datetime.now()
+    calls.clear()
+    assert refresher.refresh() == 2
+    assert sorted(calls) == ["1", "2"]
+
+    with recs_engine.begin() as cnx:
+        materialized = get_materialized_recs(cnx, user_id="1")
+        assert not materialized.predates(model_created_at)
+        assert materialized.predates(datetime.now())
+    assert refresher.refresh() == 0
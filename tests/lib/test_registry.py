@@ -0,0 +1,69 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.app.registry import ModelRegistry, ModelSnapshot, get_current_version, load_snapshot, publish_snapshot
+from backend.app.vectors import build_index
+
+
+def make_embeddings(n_movies: int, seed: int = 42) -> pd.DataFrame:
+    """random collab embeddings indexed by [tmdb_id]"""
+
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.normal(size=(n_movies, 8)).astype(np.float32), index=[str(i) for i in range(n_movies)])
+
+
+def test_publish_load(tmp_path):
+    """unit test: publish_snapshot() / load_snapshot()"""
+
+    registry_path = str(tmp_path / "registry")
+    index_path = str(tmp_path / "content-index")
+    build_index(index_path, ids=["1", "2"], embeddings=np.eye(2, 4), documents=["a", "b"], metadatas=[{}, {}])
+
+    collab_embeddings = make_embeddings(10)
+    publish_snapshot(registry_path, "v1", collab_embeddings, content_index_path=index_path, catalog_stats={"popularity_max": 100.0})
+    assert get_current_version(registry_path) == "v1"
+
+    snapshot = load_snapshot(registry_path, "v1")
+    pd.testing.assert_frame_equal(snapshot.collab_embeddings, collab_embeddings)
+    assert len(snapshot.content_index) == 2
+    assert snapshot.catalog_stats == {"popularity_max": 100.0}
+
+    with pytest.raises(ValueError):
+        publish_snapshot(registry_path, "v1", collab_embeddings)
+    assert sorted(os.listdir(registry_path)) == ["CURRENT", "v1"]
+
+
+def test_registry_swap(tmp_path):
+    """unit test: ModelRegistry.check() swaps in new versions while callers keep the snapshot they already hold"""
+
+    registry_path = str(tmp_path / "registry")
+    registry = ModelRegistry(path=registry_path, fallback=lambda: ModelSnapshot(version="initial", collab_embeddings=make_embeddings(5)))
+
+    # nothing published yet so the fallback snapshot is used
+    in_flight = registry.get()
+    assert in_flight.version == "initial"
+    assert not registry.check()
+
+    publish_snapshot(registry_path, "v1", make_embeddings(10, seed=1))
+    assert registry.check()
+    assert registry.get().version == "v1"
+    assert len(registry.get().collab_embeddings) == 10
+    assert in_flight.version == "initial" and len(in_flight.collab_embeddings) == 5
+    assert not registry.check()
+
+    publish_snapshot(registry_path, "v2", make_embeddings(20, seed=2))
+    assert registry.check()
+    assert registry.get().version == "v2"
+    assert registry.get().load_seconds >= 0
+
+
+def test_registry_start(tmp_path):
+    """unit test: ModelRegistry.get() loads the current published version on first use"""
+
+    registry_path = str(tmp_path / "registry")
+    publish_snapshot(registry_path, "v1", make_embeddings(10))
+
+    registry = ModelRegistry(path=registry_path, fallback=lambda: pytest.fail("fallback should not be loaded"))
+    assert registry.get().version == "v1"
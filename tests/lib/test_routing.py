@@ -0,0 +1,72 @@
+import time
+import asyncio
+import pytest
+
+from datetime import datetime
+from sqlalchemy import insert, select
+
+from backend.app import database
+from backend.app.database import get_async_engine
+from backend.app.migrations import migrate
+from backend.app.routing import EngineRouter
+
+
+@pytest.fixture()
+def engine_router(tmp_path):
+    """fixture to route between separate primary and replica DuckDB databases with a short read-your-writes window"""
+
+    primary = get_async_engine(database_url=f"duckdb:///{tmp_path / 'primary.duckdb'}")
+    replica = get_async_engine(database_url=f"duckdb:///{tmp_path / 'replica.duckdb'}")
+    migrate(primary.sync_engine)
+    migrate(replica.sync_engine)
+
+    yield EngineRouter(primary=primary, replica=replica, window=0.2)
+    asyncio.run(primary.dispose())
+    asyncio.run(replica.dispose())
+
+
+async def add_rating(engine_router: EngineRouter, user_id: str) -> None:
+    async with engine_router.writer(user_id).begin() as cnx:
+        await cnx.execute(insert(database.ratings).values(user_id=user_id, tmdb_id="1", rating=4.0, updated_at=datetime.now()))
+
+
+async def count_ratings(engine_router: EngineRouter, user_id: str) -> int:
+    async with engine_router.reader(user_id).begin() as cnx:
+        return len((await cnx.execute(select(database.ratings).where(database.ratings.c.user_id == user_id))).all())
+
+
+def test_read_your_writes(engine_router):
+    """unit test: EngineRouter.reader() sends a user's reads to the primary only within the window after they write"""
+
+    assert engine_router.reader("1") is engine_router.replica
+    asyncio.run(add_rating(engine_router, user_id="1"))
+
+    # the writer sees their rating straight away while other users' reads stay on the (not yet replicated) replica
+    assert asyncio.run(count_ratings(engine_router, user_id="1")) == 1
+    assert engine_router.reader("2") is engine_router.replica
+    assert engine_router.reader() is engine_router.replica
+
+    time.sleep(0.25)
+    assert engine_router.reader("1") is engine_router.replica
+    assert asyncio.run(count_ratings(engine_router, user_id="1")) == 0
+
+
+def test_without_replica(tmp_path):
+    """unit test: EngineRouter sends everything to the primary when no replica is configured"""
+
+    primary = get_async_engine(database_url=f"duckdb:///{tmp_path / 'primary.duckdb'}")
+    engine_router = EngineRouter(primary=primary)
+    assert engine_router.writer("1") is primary
+    assert engine_router.reader("1") is primary
+    assert engine_router._writes == {}
+
+
+def test_max_users():
+    """unit test: EngineRouter.writer() bounds the number of users tracked"""
+
+    engine_router = EngineRouter(primary="primary", replica="replica", window=60, max_users=2)
+    for user_id in ["1", "2", "3"]:
+        engine_router.writer(user_id)
+    assert list(engine_router._writes) == ["2", "3"]
+    assert engine_router.reader("1") == "replica"
+    assert engine_router.reader("3") == "primary"
@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+
+from concurrent.futures.process import BrokenProcessPool
+from backend.app.security import PasswordPool, PasswordPoolFull
+
+
+@pytest.fixture(scope="module")
+def password_pool():
+    """password pool with a single worker and a low bcrypt cost factor for testing"""
+
+    password_pool = PasswordPool(workers=1, max_pending=2, rounds=4)
+    yield password_pool
+    password_pool.shutdown()
+
+
+def test_hash_verify(password_pool):
+    """unit test: PasswordPool.hash() / PasswordPool.verify()"""
+
+    hashed_password = password_pool.hash("testpassword")
+    assert hashed_password.startswith("$2b$04$")
+    assert password_pool.verify("testpassword", hashed_password)
+    assert not password_pool.verify("wrongpassword", hashed_password)
+
+
+def test_pool_full():
+    """unit test: PasswordPool.submit() fails fast when the queue is full"""
+
+    password_pool = PasswordPool(workers=1, max_pending=0, rounds=4)
+    with pytest.raises(PasswordPoolFull):
+        password_pool.hash("testpassword")
+    assert password_pool.pending == 0
+
+
+def test_ahash_averify(password_pool):
+    """unit test: PasswordPool.ahash() / PasswordPool.averify()"""
+
+    async def main():
+        hashed_password = await password_pool.ahash("testpassword")
+        return hashed_password, await password_pool.averify("testpassword", hashed_password)
+
+    hashed_password, verified = asyncio.run(main())
+    assert hashed_password.startswith("$2b$04$")
+    assert verified
+
+
+def test_broken_pool():
+    """unit test: PasswordPool.submit() shuts down and replaces a broken pool"""
+
+    class BrokenExecutor:
+        shut_down = False
+
+        def submit(self, fn, *args):
+            raise BrokenProcessPool("a worker process terminated abruptly")
+
+        def shutdown(self, wait: bool = True) -> None:
+            self.shut_down = True
+
+    password_pool = PasswordPool(workers=1, max_pending=2, rounds=4)
+    broken = password_pool._executor = BrokenExecutor()
+    try:
+        assert password_pool.hash("testpassword").startswith("$2b$04$")
+        assert broken.shut_down
+    finally:
+        password_pool.shutdown()
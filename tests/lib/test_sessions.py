@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+
+from llama_index.llms import ChatMessage, MessageRole
+
+from backend.app.database import ThreadedAsyncEngine
+from backend.app.sessions import SessionConflict, append_turn, create_session, delete_session, get_recent_messages, get_session
+
+
+@pytest.fixture()
+def sessions_engine(migrated_engine):
+    """fixture to query a migrated DuckDB database for conversation sessions from async code"""
+
+    return ThreadedAsyncEngine(migrated_engine)
+
+
+def make_turn(message: str) -> list:
+    return [ChatMessage(role=MessageRole.USER, content=message), ChatMessage(role=MessageRole.ASSISTANT, content=f"results for {message}")]
+
+
+def test_session_turns(sessions_engine):
+    """unit test: create_session() / append_turn() / get_session() / get_recent_messages()"""
+
+    async def main():
+        async with sessions_engine.begin() as cnx:
+            session = await create_session(cnx, user_id="1")
+        for i, message in enumerate(["heist movies", "set in europe", "from the 90s"]):
+            async with sessions_engine.begin() as cnx:
+                session = await get_session(cnx, session_id=session.session_id)
+                assert session.turns == i
+                await append_turn(cnx, session=session, messages=make_turn(message), standalone_query=f"query {i}")
+        async with sessions_engine.begin() as cnx:
+            session = await get_session(cnx, session_id=session.session_id, include_messages=True)
+            return session, await get_recent_messages(cnx, session_id=session.session_id, limit=2)
+
+    session, recent_messages = asyncio.run(main())
+    assert session.user_id == "1"
+    assert session.turns == 3
+    assert session.standalone_query == "query 2"
+    assert [message.content for message in session.chat_messages[::2]] == ["heist movies", "set in europe", "from the 90s"]
+    assert recent_messages == make_turn("from the 90s")
+
+
+def test_session_conflict(sessions_engine):
+    """unit test: append_turn() rejects a turn based on an outdated copy of the session"""
+
+    async def main():
+        async with sessions_engine.begin() as cnx:
+            session = await create_session(cnx)
+            await append_turn(cnx, session=session, messages=make_turn("heist movies"), standalone_query="heist movies")
+        async with sessions_engine.begin() as cnx:
+            await append_turn(cnx, session=session, messages=make_turn("set in europe"), standalone_query="heist movies set in europe")
+
+    with pytest.raises(SessionConflict):
+        asyncio.run(main())
+
+
+def test_delete_session(sessions_engine):
+    """unit test: delete_session()"""
+
+    async def main():
+        async with sessions_engine.begin() as cnx:
+            session = await create_session(cnx)
+            await append_turn(cnx, session=session, messages=make_turn("heist movies"), standalone_query="heist movies")
+            await delete_session(cnx, session_id=session.session_id)
+            return await get_session(cnx, session_id=session.session_id), await get_recent_messages(cnx, session_id=session.session_id)
+
+    assert asyncio.run(main()) == (None, [])
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from concurrent.futures.process import BrokenProcessPool
+from backend.app.sharding import ShardedScorer, rank_movies
+
+
+class BrokenExecutor:
+    """stand-in for a process pool whose worker died"""
+
+    def __init__(self) -> None:
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        raise BrokenProcessPool("a worker process terminated abruptly")
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.shut_down = True
+
+
+def make_embeddings(n_movies: int, dtype=np.float32, seed: int = 42) -> pd.DataFrame:
+    """random collab embeddings indexed by (shuffled) [tmdb_id]"""
+
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.standard_normal((n_movies, 16)).astype(dtype), index=[str(i) for i in rng.permutation(n_movies)])
+
+
+@pytest.fixture(scope="module")
+def scorer():
+    """sharded scorer with a small block size so small catalogs span several blocks"""
+
+    scorer = ShardedScorer(shards=3, min_movies=0, block_rows=64)
+    yield scorer
+    scorer.shutdown()
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_rank_matches_single_process(scorer, dtype):
+    """unit test: ShardedScorer.rank() returns exactly the same scores as rank_movies()"""
+
+    embeddings = make_embeddings(1000, dtype=dtype)
+    liked_movies = embeddings.index[:5].to_list()
+    unrated_movies = embeddings.index.difference(embeddings.index[:25])
+
+    expected = rank_movies(embeddings, liked_movies, unrated_movies, k=10, block_rows=64)
+    sharded = scorer.rank(embeddings, liked_movies, unrated_movies, k=10)
+    pd.testing.assert_series_equal(sharded, expected, check_exact=True)
+    assert len(sharded) == 10
+    assert not sharded.index.isin(embeddings.index[:25]).any()
+
+
+def test_rank_ties(scorer):
+    """unit test: ShardedScorer.rank() breaks ties across shards by [tmdb_id] like rank_movies()"""
+
+    embeddings = make_embeddings(400)
+    embeddings.iloc[100:400] = embeddings.iloc[0].values
+    liked_movies = embeddings.index[:1].to_list()
+    unrated_movies = embeddings.index.difference(liked_movies)
+
+    expected = rank_movies(embeddings, liked_movies, unrated_movies, k=10, block_rows=64)
+    sharded = scorer.rank(embeddings, liked_movies, unrated_movies, k=10)
+    pd.testing.assert_series_equal(sharded, expected, check_exact=True)
+    assert sharded.index.to_list() == sorted(embeddings.index[100:400])[:10]
+
+
+def test_score_single_process():
+    """unit test: ShardedScorer.score() scores small catalogs in process without starting the pool"""
+
+    embeddings = make_embeddings(100)
+    scorer = ShardedScorer(shards=4, min_movies=1000)
+    scores = scorer.score(embeddings, embeddings.index[:3].to_list(), embeddings.index[3:], k=5)
+    assert len(scores) == 5
+    assert scorer._executor is None
+
+
+def test_rank_broken_pool():
+    """unit test: ShardedScorer.rank() shuts down and replaces a broken pool"""
+
+    embeddings = make_embeddings(200)
+    scorer = ShardedScorer(shards=2, min_movies=0, block_rows=64)
+    broken = BrokenExecutor()
+    scorer._executor = broken
+    try:
+        sharded = scorer.rank(embeddings, embeddings.index[:3].to_list(), embeddings.index[3:], k=5)
+        assert len(sharded) == 5
+        assert broken.shut_down
+        assert scorer._executor is not None and scorer._executor is not broken
+    finally:
+        scorer.shutdown()
+
+
+def test_publish_unique_paths(tmp_path):
+    """unit test: ShardedScorer._publish() never reuses the path of an earlier snapshot"""
+
+    scorer = ShardedScorer(shards=2, min_movies=0, path=str(tmp_path))
+    try:
+        paths = []
+        for i in range(20):
+            embeddings = make_embeddings(10, seed=i)
+            paths.append(scorer._publish(embeddings))
+            assert scorer._publish(embeddings) == paths[-1]
+        assert len(set(paths)) == len(paths)
+        assert sorted(p.name for p in tmp_path.iterdir()) == sorted(path.split("/")[-1] for path in paths[-2:])
+    finally:
+        scorer.shutdown()
@@ -0,0 +1,65 @@
+import logging
+import json
+import asyncio
+
+from sqlalchemy import text
+
+from backend.app.database import ThreadedAsyncEngine, get_test_engine
+from backend.app.telemetry import JsonFormatter, request_timings, server_timing_header, stage, timed_abegin
+
+
+def test_stage():
+    """unit test: stage()"""
+
+    timings = []
+    token = request_timings.set(timings)
+    try:
+        with stage("test_stage"):
+            pass
+        with stage("test_stage"):
+            pass
+    finally:
+        request_timings.reset(token)
+
+    assert [name for name, _ in timings] == ["test_stage", "test_stage"]
+    assert all(elapsed >= 0 for _, elapsed in timings)
+
+
+def test_server_timing_header():
+    """unit test: server_timing_header()"""
+
+    timings = [("db_pool_wait", 0.001), ("get_movies", 0.010), ("db_pool_wait", 0.002)]
+    assert server_timing_header(timings) == "db_pool_wait;dur=3.0, get_movies;dur=10.0"
+
+
+def test_json_formatter():
+    """unit test: JsonFormatter.format()"""
+
+    record = logging.LogRecord("backend.app.lib", logging.INFO, __file__, 1, "search completed", None, None)
+    record.user_id = "1"
+    payload = json.loads(JsonFormatter().format(record))
+    assert payload["message"] == "search completed"
+    assert payload["severity"] == "INFO"
+    assert payload["user_id"] == "1"
+
+
+def test_timed_abegin(tmp_path):
+    """unit test: timed_abegin()"""
+
+    async_engine = ThreadedAsyncEngine(get_test_engine(path=str(tmp_path / "telemetry.duckdb")))
+
+    async def main():
+        async with timed_abegin(async_engine) as cnx:
+            await cnx.execute(text("CREATE TABLE test (value INTEGER)"))
+            await cnx.execute(text("INSERT INTO test VALUES (1), (2)"))
+        async with async_engine.begin() as cnx:
+            return (await cnx.execute(text("SELECT SUM(value) FROM test"))).scalar()
+
+    timings = []
+    token = request_timings.set(timings)
+    try:
+        assert asyncio.run(main()) == 3
+    finally:
+        request_timings.reset(token)
+
+    assert [name for name, _ in timings] == ["db_pool_wait"]
@@ -0,0 +1,96 @@
+from llama_index.llms import ChatMessage, MessageRole
+from llama_index.schema import NodeWithScore, TextNode
+
+from backend.app.tokenizer import count_message_tokens, count_tokens, fit_context, fit_messages, format_movie_context, truncate_text
+
+
+def count_words(text: str) -> int:
+    """deterministic stand-in for the tiktoken token count"""
+
+    return len(text.split())
+
+
+def make_node(title: str, score: float, overview: str = "a crew of thieves plans one last job " * 20) -> NodeWithScore:
+    """retrieved movie node with the same metadata fields as the [movies-content] collection"""
+
+    metadata = {
+        "title": title,
+        "tmdb_id": "1",
+        "genres": "Crime, Drama, Thriller",
+        "actors": "Al Pacino, Robert De Niro, Val Kilmer, Jon Voight, Tom Sizemore, Ashley Judd",
+        "director": "Michael Mann",
+        "popularity": 42.0,
+        "keywords": ""
+    }
+    return NodeWithScore(node=TextNode(text=overview, metadata=metadata), score=score)
+
+
+def test_count_tokens():
+    """unit test: count_tokens()"""
+
+    assert count_tokens("") == 0
+    assert 0 < count_tokens("heist movies set in europe") < count_tokens("heist movies set in europe " * 10)
+
+
+def test_fit_messages():
+    """unit test: fit_messages()"""
+
+    messages = [
+        ChatMessage(role=MessageRole.USER, content="heist movies"),
+        ChatMessage(role=MessageRole.ASSISTANT, content="here are the top results for heist movies"),
+        ChatMessage(role=MessageRole.USER, content="set in europe"),
+    ]
+    assert count_message_tokens(messages[0], count=count_words) == 3
+
+    assert fit_messages(messages, budget=100, count=count_words) == messages
+    assert fit_messages(messages, budget=4, count=count_words) == messages[-1:]
+    assert fit_messages(messages, budget=2, count=count_words) == []
+    assert fit_messages([], budget=10, count=count_words) == []
+
+
+def test_truncate_text():
+    """unit test: truncate_text()"""
+
+    text = "heist movies set in europe " * 100
+    assert truncate_text(None, budget=10) is None
+    assert truncate_text("heist movies", budget=10) == "heist movies"
+    assert count_tokens(truncate_text(text, budget=10)) <= 10
+    assert text.startswith(truncate_text(text, budget=10))
+
+
+def test_format_movie_context():
+    """unit test: format_movie_context()"""
+
+    context = format_movie_context(make_node("Heat", 0.9), fields=["title", "director", "actors", "keywords"], overview_tokens=10, max_field_items=2)
+    lines = context.split("\n")
+    assert lines[:3] == ["title: Heat", "director: Michael Mann", "actors: Al Pacino, Robert De Niro"]
+    assert lines[3].startswith("plot overview: a crew of thieves") and count_tokens(lines[3]) < 20
+    assert len(lines) == 4
+
+    context = format_movie_context(make_node("Heat", 0.9), fields=["title"], overview_tokens=0, max_field_items=2)
+    assert context == "title: Heat"
+
+
+def test_fit_context():
+    """unit test: fit_context()"""
+
+    nodes = [make_node("Heat", 0.8), make_node("Ronin", 0.9), make_node("Thief", 0.7)]
+    fields = ["title", "genres", "director"]
+
+    # best-scoring movies first, capped at [max_movies]
+    context = fit_context(nodes, budget=1000, fields=fields, max_movies=2, overview_tokens=20, count=count_words)
+    blocks = context.split("\n\n")
+    assert [block.split("\n")[0] for block in blocks] == ["title: Ronin", "title: Heat"]
+    assert all("plot overview" in block for block in blocks)
+
+    # movies whose overview doesn't fit are added without it and the context never exceeds the budget
+    for budget in [0, 5, 12, 20, 40, 60]:
+        context = fit_context(nodes, budget=budget, fields=fields, max_movies=3, overview_tokens=20, count=count_words)
+        assert count_words(context) <= budget
+    context = fit_context(nodes, budget=50, fields=fields, max_movies=3, overview_tokens=20, count=count_words)
+    assert context.count("title:") == 3 and "plot overview" in context.split("\n\n")[0] and "plot overview" not in context.split("\n\n")[-1]
+    assert fit_context(nodes, budget=2, fields=fields, max_movies=3, overview_tokens=20, count=count_words) == ""
+
+    # much smaller than the full llama-index rendering of every node
+    full_context = "\n\n".join(node.node.get_content(metadata_mode="llm") for node in nodes)
+    assert count_tokens(fit_context(nodes, budget=200, fields=fields, max_movies=3, overview_tokens=20)) < count_tokens(full_context) / 2
@@ -0,0 +1,65 @@
+import json
+import time
+import base64
+import threading
+
+from frontend.app.tokens import IdTokenCache, get_token_expiry
+
+
+def make_token(exp: float) -> str:
+    """build an unsigned JWT with the given expiry"""
+
+    def encode(payload: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+    return f"{encode({'alg': 'none'})}.{encode({'exp': exp, 'nonce': time.perf_counter()})}.signature"
+
+
+def test_get_token_expiry():
+    """unit test: get_token_expiry()"""
+
+    assert get_token_expiry(make_token(exp=1_700_000_000)) == 1_700_000_000
+    assert get_token_expiry("not-a-jwt") > time.time()
+
+
+def test_get_shared():
+    """unit test: IdTokenCache.get() fetches once for concurrent callers"""
+
+    fetches = []
+    cache = IdTokenCache(audience="https://backend.run.app", fetch=lambda audience: fetches.append(audience) or make_token(time.time() + 3600))
+
+    threads = [threading.Thread(target=cache.get) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert fetches == ["https://backend.run.app"]
+    assert cache.get() == cache.token
+
+
+def test_background_refresh(monkeypatch):
+    """unit test: IdTokenCache refreshes the token before it expires"""
+
+    monkeypatch.setattr("frontend.app.tokens.TOKEN_MIN_VALIDITY", 0)
+    fetches = []
+    cache = IdTokenCache(audience="aud", fetch=lambda audience: fetches.append(audience) or make_token(time.time() + 1), margin=0.5)
+
+    token = cache.get()
+    assert len(fetches) == 1
+    time.sleep(0.8)
+    assert len(fetches) >= 2
+    assert cache.token != token
+
+
+def test_invalidate():
+    """unit test: IdTokenCache.invalidate() only replaces the rejected token once"""
+
+    fetches = []
+    cache = IdTokenCache(audience="aud", fetch=lambda audience: fetches.append(audience) or make_token(time.time() + 3600))
+
+    rejected = cache.get()
+    replacement = cache.invalidate(rejected)
+    assert replacement != rejected
+    assert cache.invalidate(rejected) == replacement
+    assert len(fetches) == 2
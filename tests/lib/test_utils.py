@@ -1,18 +1,19 @@
+import asyncio
 import pytest
 
 from datetime import datetime
 from sqlalchemy import insert
 
-from src.backend.app import database
-from src.shared.models import Movie
-from src.backend.app.lib import get_movies
+from backend.app import database
+from shared.models import Movie
+from backend.app.lib import get_movies
 
 
 @pytest.fixture(autouse=True)
-def patch_constant(monkeypatch, test_engine):
+def patch_constant(monkeypatch, test_engine_router):
     """mock the CloudSQL SQLAlchemy Engine with a local DuckDB Engine for testing"""
 
-    monkeypatch.setattr("app.lib.utils.engine", test_engine)
+    monkeypatch.setattr("backend.app.lib.engine_router", test_engine_router)
 
 
 @pytest.fixture(scope="module")
@@ -68,5 +69,5 @@ def movies(test_engine):
 def test_get_movies(movies):
     """unit test: get_movies()"""
 
-    response = get_movies(tmdb_ids=[movie.tmdb_id for movie in movies])
+    response = asyncio.run(get_movies(tmdb_ids=[movie.tmdb_id for movie in movies]))
     assert response == movies
@@ -0,0 +1,70 @@
+import pytest
+import numpy as np
+
+from backend.app.vectors import ContentIndex, build_index, normalize, quantize
+
+
+@pytest.fixture(scope="module")
+def embeddings():
+    """clustered random unit vectors resembling text embeddings"""
+
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(20, 256))
+    embeddings = centers[rng.integers(0, 20, size=3000)] + 0.5 * rng.normal(size=(3000, 256))
+    return normalize(embeddings.astype(np.float32))
+
+
+@pytest.fixture(scope="module", params=[None, 64])
+def index(request, tmp_path_factory, embeddings):
+    """content index built from the embeddings with and without PCA reduction"""
+
+    path = str(tmp_path_factory.mktemp("content-index"))
+    ids = [str(i) for i in range(len(embeddings))]
+    documents = [f"plot overview: movie {i}" for i in range(len(embeddings))]
+    metadatas = [{"tmdb_id": str(i), "title": f"movie {i}"} for i in range(len(embeddings))]
+    build_index(path, ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas, dim=request.param)
+    return ContentIndex(path)
+
+
+def test_quantize(embeddings):
+    """unit test: quantize()"""
+
+    codes, scales = quantize(embeddings)
+    assert codes.dtype == np.int8
+    assert np.abs(codes * scales[:, None] - embeddings).max() <= scales.max() / 2 + 1e-6
+
+
+def test_search_recall(index, embeddings):
+    """unit test: ContentIndex.search() recall@10 wrt exact search"""
+
+    rng = np.random.default_rng(1)
+    ids = np.array([str(i) for i in range(len(embeddings))])
+    recalls = []
+    for query in normalize(embeddings[rng.choice(len(embeddings), 50)] + rng.normal(scale=0.05, size=(50, 256)).astype(np.float32)):
+        exact = set(ids[np.argsort(-(embeddings @ query))[:10]])
+        rows, similarities = index.search(query, k=10)
+        assert np.all(np.diff(similarities) <= 0)
+        recalls.append(len(exact & set(index.ids[rows])) / 10)
+
+    assert np.mean(recalls) >= 0.95
+    assert index.nbytes < embeddings.nbytes / 3
+
+
+def test_search_rows(index, embeddings):
+    """unit test: ContentIndex.search() restricted to a subset of rows"""
+
+    rows = index.get_rows(["10", "20", "30", "missing"])
+    assert index.ids[rows].tolist() == ["10", "20", "30"]
+
+    matches, similarities = index.search(embeddings[20], k=2, rows=rows)
+    assert index.ids[matches[0]] == "20"
+    assert similarities[0] == pytest.approx(1.0, abs=1e-5)
+    assert len(matches) == 2
+
+
+def test_get_records(index):
+    """unit test: ContentIndex.get_records()"""
+
+    records = index.get_records(index.get_rows(["42", "7"]))
+    assert [record["metadata"]["tmdb_id"] for record in records] == ["42", "7"]
+    assert records[0]["document"] == "plot overview: movie 42"